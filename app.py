@@ -1,4 +1,4 @@
-from flask import Flask, render_template, redirect, url_for
+from flask import Flask, render_template, redirect, url_for, jsonify, Response, abort
 from config import config
 from database import db, init_db
 import os
@@ -23,29 +23,99 @@ def create_app(config_name='default'):
     # Load configuration
     app.config.from_object(config[config_name])
     
-    # Initialize database
+    # Initialize database with the configured engine profile
+    from services.engine import configure_engines, init_engines
+    configure_engines(app)
     db.init_app(app)
+    init_engines(app)
+    
+    # Read-only dashboards and stats on the replica bind, when one is configured
+    from services.replica import init_replica
+    init_replica(app)
     
     # Register blueprints
     from routes.inventory import inventory_bp
     from routes.pos import pos_bp
     from routes.emi_manager import emi_bp
     from routes.debt import debt_bp
+    from routes.search import search_bp
+    from routes.reports import reports_bp
+    from routes.media import media_bp
     
     app.register_blueprint(inventory_bp)
     app.register_blueprint(pos_bp)
     app.register_blueprint(emi_bp)
     app.register_blueprint(debt_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(reports_bp)
+    app.register_blueprint(media_bp)
+    
+    # Register CLI commands
+    from commands import register_commands
+    register_commands(app)
     
-    # Create database tables
+    # Create database tables and search indexes
     with app.app_context():
         db.create_all()
+        
+        from services.search import init_search
+        init_search(app)
+    
+    # Response cache for the stats / detail JSON endpoints
+    from services.cache import init_cache
+    init_cache(app)
+    
+    # Per-request SQL / latency profiling (Server-Timing header, /metrics)
+    from services.profiling import init_profiling
+    init_profiling(app)
+    
+    # Photo storage and its resize / cleanup worker pool
+    from services.media import init_media
+    init_media(app)
+    
+    # Nightly overdue sweeper and aging snapshot (only when SWEEPER_ENABLED is set)
+    from services.sweeper import init_sweeper
+    init_sweeper(app)
     
     # Home route
     @app.route('/')
     def index():
-        """Home page - redirect to inventory"""
-        return render_template('home.html')
+        """Home page with today's sales and collection figures"""
+        from services.rollups import dashboard_kpis
+        return render_template('home.html', kpis=dashboard_kpis())
+    
+    @app.route('/api/cache-stats')
+    def cache_stats():
+        """Response cache hit / miss counters for this process"""
+        from services.cache import get_cache
+        return jsonify(get_cache().stats())
+    
+    @app.route('/api/replica-status')
+    def replica_status():
+        """Read replica availability and how this process routed replica-eligible requests"""
+        from services.replica import get_router
+        router = get_router()
+        if router is None:
+            abort(404)
+        return jsonify(router.status())
+    
+    @app.route('/metrics')
+    def metrics():
+        """Request, SQL and render metrics of this process in Prometheus text format"""
+        from services.profiling import get_registry
+        registry = get_registry()
+        if registry is None:
+            abort(404)
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+    
+    @app.route('/api/slow-queries')
+    def slow_queries():
+        """Slowest SQL statements seen by this process, with the endpoint that ran them"""
+        from services.profiling import get_registry
+        registry = get_registry()
+        if registry is None:
+            abort(404)
+        return jsonify(registry.slow())
     
     # Error handlers
     @app.errorhandler(404)
@@ -0,0 +1,35 @@
+# Flask CLI commands (run with `flask --app app <command>`)
+
+
+def register_commands(app):
+    """
+    Register all CLI command groups on the Flask app
+    
+    Args:
+        app: Flask application instance
+    """
+    from commands.db import upgrade_db_command, explain_queries_command, sync_replica_command
+    from commands.customers import rebuild_customer_summary_command
+    from commands.bench import bench_stock_race_command, bench_db_writes_command, seed_data_command, \
+        bench_routes_command
+    from commands.overdue import sweep_overdue_command
+    from commands.reports import snapshot_receivables_command, rebuild_rollups_command, rebuild_valuation_command
+    from commands.products import import_products_command, export_data_command, refresh_reorder_command
+    from commands.media import rebuild_media_command
+    
+    app.cli.add_command(upgrade_db_command)
+    app.cli.add_command(explain_queries_command)
+    app.cli.add_command(sync_replica_command)
+    app.cli.add_command(rebuild_customer_summary_command)
+    app.cli.add_command(bench_stock_race_command)
+    app.cli.add_command(bench_db_writes_command)
+    app.cli.add_command(seed_data_command)
+    app.cli.add_command(bench_routes_command)
+    app.cli.add_command(sweep_overdue_command)
+    app.cli.add_command(snapshot_receivables_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(rebuild_valuation_command)
+    app.cli.add_command(import_products_command)
+    app.cli.add_command(export_data_command)
+    app.cli.add_command(refresh_reorder_command)
+    app.cli.add_command(rebuild_media_command)
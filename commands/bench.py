@@ -0,0 +1,218 @@
+import multiprocessing
+import os
+import time
+import click
+from database import db
+
+
+def _stock_race_worker(args):
+    """Child process: fire cash sales at one product through the real route"""
+    product_id, customer_id, sales, config_name = args
+    from app import create_app
+    
+    app = create_app(config_name)
+    client = app.test_client()
+    sold = failed = 0
+    for _ in range(sales):
+        response = client.post('/pos/cash-sale', data={
+            'product_id': product_id,
+            'customer_id': customer_id
+        })
+        if '/pos/invoice/' in response.headers.get('Location', ''):
+            sold += 1
+        else:
+            failed += 1
+    return sold, failed
+
+
+@click.command('bench-stock-race')
+@click.option('--processes', default=8, show_default=True, help='Concurrent worker processes.')
+@click.option('--sales', default=2000, show_default=True, help='Total sale attempts across all workers.')
+@click.option('--stock', default=25, show_default=True, help='Starting stock of the test product.')
+def bench_stock_race_command(processes, sales, stock):
+    """Load-test concurrent sales of a low-stock product.
+    
+    Creates a throwaway product and customer, then fires cash sales at the
+    product from several processes at once. Fails (exit 1) if stock goes
+    negative or more units were sold than were in stock. Run it against a
+    scratch database.
+    """
+    from models.product import Product
+    from models.customer import Customer
+    from models.sales import Sale
+    
+    product = Product(name='Load test product', model=f'LT-{int(time.time())}',
+                      buying_price=1, selling_price=1, stock_quantity=stock)
+    customer = Customer.query.filter_by(phone='01000000000').first() or \
+        Customer(name='Load test customer', phone='01000000000')
+    db.session.add_all([product, customer])
+    db.session.commit()
+    product_id, customer_id = product.id, customer.id
+    db.session.remove()
+    
+    config_name = os.environ.get('FLASK_ENV', 'default')
+    per_worker = [sales // processes + (1 if i < sales % processes else 0) for i in range(processes)]
+    
+    started = time.perf_counter()
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes) as pool:
+        results = pool.map(_stock_race_worker,
+                           [(product_id, customer_id, n, config_name) for n in per_worker])
+    elapsed = time.perf_counter() - started
+    
+    sold = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    final_stock = db.session.get(Product, product_id).stock_quantity
+    recorded = Sale.query.filter_by(product_id=product_id).count()
+    
+    click.echo(f'attempts={sales} sold={sold} rejected={failed} '
+               f'({sales / elapsed:.0f} attempts/s over {processes} processes)')
+    click.echo(f'starting stock={stock} final stock={final_stock} sales recorded={recorded}')
+    
+    ok = final_stock >= 0 and sold == recorded == stock - final_stock
+    click.echo('OK: no oversell' if ok else 'FAIL: stock and sales disagree')
+    raise SystemExit(0 if ok else 1)
+
+
+def _set_environ(environ):
+    """Pool initializer: configure the workers before they import the app"""
+    os.environ.update(environ)
+
+
+def _write_bench_setup():
+    """Child process: create the product and customer the write benchmark sells"""
+    from app import create_app
+    from models.product import Product
+    from models.customer import Customer
+    
+    app = create_app(os.environ.get('FLASK_ENV', 'default'))
+    with app.app_context():
+        product = Product(name='Write bench product', model=f'WB-{time.time_ns()}',
+                          buying_price=1, selling_price=1, stock_quantity=10 ** 9)
+        customer = Customer(name='Write bench customer', phone='01000000002')
+        db.session.add_all([product, customer])
+        db.session.commit()
+        return product.id, customer.id, app.config['SQLALCHEMY_ENGINE_OPTIONS']
+
+
+@click.command('bench-db-writes')
+@click.option('--processes', default=8, show_default=True, help='Concurrent worker processes.')
+@click.option('--sales', default=2000, show_default=True, help='Cash sales per profile across all workers.')
+@click.option('--profiles', default='default,web', show_default=True,
+              help='Comma-separated engine profiles to compare.')
+def bench_db_writes_command(processes, sales, profiles):
+    """Compare concurrent write throughput of engine profiles on SQLite.
+    
+    For each profile a fresh SQLite file in a temporary directory gets
+    cash sales fired at it from several processes through the real route
+    (the same load as bench-stock-race, with unlimited stock), so failed
+    sales are lock errors. Prints sales/s and failures per profile.
+    """
+    import tempfile
+    
+    names = [name.strip() for name in profiles.split(',') if name.strip()]
+    config_name = os.environ.get('FLASK_ENV', 'default')
+    per_worker = [sales // processes + (1 if i < sales % processes else 0) for i in range(processes)]
+    ctx = multiprocessing.get_context('spawn')
+    rows = []
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for name in names:
+            environ = {
+                'DB_URL': 'sqlite:///' + os.path.join(directory, f'{name}.db'),
+                'DB_ENGINE_PROFILE': name,
+                # Keep the request profiler's bookkeeping out of the measurement
+                'PROFILING_ENABLED': '0'
+            }
+            with ctx.Pool(processes, initializer=_set_environ, initargs=(environ,)) as pool:
+                product_id, customer_id, options = pool.apply(_write_bench_setup)
+                started = time.perf_counter()
+                results = pool.map(_stock_race_worker,
+                                   [(product_id, customer_id, n, config_name) for n in per_worker])
+                elapsed = time.perf_counter() - started
+            sold = sum(r[0] for r in results)
+            failed = sum(r[1] for r in results)
+            rows.append((name, sold, failed, sold / elapsed))
+            click.echo(f'{name}: {sold} sold, {failed} failed in {elapsed:.1f}s '
+                       f'({sold / elapsed:.0f} sales/s); engine options {options}')
+    
+    if len(rows) > 1:
+        base = rows[0]
+        for name, sold, failed, rate in rows[1:]:
+            click.echo(f'{name} vs {base[0]}: {rate / base[3]:.2f}x sales/s, '
+                       f'{failed} vs {base[2]} failed sales')
+
+
+@click.command('seed-data')
+@click.option('--customers', default=1000, show_default=True, help='Customers to create (1k to 1M).')
+@click.option('--seed', default=42, show_default=True, help='Random seed.')
+@click.option('--products', type=int, default=None, help='Catalogue size (default: customers / 100).')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per INSERT batch.')
+@click.option('--no-schedules', is_flag=True, help='Skip installment schedules and payment history.')
+@click.option('--skip-derived', is_flag=True, help='Do not rebuild summaries, rollups and snapshots afterwards.')
+def seed_data_command(customers, seed, products, batch_size, no_schedules, skip_derived):
+    """Fill the database with a synthetic showroom for load testing.
+    
+    Appends products, customers, cash and EMI sales, ledgers with their
+    schedules and payments, and debt records, then rebuilds the derived
+    tables. Run it against a scratch database.
+    """
+    from services.datagen import generate, rebuild_derived
+    
+    started = time.perf_counter()
+    written = generate(customers=customers, seed=seed, products=products, batch_size=batch_size,
+                       schedules=not no_schedules,
+                       progress=lambda done: click.echo(f'  {done}/{customers} customers'))
+    for table, count in written.items():
+        click.echo(f'{table}: {count} rows')
+    click.echo(f'Generated in {time.perf_counter() - started:.1f}s')
+    
+    if not skip_derived:
+        started = time.perf_counter()
+        rebuild_derived()
+        click.echo(f'Derived tables rebuilt in {time.perf_counter() - started:.1f}s')
+
+
+@click.command('bench-routes')
+@click.option('--requests', default=200, show_default=True, help='Timed requests per route.')
+@click.option('--warmup', default=20, show_default=True, help='Untimed requests per route first.')
+@click.option('--gunicorn-workers', type=int, default=None,
+              help='Benchmark over HTTP against gunicorn with this many workers instead of the test client.')
+@click.option('--concurrency', default=8, show_default=True, help='Client threads (gunicorn mode).')
+@click.option('--save', type=click.Path(dir_okay=False), help='Write the result as a JSON baseline.')
+@click.option('--compare', type=click.Path(exists=True, dir_okay=False), help='Baseline to check the run against.')
+@click.option('--tolerance', default=0.25, show_default=True, help='Allowed p95 growth over the baseline (fraction).')
+def bench_routes_command(requests, warmup, gunicorn_workers, concurrency, save, compare, tolerance):
+    """Benchmark the busiest routes and flag regressions against a baseline.
+    
+    Reports p50/p95/p99 latency, SQL statements per request and throughput
+    for the dashboards, stats APIs and sale / payment POSTs. Fails (exit 1)
+    when --compare finds a route slower than the tolerance, running more
+    queries or returning errors. POSTs write rows: use a scratch database.
+    """
+    from services import benchmark
+    
+    if gunicorn_workers:
+        try:
+            results = benchmark.run_gunicorn(requests, warmup, workers=gunicorn_workers, concurrency=concurrency)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        result = benchmark.report(results, 'gunicorn', workers=gunicorn_workers, concurrency=concurrency)
+    else:
+        result = benchmark.report(benchmark.run_test_client(requests, warmup), 'test-client')
+    
+    click.echo(f"{'route':<22}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'req/s':>9}{'errors':>8}")
+    for name, row in result['routes'].items():
+        queries = '-' if row['queries'] is None else row['queries']
+        click.echo(f"{name:<22}{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}"
+                   f"{queries:>9}{row['rps']:>9}{row['errors']:>8}")
+    
+    if save:
+        benchmark.save_baseline(save, result)
+        click.echo(f'Baseline written to {save}')
+    if compare:
+        problems = benchmark.compare(benchmark.load_baseline(compare), result, tolerance)
+        for problem in problems:
+            click.echo(f'REGRESSION {problem}')
+        click.echo('FAIL: regressions against the baseline' if problems else 'OK: no regressions')
+        raise SystemExit(1 if problems else 0)
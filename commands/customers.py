@@ -0,0 +1,20 @@
+import click
+from services.customer_summary import verify_summaries, rebuild_summaries
+
+
+@click.command('rebuild-customer-summary')
+@click.option('--verify-only', is_flag=True, help='Report mismatches without rewriting.')
+def rebuild_customer_summary_command(verify_only):
+    """Verify customer_summary against a full recomputation and rebuild it."""
+    mismatches = verify_summaries()
+    for customer_id, field, stored, expected in mismatches[:50]:
+        click.echo(f'  customer {customer_id}: {field} stored={stored} expected={expected}')
+    if len(mismatches) > 50:
+        click.echo(f'  ... and {len(mismatches) - 50} more')
+    click.echo(f'{len(mismatches)} mismatch(es) found.')
+    
+    if verify_only:
+        raise SystemExit(1 if mismatches else 0)
+    
+    count = rebuild_summaries()
+    click.echo(f'Rebuilt {count} customer summary row(s).')
@@ -0,0 +1,105 @@
+import time
+from datetime import date, timedelta
+import click
+from database import db, upgrade_schema
+
+
+@click.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables and indexes on an existing database."""
+    created = upgrade_schema()
+    if created:
+        for item in created:
+            click.echo(f'  + {item}')
+        click.echo(f'Created {len(created)} object(s).')
+    else:
+        click.echo('Database schema is up to date.')
+
+
+def _hot_queries():
+    """The filter/order patterns used by the busiest pages"""
+    from models.product import Product
+    from models.sales import Sale, EMI_Ledger
+    from models.debt import DebtRecord
+    from services.dashboard import emi_dashboard_query
+    
+    today = date.today()
+    return [
+        ('emi.dashboard (Active page)',
+         emi_dashboard_query('Active')
+         .order_by(EMI_Ledger.next_payment_date, EMI_Ledger.id).limit(21)),
+        ('emi.due_list',
+         EMI_Ledger.query.filter(EMI_Ledger.status == 'Active',
+                                 EMI_Ledger.next_payment_date <= today + timedelta(days=30))),
+        ('emi.customer_emi_history',
+         Sale.query.filter_by(customer_id=1, sale_type='EMI')),
+        ('pos.index (in-stock products)',
+         Product.query.filter(Product.stock_quantity > 0)),
+        ('inventory.low_stock',
+         Product.query.filter(Product.needs_reorder())
+         .order_by(Product.reorder_gap(), Product.id).limit(21)),
+        ('debt.index (pending page)',
+         DebtRecord.query.filter_by(status='pending')
+         .order_by(DebtRecord.due_date, DebtRecord.id).limit(21)),
+    ]
+
+
+def _explain(query):
+    """Return the database's plan lines for a query"""
+    dialect = db.engine.dialect
+    compiled = query.statement.compile(dialect=dialect)
+    params = compiled.params
+    
+    if dialect.name == 'sqlite':
+        # Raw DB-API execution: pass dates the way the SQLite Date type stores them
+        params = tuple(
+            value.isoformat() if isinstance(value, date) else value
+            for value in (params[name] for name in compiled.positiontup)
+        )
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + str(compiled), params).fetchall()
+    return [str(row[-1]) for row in rows]
+
+
+@click.command('explain-queries')
+@click.option('--repeat', default=20, show_default=True, help='Timed executions per query.')
+def explain_queries_command(repeat):
+    """Show query plans and timings for the hot filter queries.
+    
+    Run once before and once after `flask upgrade-db` to compare: full
+    table scans (SCAN / Seq Scan) should turn into index searches
+    (SEARCH ... USING INDEX / Index Scan).
+    """
+    for label, query in _hot_queries():
+        plan = _explain(query)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            query.all()
+        elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+        
+        click.echo(f'\n{label}  ({elapsed_ms:.2f} ms avg)')
+        for line in plan:
+            click.echo(f'    {line}')
+        db.session.rollback()
+
+
+@click.command('sync-replica')
+def sync_replica_command():
+    """Copy the primary SQLite database into the replica file.
+    
+    For trying read-replica routing locally with two SQLite files
+    (DB_REPLICA_URL). Server databases replicate on their own.
+    """
+    from services.replica import get_router, sync_sqlite_replica
+    
+    if get_router() is None:
+        raise click.ClickException('No replica configured (set DB_REPLICA_URL).')
+    try:
+        path = sync_sqlite_replica()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Replica written to {path}')
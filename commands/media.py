@@ -0,0 +1,11 @@
+import click
+from services.media import rebuild_media
+
+
+@click.command('rebuild-media')
+@click.option('--prune', is_flag=True, help='Also delete stored photos that no record uses.')
+def rebuild_media_command(prune):
+    """Move legacy debt photos into content-addressed storage and write missing resized copies."""
+    result = rebuild_media(prune=prune)
+    click.echo(f"Photos: {result['migrated']} migrated, {result['resized']} resized copies written, "
+               f"{result['pruned']} pruned, {result['missing']} legacy file(s) missing.")
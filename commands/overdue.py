@@ -0,0 +1,18 @@
+import click
+from datetime import datetime
+from services.sweeper import sweep_overdue
+
+
+@click.command('sweep-overdue')
+@click.option('--date', 'as_of', default=None, help='Reference date (YYYY-MM-DD), defaults to today.')
+@click.option('--auto-default-days', type=int, default=None,
+              help='Default active EMIs this many days past due (0 disables). Defaults to AUTO_DEFAULT_DAYS.')
+def sweep_overdue_command(as_of, auto_default_days):
+    """Recompute stored overdue days / aging buckets and auto-default stale EMIs."""
+    today = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else None
+    result = sweep_overdue(today=today, auto_default_days=auto_default_days)
+    
+    click.echo(f"Overdue sweep for {result['date']}:")
+    click.echo(f"  EMI ledgers defaulted:   {result['emi_defaulted']}")
+    click.echo(f"  EMI ledgers overdue:     {result['emi_overdue']} (cleared {result['emi_cleared']})")
+    click.echo(f"  Debt records overdue:    {result['debt_overdue']} (cleared {result['debt_cleared']})")
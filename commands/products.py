@@ -0,0 +1,43 @@
+import click
+from services.product_import import STOCK_MODES, import_products, iter_rows
+from services.export import DATASETS, iter_csv
+from services.reorder import refresh_sales_velocity
+
+
+@click.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--stock', 'stock_mode', type=click.Choice(STOCK_MODES), default='add', show_default=True,
+              help="'add' adds quantities to known products (shipment), 'set' replaces them (stock count).")
+def import_products_command(path, stock_mode):
+    """Add or update products from a CSV / XLSX file, keyed on (name, model)."""
+    with open(path, 'rb') as stream:
+        report = import_products(iter_rows(stream, path), stock_mode)
+    
+    for error in report['errors'][:50]:
+        click.echo(f"  row {error['row']}: {error['error']}")
+    if report['failed'] > 50:
+        click.echo(f"  ... and {report['failed'] - 50} more")
+    click.echo(f"{report['rows']} row(s): {report['inserted']} inserted, {report['updated']} updated, "
+               f"{report['failed']} failed, {report['warnings']} with selling price below buying price.")
+    if report['failed']:
+        raise SystemExit(1)
+
+
+@click.command('export-data')
+@click.argument('dataset', type=click.Choice(sorted(DATASETS)))
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-',
+              help='Output file (defaults to stdout).')
+def export_data_command(dataset, output):
+    """Stream a dataset (products, sales or ledgers) as CSV."""
+    for chunk in iter_csv(dataset):
+        output.write(chunk)
+
+
+@click.command('refresh-reorder')
+@click.option('--days', 'window_days', type=int, default=None,
+              help='Days of sales to average over. Defaults to REORDER_VELOCITY_DAYS.')
+def refresh_reorder_command(window_days):
+    """Recompute product sales velocity used for reorder suggestions."""
+    result = refresh_sales_velocity(window_days=window_days)
+    click.echo(f"Sales velocity over {result['window_days']} day(s): {result['selling']} product(s) selling, "
+               f"{result['updated']} updated, {result['reorder_needed']} at or below reorder level.")
@@ -0,0 +1,35 @@
+import click
+from services.receivables import snapshot_aging
+from services.rollups import rebuild_rollups
+from services.valuation import rebuild_valuation, verify_valuation
+
+
+@click.command('snapshot-receivables')
+@click.option('--full', is_flag=True, help='Rebuild the receivable snapshot instead of refreshing it incrementally.')
+def snapshot_receivables_command(full):
+    """Refresh the receivable snapshot and store today's aging totals."""
+    result = snapshot_aging(full=full)
+    mode = 'Full rebuild' if result['full'] else 'Incremental refresh'
+    click.echo(f"{mode}: {result['emi']} EMI ledger(s), {result['debt']} debt record(s) reprocessed, "
+               f"{result['removed']} removed.")
+
+
+@click.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the daily sales / collections rollup from sales and payments."""
+    days = rebuild_rollups()
+    click.echo(f'Rebuilt daily rollup for {days} day(s).')
+
+
+@click.command('rebuild-valuation')
+@click.option('--check', is_flag=True, help='Only compare the summary with the product table.')
+def rebuild_valuation_command(check):
+    """Reset the inventory valuation summary from current stock and buying prices."""
+    if check:
+        result = verify_valuation()
+        click.echo(f"Summary: {result['summary_units']} unit(s), {result['summary_value']:.2f}; "
+                   f"products: {result['units']} unit(s), {result['value']:.2f}; "
+                   f"drift: {result['units_drift']} unit(s), {result['value_drift']:.2f}.")
+        return
+    result = rebuild_valuation()
+    click.echo(f"Inventory valuation: {result['units']} unit(s) worth {result['value']:.2f}.")
@@ -1,7 +1,33 @@
+from flask import g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from datetime import datetime
+
+# Bind key of the optional read replica (see services/replica.py)
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """
+    Session that sends plain SELECTs to the read replica while the current
+    request is routed there (``g.use_replica``)
+    
+    Flushes, INSERT / UPDATE / DELETE, SELECT ... FOR UPDATE and raw SQL
+    always go to the primary.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and clause is not None
+                and getattr(clause, 'is_select', False)
+                and getattr(clause, '_for_update_arg', None) is None
+                and has_request_context() and g.get('use_replica')):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
 
 # Initialize SQLAlchemy instance
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
 def init_db(app):
@@ -15,7 +41,7 @@ def init_db(app):
     
     with app.app_context():
         # Import all models to ensure they're registered
-        from models import product, customer, sales
+        from models import product, customer, payments, sales, reports, inventory
         from models.debt import DebtRecord
         
         # Create all tables
@@ -34,3 +60,204 @@ def reset_db(app):
         db.drop_all()
         db.create_all()
         print("Database reset successfully!")
+
+
+def upgrade_schema():
+    """
+    Bring an existing database up to the current models without dropping data.
+    
+    Creates missing tables, adds missing columns (new columns must be
+    nullable or carry a server default) and creates missing indexes. Safe
+    to run repeatedly: objects that already exist are left untouched.
+    
+    Returns:
+        list: Descriptions of the objects that were created
+    """
+    from sqlalchemy import inspect
+    # Import all models to ensure they're registered
+    from models import product, customer, payments, sales, reports, inventory
+    from models.debt import DebtRecord
+    
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            table.create(db.engine)
+            created.append(f'table {table.name}')
+            continue
+        
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                _add_column(table, column)
+                created.append(f'column {column.name} on {table.name}')
+        
+        existing_indexes = _index_names(inspector, table.name)
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name not in existing_indexes:
+                index.create(db.engine)
+                created.append(f'index {index.name} on {table.name}')
+    
+    return created
+
+
+def _index_names(inspector, table_name):
+    """Names of a table's existing indexes, expression indexes included"""
+    if db.engine.dialect.name == 'sqlite':
+        # SQLAlchemy skips expression-based indexes when reflecting SQLite
+        with db.engine.connect() as connection:
+            return set(connection.execute(
+                db.text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+                {'table': table_name}
+            ).scalars())
+    return {index['name'] for index in inspector.get_indexes(table_name)}
+
+
+def _add_column(table, column):
+    """Issue ALTER TABLE ... ADD COLUMN for a column missing from the database"""
+    dialect = db.engine.dialect
+    preparer = dialect.identifier_preparer
+    ddl = (f'ALTER TABLE {preparer.format_table(table)} '
+           f'ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=dialect)}')
+    if column.server_default is not None:
+        default = column.server_default.arg
+        default = default.text if hasattr(default, 'text') else f"'{default}'"
+        ddl += f' DEFAULT {default}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+    
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(ddl)
+
+
+def increment_row(model, keys, deltas, assign=None):
+    """
+    Atomically add deltas to counter columns of one row, creating it if missing.
+    
+    Runs a single INSERT ... ON CONFLICT DO UPDATE on SQLite and PostgreSQL,
+    so concurrent writers never lose an update. Must be called inside the
+    caller's transaction; nothing is committed here.
+    
+    Args:
+        model: Model class whose primary key (or unique key) is ``keys``
+        keys: Dict of key column -> value identifying the row
+        deltas: Dict of numeric column -> amount to add
+        assign: Optional dict of column -> value to overwrite
+    """
+    table = model.__table__
+    assign = assign or {}
+    dialect = db.session.get_bind().dialect.name
+    
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        
+        stmt = insert(table).values(**keys, **deltas, **assign)
+        updates = {column: table.c[column] + stmt.excluded[column] for column in deltas}
+        updates.update({column: stmt.excluded[column] for column in assign})
+        if 'updated_at' in table.c:
+            updates['updated_at'] = datetime.utcnow()
+        stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_=updates)
+        db.session.execute(stmt)
+        return
+    
+    # Generic fallback: update in place, insert when the row is missing
+    values = {column: table.c[column] + amount for column, amount in deltas.items()}
+    values.update(assign)
+    where = [table.c[column] == value for column, value in keys.items()]
+    result = db.session.execute(table.update().where(*where).values(**values))
+    if result.rowcount == 0:
+        db.session.execute(table.insert().values(**keys, **deltas, **assign))
+
+
+def upsert_rows(model, keys, rows):
+    """
+    Insert rows, overwriting the existing row on a key conflict.
+    
+    One INSERT ... ON CONFLICT DO UPDATE executed for all rows on SQLite
+    and PostgreSQL. Must be called inside the caller's transaction.
+    
+    Args:
+        model: Model class whose primary key (or unique key) is ``keys``
+        keys: Key column names
+        rows: List of dicts of column -> value, all with the same columns
+    """
+    if not rows:
+        return
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: stmt.excluded[column] for column in rows[0] if column not in keys}
+        )
+        db.session.execute(stmt, rows)
+        return
+    
+    for row in rows:
+        increment_row(model, {column: row[column] for column in keys}, {},
+                      assign={column: value for column, value in row.items() if column not in keys})
+
+
+# Session.info key holding summary-row increments waiting for commit
+DEFERRED_KEY = 'deferred_increments'
+
+
+def defer_increment(model, keys, deltas, last=False):
+    """
+    Queue an increment_row until the current transaction commits.
+    
+    Single summary rows (the inventory valuation, one rollup row per day)
+    are touched by every sale, so their row locks are the hottest in the
+    database. Queued increments are summed per row and written right
+    before COMMIT, after everything else in the transaction is flushed
+    and in a fixed (table, key) order: the locks are held only for the
+    commit, and a transaction holding product row locks never waits for a
+    summary row held by one that is waiting for those products. Rows
+    queued with ``last`` are written after all the others. A rollback
+    drops them.
+    
+    Args:
+        model: Model class whose primary key (or unique key) is ``keys``
+        keys: Dict of key column -> value identifying the row
+        deltas: Dict of numeric column -> amount to add
+        last: Write after the rows queued without it
+    """
+    deltas = {column: amount for column, amount in deltas.items() if amount}
+    if not deltas:
+        return
+    pending = db.session.info.setdefault(DEFERRED_KEY, {})
+    row = (bool(last), model.__table__.name, tuple(sorted(keys.items())))
+    _, _, totals = pending.setdefault(row, (model, keys, {}))
+    for column, amount in deltas.items():
+        totals[column] = totals.get(column, 0) + amount
+
+
+def _write_deferred(session):
+    pending = session.info.pop(DEFERRED_KEY, None)
+    if not pending:
+        return
+    session.flush()
+    for row in sorted(pending):
+        model, keys, deltas = pending[row]
+        increment_row(model, keys, deltas)
+
+
+def _discard_deferred(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(DEFERRED_KEY, None)
+
+
+event.listen(db.session, 'before_commit', _write_deferred)
+event.listen(db.session, 'after_transaction_end', _discard_deferred)
@@ -1,6 +1,11 @@
 # Import all models for easy access
 from models.product import Product
-from models.customer import Customer
-from models.sales import Sale, EMI_Ledger
+from models.customer import Customer, CustomerSummary
+from models.payments import Installment, Payment
+from models.sales import Sale, SaleItem, EMI_Ledger
+from models.reports import ReceivableSnapshot, ReceivablesAgingDaily, ReportRefresh, DailyRollup
+from models.inventory import StockMovement, InventoryValuation
 
-__all__ = ['Product', 'Customer', 'Sale', 'EMI_Ledger']
+__all__ = ['Product', 'Customer', 'CustomerSummary', 'Sale', 'SaleItem', 'EMI_Ledger', 'Installment', 'Payment',
+           'ReceivableSnapshot', 'ReceivablesAgingDaily', 'ReportRefresh', 'DailyRollup',
+           'StockMovement', 'InventoryValuation']
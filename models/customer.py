@@ -1,4 +1,4 @@
-from database import db
+from database import db, increment_row
 from datetime import datetime
 import re
 
@@ -19,6 +19,9 @@ class Customer(db.Model):
     # Relationship with sales
     sales = db.relationship('Sale', backref='customer', lazy=True, cascade='all, delete-orphan')
     
+    # Maintained balance projection (see CustomerSummary)
+    summary = db.relationship('CustomerSummary', uselist=False, lazy=True, cascade='all, delete-orphan')
+    
     def __repr__(self):
         return f'<Customer {self.name} - {self.phone}>'
     
@@ -37,25 +40,49 @@ class Customer(db.Model):
         pattern = r'^01[0-9]{9}$'
         return bool(re.match(pattern, phone))
     
+    def compute_summary(self):
+        """
+        Recompute balance figures by walking all sales and EMI ledgers
+        
+        Returns:
+            dict: total_purchases, total_due, active_emi_count, last_purchase_date
+        """
+        total_purchases = 0
+        total_due = 0
+        active_emi_count = 0
+        last_purchase_date = None
+        for sale in self.sales:
+            total_purchases += sale.total_amount
+            if last_purchase_date is None or (sale.sale_date and sale.sale_date > last_purchase_date):
+                last_purchase_date = sale.sale_date
+            if sale.sale_type == 'EMI' and sale.emi_ledger:
+                total_due += sale.emi_ledger.calculate_remaining_amount()
+                if sale.emi_ledger.status == 'Active':
+                    active_emi_count += 1
+        return {
+            'total_purchases': total_purchases,
+            'total_due': total_due,
+            'active_emi_count': active_emi_count,
+            'last_purchase_date': last_purchase_date
+        }
+    
     def get_total_purchases(self):
         """Get total purchase amount for this customer"""
-        total = sum(sale.total_amount for sale in self.sales)
-        return total
+        if self.summary is not None:
+            return self.summary.total_purchases
+        return self.compute_summary()['total_purchases']
     
     def get_total_due(self):
         """Get total due amount (for EMI sales)"""
-        total_due = 0
-        for sale in self.sales:
-            if sale.sale_type == 'EMI' and sale.emi_ledger:
-                total_due += sale.emi_ledger.calculate_remaining_amount()
-        return total_due
+        if self.summary is not None:
+            return self.summary.total_due
+        return self.compute_summary()['total_due']
     
     def has_active_emi(self):
         """Check if customer has any active EMI"""
-        for sale in self.sales:
-            if sale.sale_type == 'EMI' and sale.emi_ledger and sale.emi_ledger.status == 'Active':
-                return True
-        return False
+        if self.summary is not None:
+            return self.summary.active_emi_count > 0
+        return self.compute_summary()['active_emi_count'] > 0
     
     def to_dict(self):
         """Convert customer to dictionary"""
@@ -69,3 +96,137 @@ class Customer(db.Model):
             'total_due': self.get_total_due(),
             'has_active_emi': self.has_active_emi()
         }
+
+
+class CustomerSummary(db.Model):
+    """
+    Per-customer balance projection, maintained in the same transaction as
+    the sale / installment / default that changes it, so customer balances
+    are a single-row read.
+    """
+    
+    __tablename__ = 'customer_summary'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), primary_key=True)
+    total_purchases = db.Column(db.Float, nullable=False, default=0.0)
+    total_due = db.Column(db.Float, nullable=False, default=0.0)
+    active_emi_count = db.Column(db.Integer, nullable=False, default=0)
+    last_purchase_date = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CustomerSummary {self.customer_id} - due ৳{self.total_due}>'
+    
+    @staticmethod
+    def _apply(customer_id, deltas, assign=None):
+        """
+        Add deltas to a customer's summary row
+        
+        Customers that predate the summary table have no row yet; their row
+        is seeded from a full recomputation, which already includes the
+        change being recorded.
+        """
+        exists = db.session.query(CustomerSummary.customer_id).filter_by(customer_id=customer_id).first()
+        if exists is None:
+            customer = db.session.get(Customer, customer_id)
+            db.session.expire(customer, ['sales', 'summary'])
+            db.session.add(CustomerSummary(customer_id=customer_id, **customer.compute_summary()))
+            db.session.flush()
+            return
+        
+        increment_row(CustomerSummary, {'customer_id': customer_id}, deltas, assign)
+    
+    @staticmethod
+    def record_sale(customer_id, total_amount, due_amount=0.0, is_emi=False, sale_date=None):
+        """
+        Apply a new sale to the customer's summary
+        
+        Args:
+            customer_id: Customer ID
+            total_amount: Sale total
+            due_amount: Amount payable in installments (EMI sales)
+            is_emi: True for EMI sales (adds an active EMI)
+            sale_date: Sale timestamp (defaults to now)
+        """
+        CustomerSummary._apply(
+            customer_id,
+            {
+                'total_purchases': total_amount,
+                'total_due': due_amount,
+                'active_emi_count': 1 if is_emi else 0
+            },
+            assign={'last_purchase_date': sale_date or datetime.utcnow()}
+        )
+    
+    @staticmethod
+    def record_installment(customer_id, amount, completed=False):
+        """
+        Apply an installment payment to the customer's summary
+        
+        Args:
+            customer_id: Customer ID
+            amount: Amount paid
+            completed: True if the payment completed the EMI, or the number
+                of EMIs completed when a batch is applied at once
+        """
+        CustomerSummary._apply(
+            customer_id,
+            {'total_due': -amount, 'active_emi_count': -int(completed)}
+        )
+    
+    @staticmethod
+    def record_installments(changes):
+        """
+        Apply a batch of installment payments to many customers at once
+        
+        Existing rows are updated with a single executemany UPDATE of
+        relative deltas; customers without a row are seeded as in _apply.
+        
+        Args:
+            changes: Dict of customer_id -> (amount paid, EMIs closed)
+        """
+        if not changes:
+            return
+        
+        existing = {
+            customer_id for (customer_id,) in db.session.query(CustomerSummary.customer_id)
+            .filter(CustomerSummary.customer_id.in_(list(changes)))
+        }
+        for customer_id in set(changes) - existing:
+            amount, completed = changes[customer_id]
+            CustomerSummary.record_installment(customer_id, amount, completed=completed)
+        
+        table = CustomerSummary.__table__
+        params = [
+            {'b_customer_id': customer_id, 'b_amount': changes[customer_id][0],
+             'b_completed': changes[customer_id][1], 'b_updated_at': datetime.utcnow()}
+            for customer_id in existing
+        ]
+        if params:
+            db.session.execute(
+                table.update()
+                .where(table.c.customer_id == db.bindparam('b_customer_id'))
+                .values(
+                    total_due=table.c.total_due - db.bindparam('b_amount'),
+                    active_emi_count=table.c.active_emi_count - db.bindparam('b_completed'),
+                    updated_at=db.bindparam('b_updated_at')
+                ),
+                params
+            )
+    
+    @staticmethod
+    def record_default(customer_id):
+        """Apply an EMI default (no longer active) to the customer's summary"""
+        CustomerSummary._apply(customer_id, {'active_emi_count': -1})
+    
+    @staticmethod
+    def record_defaults(counts):
+        """
+        Apply many EMI defaults at once
+        
+        Args:
+            counts: Dict of customer_id -> number of EMIs defaulted
+        """
+        CustomerSummary.record_installments({
+            customer_id: (0.0, count) for customer_id, count in counts.items()
+        })
@@ -1,10 +1,17 @@
 from database import db
 from datetime import datetime
+from utils.aging import aging_bucket_for
 
 
 class DebtRecord(db.Model):
     """Model for tracking money lending/borrowing records"""
     __tablename__ = 'debt_records'
+    __table_args__ = (
+        db.Index('ix_debt_records_status_due_date', 'status', 'due_date', 'id'),
+        db.Index('ix_debt_records_due_date', 'due_date', 'id'),
+        db.Index('ix_debt_records_status_days_overdue', 'status', 'days_overdue'),
+        db.Index('ix_debt_records_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -15,10 +22,16 @@ class DebtRecord(db.Model):
     photo = db.Column(db.String(255))  # Store photo filename
     status = db.Column(db.String(20), default='pending')  # pending, paid, partial
     paid_amount = db.Column(db.Float, default=0.0)
+    days_overdue = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Kept current by the overdue sweeper
+    aging_bucket = db.Column(db.String(10), nullable=False, default='current', server_default='current')
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Append-only repayment history (kept when the record is deleted)
+    payments = db.relationship('Payment', backref='debt', lazy=True, order_by='Payment.id',
+                               passive_deletes='all')
+    
     def __repr__(self):
         return f'<DebtRecord {self.name} - {self.amount}>'
     
@@ -33,6 +46,14 @@ class DebtRecord(db.Model):
         from datetime import date
         return self.due_date < date.today() and self.status != 'paid'
     
+    def refresh_overdue(self, today=None):
+        """Recompute the stored days_overdue / aging_bucket columns"""
+        from datetime import date
+        today = today or date.today()
+        days = (today - self.due_date).days if self.status != 'paid' else 0
+        self.days_overdue = max(days, 0)
+        self.aging_bucket = aging_bucket_for(self.days_overdue)
+    
     def to_dict(self):
         """Convert to dictionary"""
         return {
@@ -48,5 +69,7 @@ class DebtRecord(db.Model):
             'remaining_amount': self.remaining_amount,
             'notes': self.notes,
             'is_overdue': self.is_overdue,
+            'days_overdue': self.days_overdue,
+            'aging_bucket': self.aging_bucket,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
         }
@@ -0,0 +1,125 @@
+from database import db, defer_increment
+from datetime import datetime
+
+
+class StockMovement(db.Model):
+    """
+    Append-only journal of stock changes. ``quantity`` is signed (sales
+    are negative) and ``balance_after`` is the product's stock right after
+    the movement, so a product's history reads as a running balance.
+    """
+    
+    __tablename__ = 'stock_movement'
+    __table_args__ = (
+        db.Index('ix_stock_movement_product_id', 'product_id', 'id'),
+        db.Index('ix_stock_movement_created_at', 'created_at'),
+    )
+    
+    KINDS = ('receipt', 'sale', 'adjustment', 'return')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # 'receipt', 'sale', 'adjustment', 'return'
+    quantity = db.Column(db.Integer, nullable=False)  # Signed change in units
+    balance_after = db.Column(db.Integer, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=False)  # Buying price at the time
+    sale_id = db.Column(db.Integer, db.ForeignKey('sale.id'), nullable=True)
+    note = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StockMovement {self.product_id} {self.kind} {self.quantity:+d}>'
+    
+    @staticmethod
+    def record_many(movements):
+        """
+        Journal stock changes that were already applied to product rows
+        
+        Inserts every movement with one executemany INSERT inside the
+        caller's transaction; the valuation summary moves by their total
+        value when it commits.
+        
+        Args:
+            movements: Dicts with product_id, kind, quantity, balance_after,
+                unit_cost and optional sale_id / note
+        """
+        movements = [movement for movement in movements if movement['quantity']]
+        if not movements:
+            return
+        now = datetime.utcnow()
+        db.session.execute(StockMovement.__table__.insert(), [
+            {'sale_id': None, 'note': None, **movement, 'created_at': now} for movement in movements
+        ])
+        InventoryValuation.apply(
+            sum(movement['quantity'] for movement in movements),
+            sum(movement['quantity'] * movement['unit_cost'] for movement in movements)
+        )
+    
+    @staticmethod
+    def record(product_id, kind, quantity, balance_after, unit_cost, sale_id=None, note=None):
+        """Journal a single stock change (see record_many)"""
+        StockMovement.record_many([{
+            'product_id': product_id,
+            'kind': kind,
+            'quantity': quantity,
+            'balance_after': balance_after,
+            'unit_cost': unit_cost,
+            'sale_id': sale_id,
+            'note': note
+        }])
+    
+    def to_dict(self):
+        """Convert stock movement to dictionary"""
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'kind': self.kind,
+            'quantity': self.quantity,
+            'balance_after': self.balance_after,
+            'unit_cost': self.unit_cost,
+            'sale_id': self.sale_id,
+            'note': self.note,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+
+class InventoryValuation(db.Model):
+    """
+    Units in stock and their value at buying price, across all products,
+    moved by every stock movement and buying price change so the
+    valuation report is a single-row read.
+    """
+    
+    __tablename__ = 'inventory_valuation'
+    
+    SUMMARY_ID = 1
+    
+    id = db.Column(db.Integer, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    value = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @staticmethod
+    def apply(units, value):
+        """
+        Add to the summary when the caller's transaction commits (see
+        ``defer_increment``: every stock change touches this one row)
+        
+        Args:
+            units: Change in units held
+            value: Change in value at buying price
+        """
+        if units or value:
+            defer_increment(InventoryValuation, {'id': InventoryValuation.SUMMARY_ID},
+                            {'units': units, 'value': value})
+    
+    @staticmethod
+    def revalue(stock_quantity, old_price, new_price):
+        """Apply a buying price change to the units already in stock"""
+        InventoryValuation.apply(0, stock_quantity * (new_price - old_price))
+    
+    @staticmethod
+    def current():
+        """The summary row, or an empty one before any stock was journaled"""
+        return (db.session.get(InventoryValuation, InventoryValuation.SUMMARY_ID)
+                or InventoryValuation(id=InventoryValuation.SUMMARY_ID, units=0, value=0.0))
@@ -0,0 +1,88 @@
+from database import db
+from datetime import datetime
+
+
+class Installment(db.Model):
+    """
+    One scheduled installment of an EMI ledger. Rows are written once,
+    when the ledger is created, and never rewritten; an installment is
+    paid when its number is within the ledger's installments_paid.
+    """
+    
+    __tablename__ = 'installment'
+    __table_args__ = (
+        db.UniqueConstraint('ledger_id', 'number', name='uq_installment_ledger_number'),
+        db.Index('ix_installment_ledger_due_date', 'ledger_id', 'due_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    ledger_id = db.Column(db.Integer, db.ForeignKey('emi_ledger.id'), nullable=False)
+    number = db.Column(db.Integer, nullable=False)  # 1-based position in the schedule
+    due_date = db.Column(db.Date, nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    principal = db.Column(db.Float, nullable=False)
+    interest = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Installment {self.ledger_id}#{self.number} - ৳{self.amount}>'
+    
+    def to_dict(self):
+        """Convert installment to dictionary"""
+        return {
+            'number': self.number,
+            'due_date': self.due_date.strftime('%Y-%m-%d'),
+            'amount': self.amount,
+            'principal': self.principal,
+            'interest': self.interest
+        }
+
+
+class Payment(db.Model):
+    """
+    Append-only record of money received: EMI installments, EMI down
+    payments and debt repayments. Rows are never updated or deleted.
+    """
+    
+    __tablename__ = 'payment'
+    __table_args__ = (
+        db.Index('ix_payment_paid_at', 'paid_at'),
+        db.Index('ix_payment_ledger_paid_at', 'ledger_id', 'paid_at'),
+        db.Index('ix_payment_debt_paid_at', 'debt_id', 'paid_at'),
+        db.Index('ix_payment_customer_paid_at', 'customer_id', 'paid_at'),
+    )
+    
+    KINDS = ('installment', 'down_payment', 'debt')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'installment', 'down_payment', 'debt'
+    ledger_id = db.Column(db.Integer, db.ForeignKey('emi_ledger.id'), nullable=True)
+    debt_id = db.Column(db.Integer, db.ForeignKey('debt_records.id', ondelete='SET NULL'), nullable=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=True)
+    installment_from = db.Column(db.Integer, nullable=True)  # First installment number covered
+    installment_to = db.Column(db.Integer, nullable=True)  # Last installment number covered
+    amount = db.Column(db.Float, nullable=False)
+    paid_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Payment {self.id} {self.kind} - ৳{self.amount}>'
+    
+    def get_installment_count(self):
+        """Number of installments this payment covered"""
+        if self.installment_from is None:
+            return 0
+        return self.installment_to - self.installment_from + 1
+    
+    def to_dict(self):
+        """Convert payment to dictionary"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'ledger_id': self.ledger_id,
+            'debt_id': self.debt_id,
+            'customer_id': self.customer_id,
+            'installment_from': self.installment_from,
+            'installment_to': self.installment_to,
+            'amount': round(self.amount, 2),
+            'paid_at': self.paid_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
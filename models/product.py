@@ -1,11 +1,19 @@
 from database import db
+from models.inventory import StockMovement
+from models.reports import DailyRollup
 from datetime import datetime
+import math
 
 
 class Product(db.Model):
     """Product model for inventory management"""
     
     __tablename__ = 'product'
+    __table_args__ = (
+        db.Index('ix_product_stock_quantity', 'stock_quantity'),
+        db.Index('ix_product_updated_at', 'updated_at'),  # Conditional GET validators
+        db.Index('uq_product_name_model', 'name', 'model', unique=True),  # Bulk import upsert key
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -13,6 +21,8 @@ class Product(db.Model):
     buying_price = db.Column(db.Float, nullable=False)
     selling_price = db.Column(db.Float, nullable=False)
     stock_quantity = db.Column(db.Integer, nullable=False, default=0)
+    reorder_level = db.Column(db.Integer, nullable=False, default=5, server_default='5')  # Alert at or below this stock
+    sales_velocity = db.Column(db.Float, nullable=False, default=0.0, server_default='0')  # Units/day, set by refresh_sales_velocity
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -22,39 +32,156 @@ class Product(db.Model):
     def __repr__(self):
         return f'<Product {self.name} - {self.model}>'
     
-    def update_stock(self, quantity, operation='add'):
+    def update_stock(self, quantity, operation='add', kind=None, note=None):
         """
-        Update stock quantity
+        Update stock quantity (journaled)
         
         Args:
             quantity: Amount to add or subtract
             operation: 'add' to increase stock, 'subtract' to decrease
+            kind: Stock movement kind (defaults to 'receipt' / 'adjustment')
+            note: Optional reason stored with the movement
         
         Returns:
             bool: True if successful, False if insufficient stock
         """
         if operation == 'add':
-            self.stock_quantity += quantity
-            return True
+            return Product.move_stock(self.id, quantity, kind or 'receipt', note=note) is not None
         elif operation == 'subtract':
-            if self.stock_quantity >= quantity:
-                self.stock_quantity -= quantity
-                return True
-            return False
+            return Product.move_stock(self.id, -quantity, kind or 'adjustment', note=note) is not None
         return False
     
-    def is_low_stock(self, threshold=5):
+    @staticmethod
+    def _change_stock(product_id, quantity):
+        """
+        Add ``quantity`` (signed) to a product's stock with one conditional
+        UPDATE that never takes it below zero
+        
+        Returns:
+            tuple: (new stock, buying price), or None if the product is
+                missing or the stock was insufficient
+        """
+        stmt = (
+            db.update(Product)
+            .where(Product.id == product_id, Product.stock_quantity + quantity >= 0)
+            .values(stock_quantity=Product.stock_quantity + quantity)
+            .execution_options(synchronize_session=False)
+        )
+        
+        if db.session.get_bind().dialect.update_returning:
+            row = db.session.execute(stmt.returning(Product.stock_quantity, Product.buying_price)).first()
+        else:
+            result = db.session.execute(stmt)
+            row = None
+            if result.rowcount == 1:
+                row = db.session.query(Product.stock_quantity, Product.buying_price).filter_by(id=product_id).first()
+        
+        # Keep an already-loaded instance in step with the database
+        product = db.session.identity_map.get(db.session.identity_key(Product, product_id))
+        if product is not None and row is not None:
+            db.session.expire(product, ['stock_quantity'])
+        
+        return tuple(row) if row else None
+    
+    @staticmethod
+    def move_stock(product_id, quantity, kind, note=None):
+        """
+        Receive, return or adjust stock atomically and journal the movement
+        
+        Args:
+            product_id: Product ID
+            quantity: Signed change in units
+            kind: 'receipt', 'return' or 'adjustment'
+            note: Optional reason stored with the movement
+        
+        Returns:
+            int: New stock, or None if it would go below zero
+        """
+        changed = Product._change_stock(product_id, quantity)
+        if changed is None:
+            return None
+        balance, unit_cost = changed
+        StockMovement.record(product_id, kind, quantity, balance, unit_cost, note=note)
+        return balance
+    
+    @staticmethod
+    def reserve_stock(product_id, quantity=1, sale_id=None):
+        """
+        Atomically take units out of stock for a sale
+        
+        Issues a single conditional UPDATE (... WHERE stock_quantity >= n),
+        so two counters selling the last unit cannot both succeed. On
+        PostgreSQL the UPDATE holds a row lock on that one product until the
+        transaction ends; sales of other products are not blocked. The
+        units are journaled as a sale movement; the valuation and today's
+        cost of goods sold move at commit, after every product of the cart
+        is locked, so cart lines never wait on those shared rows.
+        
+        Args:
+            product_id: Product ID
+            quantity: Units to take
+            sale_id: Sale the units leave with (stored on the movement)
+        
+        Returns:
+            int: Remaining stock, or None if there was not enough stock
+        """
+        changed = Product._change_stock(product_id, -quantity)
+        if changed is None:
+            return None
+        
+        remaining, unit_cost = changed
+        StockMovement.record(product_id, 'sale', -quantity, remaining, unit_cost, sale_id=sale_id)
+        DailyRollup.record({'cogs_amount': quantity * unit_cost})
+        return remaining
+    
+    def is_low_stock(self, threshold=None):
         """
         Check if product stock is below threshold
         
         Args:
-            threshold: Minimum stock level
+            threshold: Minimum stock level (defaults to the product's reorder level)
         
         Returns:
             bool: True if stock is low
         """
+        if threshold is None:
+            threshold = self.reorder_level
         return self.stock_quantity <= threshold
     
+    @staticmethod
+    def reorder_gap():
+        """SQL expression for stock above the reorder level (indexed by ix_product_reorder_gap)"""
+        return Product.stock_quantity - Product.reorder_level
+    
+    @staticmethod
+    def needs_reorder():
+        """SQL filter for products at or below their reorder level"""
+        return Product.reorder_gap() <= 0
+    
+    def get_days_of_cover(self):
+        """Days the current stock lasts at the recent sales velocity (None if not selling)"""
+        if self.sales_velocity > 0:
+            return self.stock_quantity / self.sales_velocity
+        return None
+    
+    def get_reorder_quantity(self, lead_days=7, cover_days=30):
+        """
+        Suggest how many units to order
+        
+        Enough to sell through the supplier's lead time and the cover
+        period at the recent sales velocity and still be above the reorder
+        level.
+        
+        Args:
+            lead_days: Days until an order arrives
+            cover_days: Days of sales the order should cover
+        
+        Returns:
+            int: Units to order (0 if stock is sufficient)
+        """
+        demand = max(math.ceil(self.sales_velocity * (lead_days + cover_days)), 1)
+        return max(self.reorder_level + demand - self.stock_quantity, 0)
+    
     def get_profit_margin(self):
         """Calculate profit margin percentage"""
         if self.buying_price > 0:
@@ -70,6 +197,11 @@ class Product(db.Model):
             'buying_price': self.buying_price,
             'selling_price': self.selling_price,
             'stock_quantity': self.stock_quantity,
+            'reorder_level': self.reorder_level,
             'is_low_stock': self.is_low_stock(),
             'profit_margin': round(self.get_profit_margin(), 2)
         }
+
+
+# Expression index for the reorder query (stock_quantity <= reorder_level)
+db.Index('ix_product_reorder_gap', Product.reorder_gap())
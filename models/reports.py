@@ -0,0 +1,167 @@
+from database import db, defer_increment
+from datetime import datetime
+
+
+class ReceivableSnapshot(db.Model):
+    """
+    One row per open receivable (EMI ledger or debt record), refreshed
+    incrementally from rows whose updated_at moved past the watermark.
+    Aging is derived from due_date at report time, so rows do not need
+    rewriting as they age.
+    """
+    
+    __tablename__ = 'receivable_snapshot'
+    __table_args__ = (
+        db.Index('ix_receivable_snapshot_due_date', 'due_date'),
+    )
+    
+    source_type = db.Column(db.String(10), primary_key=True)  # 'emi' or 'debt'
+    source_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False)
+    outstanding = db.Column(db.Float, nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+    source_updated_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ReceivableSnapshot {self.source_type} {self.source_id} - ৳{self.outstanding}>'
+
+
+class ReceivablesAgingDaily(db.Model):
+    """Receivables aging totals as of one day, kept for instant month-end reports"""
+    
+    __tablename__ = 'receivables_aging_daily'
+    
+    snapshot_date = db.Column(db.Date, primary_key=True)
+    source_type = db.Column(db.String(10), primary_key=True)
+    bucket = db.Column(db.String(10), primary_key=True)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Float, nullable=False, default=0.0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert aging row to dictionary"""
+        return {
+            'source': self.source_type,
+            'bucket': self.bucket,
+            'count': self.item_count,
+            'amount': round(self.amount, 2)
+        }
+
+
+class ReportRefresh(db.Model):
+    """Watermark and time of the last refresh of a report snapshot (or run of a nightly job)"""
+    
+    __tablename__ = 'report_refresh'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    watermark = db.Column(db.DateTime)  # Source rows updated after this are reprocessed
+    refreshed_at = db.Column(db.DateTime)
+
+
+class DailyRollup(db.Model):
+    """
+    Per-day sales and collection totals, incremented in the same
+    transaction as the sale / payment / default that changes them, so
+    dashboard KPIs and charts read a handful of rows whatever the history
+    size. Days are UTC dates, like the stored timestamps they summarize.
+    
+    Every write of the day hits the same row, so increments are queued
+    with ``defer_increment(last=True)``: summed per day and written as
+    the last statements before COMMIT, after every other row of the
+    transaction (the inventory valuation included). The row lock is held
+    only for the commit itself, and always taken last, so two sales can
+    never deadlock on it.
+    """
+    
+    __tablename__ = 'daily_rollup'
+    
+    # Counter columns, in display order
+    COUNTERS = (
+        'cash_sale_count', 'cash_sale_amount',
+        'emi_sale_count', 'emi_sale_amount', 'emi_financed_amount', 'down_payment_amount',
+        'installment_count', 'installment_amount',
+        'debt_payment_count', 'debt_payment_amount',
+        'default_count',
+        'cogs_amount'
+    )
+    
+    day = db.Column(db.Date, primary_key=True)
+    cash_sale_count = db.Column(db.Integer, nullable=False, default=0)
+    cash_sale_amount = db.Column(db.Float, nullable=False, default=0.0)
+    emi_sale_count = db.Column(db.Integer, nullable=False, default=0)  # New EMI ledgers opened
+    emi_sale_amount = db.Column(db.Float, nullable=False, default=0.0)
+    emi_financed_amount = db.Column(db.Float, nullable=False, default=0.0)  # Sale total less down payment
+    down_payment_amount = db.Column(db.Float, nullable=False, default=0.0)
+    installment_count = db.Column(db.Integer, nullable=False, default=0)
+    installment_amount = db.Column(db.Float, nullable=False, default=0.0)
+    debt_payment_count = db.Column(db.Integer, nullable=False, default=0)
+    debt_payment_amount = db.Column(db.Float, nullable=False, default=0.0)
+    default_count = db.Column(db.Integer, nullable=False, default=0)
+    cogs_amount = db.Column(db.Float, nullable=False, default=0.0, server_default='0')  # Sold units at buying price
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DailyRollup {self.day}>'
+    
+    @staticmethod
+    def record(deltas, day=None):
+        """
+        Add deltas to one day's counters when the caller's transaction
+        commits (written last, see the class docstring)
+        
+        Args:
+            deltas: Dict of counter column -> amount to add
+            day: UTC date (defaults to today)
+        """
+        defer_increment(DailyRollup, {'day': day or datetime.utcnow().date()}, deltas, last=True)
+    
+    @staticmethod
+    def record_sale(sale):
+        """
+        Apply a new sale (flushed, with sale_type, amounts and sale_date set)
+        
+        Args:
+            sale: Sale instance
+        """
+        day = (sale.sale_date or datetime.utcnow()).date()
+        if sale.sale_type == 'EMI':
+            DailyRollup.record({
+                'emi_sale_count': 1,
+                'emi_sale_amount': sale.total_amount,
+                'emi_financed_amount': sale.total_amount - sale.paid_amount,
+                'down_payment_amount': sale.paid_amount
+            }, day)
+        else:
+            DailyRollup.record({'cash_sale_count': 1, 'cash_sale_amount': sale.total_amount}, day)
+    
+    @staticmethod
+    def record_installments(count, amount):
+        """Apply ``count`` installments totalling ``amount`` collected today"""
+        DailyRollup.record({'installment_count': count, 'installment_amount': amount})
+    
+    @staticmethod
+    def record_debt_payment(amount):
+        """Apply a debt repayment received today"""
+        DailyRollup.record({'debt_payment_count': 1, 'debt_payment_amount': amount})
+    
+    @staticmethod
+    def record_defaults(count):
+        """Apply ``count`` EMIs defaulted today"""
+        DailyRollup.record({'default_count': count})
+    
+    def get_collected_amount(self):
+        """Cash received on the day: cash sales, down payments, installments and debt repayments"""
+        return (self.cash_sale_amount + self.down_payment_amount
+                + self.installment_amount + self.debt_payment_amount)
+    
+    def to_dict(self):
+        """Convert rollup row to dictionary"""
+        data = {'date': self.day.isoformat()}
+        for column in self.COUNTERS:
+            value = getattr(self, column) or 0
+            data[column] = round(float(value), 2) if column.endswith('_amount') else int(value)
+        data['sale_count'] = data['cash_sale_count'] + data['emi_sale_count']
+        data['sale_amount'] = round(data['cash_sale_amount'] + data['emi_sale_amount'], 2)
+        data['collected_amount'] = round(self.get_collected_amount(), 2)
+        data['gross_margin'] = round(data['sale_amount'] - data['cogs_amount'], 2)
+        return data
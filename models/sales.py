@@ -1,4 +1,9 @@
 from database import db
+from models.customer import CustomerSummary
+from models.payments import Installment, Payment
+from models.reports import DailyRollup
+from utils.aging import aging_bucket_for
+from services.emi_engine import add_months, schedule, principal_from_installment
 from datetime import datetime, timedelta
 
 
@@ -6,6 +11,9 @@ class Sale(db.Model):
     """Sale model for recording sales transactions"""
     
     __tablename__ = 'sale'
+    __table_args__ = (
+        db.Index('ix_sale_customer_type', 'customer_id', 'sale_type'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
@@ -18,6 +26,10 @@ class Sale(db.Model):
     # Relationship with EMI ledger (one-to-one)
     emi_ledger = db.relationship('EMI_Ledger', backref='sale', uselist=False, cascade='all, delete-orphan')
     
+    # Line items (product_id above is the first line, kept for single-item views)
+    items = db.relationship('SaleItem', backref='sale', lazy=True, cascade='all, delete-orphan',
+                            order_by='SaleItem.id')
+    
     def __repr__(self):
         return f'<Sale {self.id} - {self.sale_type} - ৳{self.total_amount}>'
     
@@ -33,6 +45,12 @@ class Sale(db.Model):
         """Check if sale is fully paid"""
         return self.paid_amount >= self.total_amount
     
+    def get_item_count(self):
+        """Total units sold in this sale"""
+        if self.items:
+            return sum(item.quantity for item in self.items)
+        return 1
+    
     def to_dict(self):
         """Convert sale to dictionary"""
         return {
@@ -45,7 +63,36 @@ class Sale(db.Model):
             'total_amount': self.total_amount,
             'paid_amount': self.paid_amount,
             'due_amount': self.calculate_due_amount(),
-            'sale_date': self.sale_date.strftime('%Y-%m-%d %H:%M:%S')
+            'sale_date': self.sale_date.strftime('%Y-%m-%d %H:%M:%S'),
+            'items': [item.to_dict() for item in self.items]
+        }
+
+
+class SaleItem(db.Model):
+    """Sale line item: one product and quantity within a sale"""
+    
+    __tablename__ = 'sale_item'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sale_id = db.Column(db.Integer, db.ForeignKey('sale.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    unit_price = db.Column(db.Float, nullable=False)
+    line_total = db.Column(db.Float, nullable=False)
+    
+    product = db.relationship('Product', lazy=True)
+    
+    def __repr__(self):
+        return f'<SaleItem {self.sale_id} - {self.product_id} x{self.quantity}>'
+    
+    def to_dict(self):
+        """Convert line item to dictionary"""
+        return {
+            'product_id': self.product_id,
+            'product_name': self.product.name if self.product else None,
+            'quantity': self.quantity,
+            'unit_price': self.unit_price,
+            'line_total': self.line_total
         }
 
 
@@ -53,52 +100,219 @@ class EMI_Ledger(db.Model):
     """EMI Ledger model for tracking installment payments"""
     
     __tablename__ = 'emi_ledger'
+    __table_args__ = (
+        db.Index('ix_emi_ledger_status_next_payment', 'status', 'next_payment_date', 'id'),
+        db.Index('ix_emi_ledger_next_payment', 'next_payment_date', 'id'),
+        db.Index('ix_emi_ledger_status_days_overdue', 'status', 'days_overdue'),
+        db.Index('ix_emi_ledger_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     sale_id = db.Column(db.Integer, db.ForeignKey('sale.id'), nullable=False, unique=True)
     total_installments = db.Column(db.Integer, nullable=False)  # Total number of months
     monthly_amount = db.Column(db.Float, nullable=False)
     interest_rate = db.Column(db.Float, default=0.0)  # Interest rate percentage (e.g., 5.0 for 5%)
+    interest_method = db.Column(db.String(10), nullable=False, default='flat', server_default='flat')  # 'flat' or 'reducing'
+    principal_amount = db.Column(db.Float, nullable=True)  # Amount financed (NULL on older ledgers)
+    schedule_start = db.Column(db.Date, nullable=True)  # Due date of installment 1 (NULL on older ledgers)
     installments_paid = db.Column(db.Integer, default=0)
     next_payment_date = db.Column(db.Date, nullable=False)
     status = db.Column(db.String(20), default='Active')  # 'Active', 'Completed', 'Defaulted'
+    days_overdue = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Kept current by the overdue sweeper
+    aging_bucket = db.Column(db.String(10), nullable=False, default='current', server_default='current')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Persisted schedule and append-only payment history
+    installments = db.relationship('Installment', backref='ledger', lazy=True, order_by='Installment.number')
+    payments = db.relationship('Payment', backref='ledger', lazy=True, order_by='Payment.id')
+    
+    # Unpaid / paid parts of the stored schedule, whose rows are rounded to paisa with
+    # the residue on the last installment (monthly_amount is the unrounded regular
+    # installment). Ledgers created before the schedule was stored fall back to
+    # monthly_amount. Usable in queries; undefer() them when loading many ledgers.
+    remaining_amount = db.column_property(
+        db.select(db.func.coalesce(db.func.sum(Installment.amount),
+                                   (total_installments - installments_paid) * monthly_amount))
+        .where(Installment.ledger_id == id, Installment.number > installments_paid)
+        .correlate_except(Installment)
+        .scalar_subquery(),
+        deferred=True
+    )
+    installments_paid_amount = db.column_property(
+        db.select(db.func.coalesce(db.func.sum(Installment.amount), installments_paid * monthly_amount))
+        .where(Installment.ledger_id == id, Installment.number <= installments_paid)
+        .correlate_except(Installment)
+        .scalar_subquery(),
+        deferred=True
+    )
+    
     def __repr__(self):
         return f'<EMI_Ledger {self.id} - {self.installments_paid}/{self.total_installments}>'
     
-    def pay_installment(self):
+    def installments_amount(self, first, last):
         """
-        Record an installment payment
+        Amount of installments ``first`` .. ``last`` from the stored schedule
+        
+        Ledgers created before the schedule was stored use monthly_amount.
+        """
+        if last < first:
+            return 0.0
+        total = db.session.query(db.func.sum(Installment.amount)).filter(
+            Installment.ledger_id == self.id,
+            Installment.number.between(first, last)
+        ).scalar()
+        if total is None:
+            return self.monthly_amount * (last - first + 1)
+        return round(float(total), 2)
+    
+    def pay_installment(self, count=1, record_summary=True, amount=None):
+        """
+        Record one or more installment payments
+        
+        The amount paid is the sum of those installments in the stored
+        schedule, so payments, balances and the schedule always agree.
+        
+        Args:
+            count: Number of installments paid at once
+            record_summary: Update the customer's balance summary and the daily
+                rollup here; batch callers pass False and apply aggregated changes
+            amount: Amount of those installments when the caller already read
+                it from the schedule (batch collections)
         
         Returns:
-            bool: True if payment recorded successfully
+            Payment: The payment recorded, or None if nothing was recorded
         """
-        if self.installments_paid < self.total_installments:
-            self.installments_paid += 1
+        if count >= 1 and self.installments_paid + count <= self.total_installments:
+            # Pin the schedule of older ledgers before the dates move
+            self.schedule_start = self.get_schedule_start()
+            first_installment = self.installments_paid + 1
+            if amount is None:
+                amount = self.installments_amount(first_installment, first_installment + count - 1)
+            self.installments_paid += count
+            db.session.expire(self, ['remaining_amount', 'installments_paid_amount'])
             
-            # Update next payment date (add 30 days)
-            self.next_payment_date = self.next_payment_date + timedelta(days=30)
+            # Next payment falls on the same day of the following calendar month(s)
+            self.next_payment_date = add_months(self.get_schedule_start(), self.installments_paid)
             
             # Update status if completed
             if self.installments_paid >= self.total_installments:
                 self.status = 'Completed'
             
             # Update sale paid amount
-            self.sale.paid_amount += self.monthly_amount
+            self.sale.paid_amount += amount
             
-            return True
-        return False
+            self.refresh_overdue()
+            
+            # Append to the payment history
+            payment = Payment(
+                kind='installment',
+                ledger_id=self.id,
+                customer_id=self.sale.customer_id,
+                installment_from=first_installment,
+                installment_to=self.installments_paid,
+                amount=amount
+            )
+            db.session.add(payment)
+            
+            # Keep the customer's balance summary and today's totals in step
+            if record_summary:
+                CustomerSummary.record_installment(
+                    self.sale.customer_id,
+                    amount,
+                    completed=self.status == 'Completed'
+                )
+                DailyRollup.record_installments(count, amount)
+            
+            return payment
+        return None
+    
+    def get_schedule_start(self):
+        """Due date of the first installment"""
+        if self.schedule_start:
+            return self.schedule_start
+        # Older ledgers moved 30 days per paid installment
+        return self.next_payment_date - timedelta(days=30 * self.installments_paid)
+    
+    def get_principal_amount(self):
+        """Amount financed by this ledger"""
+        if self.principal_amount:
+            return self.principal_amount
+        return principal_from_installment(self.monthly_amount, self.interest_rate or 0.0,
+                                          self.total_installments, self.interest_method or 'flat')
+    
+    def get_schedule(self):
+        """
+        Full installment schedule with paid flags
+        
+        Reads the persisted installment rows; ledgers created before the
+        schedule was stored fall back to the EMI engine.
+        
+        Returns:
+            list: Dicts with number, due_date, amount, principal, interest, balance, paid
+        """
+        if self.installments:
+            balance = self.get_principal_amount()
+            rows = []
+            for installment in self.installments:
+                balance -= installment.principal
+                rows.append({
+                    'number': installment.number,
+                    'due_date': installment.due_date,
+                    'amount': installment.amount,
+                    'principal': installment.principal,
+                    'interest': installment.interest,
+                    'balance': round(max(balance, 0.0), 2)
+                })
+        else:
+            rows = schedule(self.get_principal_amount(), self.interest_rate or 0.0,
+                            self.total_installments, self.get_schedule_start(),
+                            self.interest_method or 'flat')
+        for row in rows:
+            row['paid'] = row['number'] <= self.installments_paid
+        return rows
+    
+    def create_installments(self):
+        """Persist the installment schedule with one bulk insert (ledger must be flushed)"""
+        rows = schedule(self.get_principal_amount(), self.interest_rate or 0.0,
+                        self.total_installments, self.get_schedule_start(),
+                        self.interest_method or 'flat')
+        db.session.execute(db.insert(Installment), [
+            {
+                'ledger_id': self.id,
+                'number': row['number'],
+                'due_date': row['due_date'],
+                'amount': row['amount'],
+                'principal': row['principal'],
+                'interest': row['interest']
+            }
+            for row in rows
+        ])
+        db.session.expire(self, ['installments'])
+    
+    def record_opening(self, down_payment):
+        """
+        Persist a new ledger's schedule and its down payment (ledger must be flushed)
+        
+        Args:
+            down_payment: Amount paid up front at the sale
+        """
+        self.create_installments()
+        if down_payment > 0:
+            db.session.add(Payment(
+                kind='down_payment',
+                ledger_id=self.id,
+                customer_id=self.sale.customer_id,
+                amount=down_payment
+            ))
     
     def calculate_remaining_amount(self):
-        """Calculate total remaining amount to be paid"""
-        remaining_installments = self.total_installments - self.installments_paid
-        return remaining_installments * self.monthly_amount
+        """Calculate total remaining amount to be paid (unpaid installments of the schedule)"""
+        return self.remaining_amount
     
     def calculate_total_emi_amount(self):
         """Calculate total EMI amount (all installments including interest)"""
-        return self.total_installments * self.monthly_amount
+        return self.installments_amount(1, self.total_installments)
     
     def is_overdue(self):
         """Check if payment is overdue"""
@@ -113,9 +327,25 @@ class EMI_Ledger(db.Model):
             return delta.days
         return 0
     
+    def refresh_overdue(self, today=None):
+        """
+        Recompute the stored days_overdue / aging_bucket columns
+        
+        Only active ledgers carry overdue days; the sweeper does the same
+        for every ledger in bulk.
+        """
+        today = today or datetime.now().date()
+        days = (today - self.next_payment_date).days if self.status == 'Active' else 0
+        self.days_overdue = max(days, 0)
+        self.aging_bucket = aging_bucket_for(self.days_overdue)
+    
     def mark_as_defaulted(self):
         """Mark EMI as defaulted"""
+        if self.status == 'Active':
+            CustomerSummary.record_default(self.sale.customer_id)
+            DailyRollup.record_defaults(1)
         self.status = 'Defaulted'
+        self.refresh_overdue()
     
     def to_dict(self):
         """Convert EMI ledger to dictionary"""
@@ -128,6 +358,7 @@ class EMI_Ledger(db.Model):
             'total_installments': self.total_installments,
             'monthly_amount': self.monthly_amount,
             'interest_rate': self.interest_rate,
+            'interest_method': self.interest_method,
             'installments_paid': self.installments_paid,
             'installments_remaining': self.total_installments - self.installments_paid,
             'remaining_amount': self.calculate_remaining_amount(),
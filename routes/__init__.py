@@ -2,5 +2,7 @@
 from routes.inventory import inventory_bp
 from routes.pos import pos_bp
 from routes.emi_manager import emi_bp
+from routes.search import search_bp
+from routes.reports import reports_bp
 
-__all__ = ['inventory_bp', 'pos_bp', 'emi_bp']
+__all__ = ['inventory_bp', 'pos_bp', 'emi_bp', 'search_bp', 'reports_bp']
@@ -1,54 +1,57 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from models.debt import DebtRecord
+from models.payments import Payment
+from models.reports import DailyRollup
 from database import db
+from services.stats import debt_stats
+from services.pagination import paginate_request
+from services.search import search_filter
+from services.sweeper import last_sweep
+from services.cache import cached, invalidate
+from utils.http import conditional, table_version
+from services.media import allowed_file, store_upload, discard
 from datetime import datetime, date
-import os
-from werkzeug.utils import secure_filename
 
 debt_bp = Blueprint('debt', __name__, url_prefix='/debt')
 
-# Configure upload folder
-UPLOAD_FOLDER = 'static/uploads/debt_photos'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-
-@debt_bp.route('/')
-def index():
-    """Display all debt records"""
-    status_filter = request.args.get('status', 'all')
-    search = request.args.get('search', '')
-    
+def _record_list_query(status_filter='all', search=''):
+    """Base debt record query with status and name/phone filters"""
     query = DebtRecord.query
     
     # Apply filters
-    if status_filter != 'all':
+    if status_filter == 'overdue':
+        # Stored by the overdue sweeper, so this is an indexed filter
+        query = query.filter(DebtRecord.status != 'paid', DebtRecord.days_overdue > 0)
+    elif status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
     if search:
-        query = query.filter(
-            (DebtRecord.name.ilike(f'%{search}%')) |
-            (DebtRecord.phone.ilike(f'%{search}%'))
-        )
+        query = query.filter(search_filter('debt', DebtRecord.id, search))
     
-    records = query.order_by(DebtRecord.due_date.asc()).all()
+    return query
+
+
+def _record_version(*args, **kwargs):
+    """The overdue filter reads columns the sweeper rewrites without touching updated_at"""
+    return table_version(DebtRecord, extra=[last_sweep()])
+
+
+@debt_bp.route('/')
+@conditional(_record_version, daily=True)
+def index():
+    """Display debt records, one page at a time"""
+    status_filter = request.args.get('status', 'all')
+    search = request.args.get('search', '')
     
-    # Calculate statistics
-    total_amount = sum(r.amount for r in DebtRecord.query.all())
-    total_paid = sum(r.paid_amount for r in DebtRecord.query.all())
-    total_pending = total_amount - total_paid
-    overdue_count = len([r for r in records if r.is_overdue])
+    page = paginate_request(_record_list_query(status_filter, search),
+                            [DebtRecord.due_date, DebtRecord.id],
+                            request.args)
     
-    stats = {
-        'total_amount': total_amount,
-        'total_paid': total_paid,
-        'total_pending': total_pending,
-        'overdue_count': overdue_count
-    }
+    # Calculate statistics (one grouped query)
+    stats = debt_stats()
     
-    return render_template('debt/index.html', records=records, stats=stats, 
+    return render_template('debt/index.html', records=page.items, page=page, stats=stats, 
                          status_filter=status_filter, search=search)
 
 
@@ -56,19 +59,12 @@ def index():
 def add():
     """Add new debt record"""
     try:
-        # Handle file upload
+        # Handle file upload (stored under its content hash; resized in the background)
         photo_filename = None
         if 'photo' in request.files:
             file = request.files['photo']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                # Add timestamp to filename to make it unique
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                photo_filename = f"{timestamp}_{filename}"
-                
-                # Create upload directory if it doesn't exist
-                os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-                file.save(os.path.join(UPLOAD_FOLDER, photo_filename))
+                photo_filename = store_upload(file)
         
         # Create new record
         record = DebtRecord(
@@ -80,8 +76,10 @@ def add():
             photo=photo_filename,
             notes=request.form.get('notes', '')
         )
+        record.refresh_overdue()
         
         db.session.add(record)
+        invalidate('debt_stats')
         db.session.commit()
         
         flash(f'লেনদেন রেকর্ড যোগ করা হয়েছে: {record.name}', 'success')
@@ -100,32 +98,27 @@ def edit(id):
     
     if request.method == 'POST':
         try:
+            old_photo = record.photo
             record.name = request.form['name']
             record.phone = request.form['phone']
             record.address = request.form.get('address', '')
             record.amount = float(request.form['amount'])
             record.due_date = datetime.strptime(request.form['due_date'], '%Y-%m-%d').date()
             record.notes = request.form.get('notes', '')
+            record.refresh_overdue()
             
             # Handle photo update
             if 'photo' in request.files:
                 file = request.files['photo']
                 if file and file.filename and allowed_file(file.filename):
-                    # Delete old photo if exists
-                    if record.photo:
-                        old_photo_path = os.path.join(UPLOAD_FOLDER, record.photo)
-                        if os.path.exists(old_photo_path):
-                            os.remove(old_photo_path)
-                    
-                    filename = secure_filename(file.filename)
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    photo_filename = f"{timestamp}_{filename}"
-                    
-                    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-                    file.save(os.path.join(UPLOAD_FOLDER, photo_filename))
-                    record.photo = photo_filename
+                    record.photo = store_upload(file)
             
+            invalidate('debt_stats')
             db.session.commit()
+            
+            # The old photo goes once nothing points at it (off the request)
+            if old_photo != record.photo:
+                discard(old_photo)
             flash('রেকর্ড আপডেট করা হয়েছে', 'success')
             return redirect(url_for('debt.index'))
             
@@ -154,13 +147,17 @@ def payment(id):
                 return redirect(url_for('debt.payment', id=id))
             
             record.paid_amount += payment_amount
+            db.session.add(Payment(kind='debt', debt_id=record.id, amount=payment_amount))
+            DailyRollup.record_debt_payment(payment_amount)
             
             # Update status
             if record.paid_amount >= record.amount:
                 record.status = 'paid'
             elif record.paid_amount > 0:
                 record.status = 'partial'
+            record.refresh_overdue()
             
+            invalidate('debt_stats')
             db.session.commit()
             flash(f'পেমেন্ট রেকর্ড করা হয়েছে: ৳{payment_amount}', 'success')
             return redirect(url_for('debt.index'))
@@ -178,14 +175,13 @@ def delete(id):
     record = DebtRecord.query.get_or_404(id)
     
     try:
-        # Delete photo if exists
-        if record.photo:
-            photo_path = os.path.join(UPLOAD_FOLDER, record.photo)
-            if os.path.exists(photo_path):
-                os.remove(photo_path)
-        
+        photo = record.photo
         db.session.delete(record)
+        invalidate('debt_stats')
         db.session.commit()
+        
+        # Remove the photo off the request, once nothing points at it
+        discard(photo)
         flash('রেকর্ড মুছে ফেলা হয়েছে', 'success')
     except Exception as e:
         db.session.rollback()
@@ -201,19 +197,20 @@ def view(id):
     return render_template('debt/view.html', record=record)
 
 
+@debt_bp.route('/api/records')
+@conditional(_record_version, daily=True)
+def list_records_api():
+    """API endpoint to list debt records (keyset paginated by due date)"""
+    status_filter = request.args.get('status', 'all')
+    search = request.args.get('search', '')
+    page = paginate_request(_record_list_query(status_filter, search),
+                            [DebtRecord.due_date, DebtRecord.id],
+                            request.args)
+    return jsonify(page.to_dict())
+
+
 @debt_bp.route('/api/stats')
 def api_stats():
     """API endpoint for statistics"""
-    records = DebtRecord.query.all()
-    
-    stats = {
-        'total_records': len(records),
-        'total_amount': sum(r.amount for r in records),
-        'total_paid': sum(r.paid_amount for r in records),
-        'total_pending': sum(r.remaining_amount for r in records),
-        'overdue_count': len([r for r in records if r.is_overdue]),
-        'paid_count': len([r for r in records if r.status == 'paid']),
-        'pending_count': len([r for r in records if r.status == 'pending'])
-    }
-    
-    return jsonify(stats)
+    # Overdue counts depend on the date, so each day gets its own entry
+    return jsonify(cached('debt_stats', date.today().isoformat(), debt_stats))
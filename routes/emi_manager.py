@@ -1,63 +1,66 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from database import db
+from models.product import Product
 from models.sales import Sale, EMI_Ledger
 from models.customer import Customer
-from datetime import datetime, timedelta
+from models.payments import Payment
+from services.dashboard import emi_dashboard_query, load_ledger
+from services.stats import emi_stats
+from services.pagination import paginate_request
+from services.collections import collect_installments, parse_collection_csv
+from services.emi_engine import portfolio_projection
+from services.sweeper import last_sweep
+from services.cache import cached, invalidate
+from utils.http import conditional, table_version
+from datetime import date, datetime, timedelta
 
 emi_bp = Blueprint('emi', __name__, url_prefix='/emi')
 
 
+def _ledger_list_version(*args, **kwargs):
+    """Ledger lists also show customer and product names, and overdue state set by the sweeper"""
+    return table_version(EMI_Ledger, Customer, Product, extra=[last_sweep()])
+
+
+def _ledger_row_version(emi_id):
+    row = (
+        db.session.query(EMI_Ledger.updated_at, Customer.updated_at, Product.updated_at)
+        .join(Sale, EMI_Ledger.sale_id == Sale.id)
+        .join(Customer, Sale.customer_id == Customer.id)
+        .join(Product, Sale.product_id == Product.id)
+        .filter(EMI_Ledger.id == emi_id)
+        .first()
+    )
+    return tuple(row) if row else None
+
+
 @emi_bp.route('/dashboard')
+@conditional(_ledger_list_version, daily=True)
 def dashboard():
     """EMI dashboard showing all active EMIs and due list"""
     # Get filter parameters
     status_filter = request.args.get('status', 'Active')
     search_query = request.args.get('search', '')
     
-    # Base query
-    query = EMI_Ledger.query
-    
-    # Apply status filter
-    if status_filter and status_filter != 'All':
-        query = query.filter(EMI_Ledger.status == status_filter)
-    
-    # Apply search filter (customer name or phone)
-    if search_query:
-        query = query.join(Sale).join(Customer).filter(
-            db.or_(
-                Customer.name.ilike(f'%{search_query}%'),
-                Customer.phone.ilike(f'%{search_query}%')
-            )
-        )
-    
-    emi_ledgers = query.all()
-    
-    # Separate overdue EMIs
-    overdue_emis = [emi for emi in emi_ledgers if emi.is_overdue()]
-    
-    # Calculate statistics
-    total_active = EMI_Ledger.query.filter_by(status='Active').count()
-    total_completed = EMI_Ledger.query.filter_by(status='Completed').count()
-    total_defaulted = EMI_Ledger.query.filter_by(status='Defaulted').count()
-    total_overdue = len([emi for emi in EMI_Ledger.query.filter_by(status='Active').all() if emi.is_overdue()])
+    # Ledgers with sale, customer and product joined in one round trip,
+    # one page at a time ordered by next payment date
+    page = paginate_request(emi_dashboard_query(status_filter, search_query),
+                            [EMI_Ledger.next_payment_date, EMI_Ledger.id],
+                            request.args)
     
-    # Calculate total receivable amount
-    active_emis = EMI_Ledger.query.filter_by(status='Active').all()
-    total_receivable = sum(emi.calculate_remaining_amount() for emi in active_emis)
+    # Calculate statistics (one grouped query)
+    stats = emi_stats()
     
     return render_template('emi_dashboard.html',
-                         emi_ledgers=emi_ledgers,
-                         overdue_emis=overdue_emis,
+                         emi_ledgers=page.items,
+                         page=page,
                          status_filter=status_filter,
                          search_query=search_query,
-                         total_active=total_active,
-                         total_completed=total_completed,
-                         total_defaulted=total_defaulted,
-                         total_overdue=total_overdue,
-                         total_receivable=total_receivable)
+                         **stats)
 
 
 @emi_bp.route('/due-list')
+@conditional(_ledger_list_version, daily=True)
 def due_list():
     """Filter EMIs by due date"""
     # Get EMIs due this month
@@ -77,7 +80,8 @@ def due_list():
 def pay_installment(emi_id):
     """Record an installment payment"""
     try:
-        emi_ledger = EMI_Ledger.query.get_or_404(emi_id)
+        # Row lock: a concurrent payment for the same EMI waits and sees this one
+        emi_ledger = EMI_Ledger.query.filter_by(id=emi_id).with_for_update().first_or_404()
         
         # Check if EMI is active
         if emi_ledger.status != 'Active':
@@ -90,9 +94,11 @@ def pay_installment(emi_id):
             return redirect(url_for('emi.dashboard'))
         
         # Record payment
-        success = emi_ledger.pay_installment()
+        payment = emi_ledger.pay_installment()
         
-        if success:
+        if payment:
+            invalidate('emi', emi_id)
+            invalidate('emi_stats')
             db.session.commit()
             
             customer_name = emi_ledger.sale.customer.name
@@ -103,7 +109,7 @@ def pay_installment(emi_id):
             else:
                 flash(f'কিস্তি পরিশোধ সফল! অবশিষ্ট: {remaining} টি', 'success')
             
-            return redirect(url_for('emi.receipt', emi_id=emi_id))
+            return redirect(url_for('emi.receipt', emi_id=emi_id, payment_id=payment.id))
         else:
             flash('কিস্তি পরিশোধ ব্যর্থ!', 'danger')
         
@@ -114,11 +120,46 @@ def pay_installment(emi_id):
     return redirect(url_for('emi.dashboard'))
 
 
+@emi_bp.route('/api/collect', methods=['POST'])
+def collect_batch():
+    """
+    Record a batch of installment collections
+    
+    Accepts JSON (a list, or {"payments": [...]}) of {emi_id, installments}
+    rows, or a CSV upload in the ``file`` field with the same columns.
+    Returns a result for every row.
+    """
+    upload = request.files.get('file')
+    if upload:
+        try:
+            rows = parse_collection_csv(upload.stream)
+        except (UnicodeDecodeError, ValueError):
+            return jsonify({'success': False, 'error': 'অবৈধ CSV ফাইল!'}), 400
+    else:
+        data = request.get_json(silent=True)
+        rows = data.get('payments') if isinstance(data, dict) else data
+    
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'success': False, 'error': 'কোনো পেমেন্ট পাওয়া যায়নি!'}), 400
+    
+    summary = collect_installments(rows)
+    return jsonify({'success': summary['failed'] == 0, **summary})
+
+
 @emi_bp.route('/receipt/<int:emi_id>')
 def receipt(emi_id):
-    """Generate payment receipt"""
-    emi_ledger = EMI_Ledger.query.get_or_404(emi_id)
-    return render_template('emi_receipt.html', emi_ledger=emi_ledger)
+    """Generate payment receipt (for ?payment_id=, else the ledger's latest payment)"""
+    emi_ledger = load_ledger(emi_id)
+    
+    query = Payment.query.filter_by(ledger_id=emi_id, kind='installment')
+    payment_id = request.args.get('payment_id', type=int)
+    if payment_id:
+        payment = query.filter_by(id=payment_id).first_or_404()
+    else:
+        payment = query.order_by(Payment.id.desc()).first()
+    
+    return render_template('emi_receipt.html', emi_ledger=emi_ledger, payment=payment,
+                         history=emi_ledger.payments)
 
 
 @emi_bp.route('/customer/<int:customer_id>')
@@ -127,14 +168,23 @@ def customer_emi_history(customer_id):
     customer = Customer.query.get_or_404(customer_id)
     
     # Get all EMI sales for this customer
-    emi_sales = Sale.query.filter_by(
+    emi_sales = Sale.query.options(
+        db.joinedload(Sale.product),
+        db.joinedload(Sale.emi_ledger)
+    ).filter_by(
         customer_id=customer_id,
         sale_type='EMI'
     ).all()
     
+    # Most recent payments first (indexed on customer_id, paid_at)
+    payments = Payment.query.filter_by(customer_id=customer_id).order_by(
+        Payment.paid_at.desc(), Payment.id.desc()
+    ).limit(50).all()
+    
     return render_template('customer_emi_history.html', 
                          customer=customer, 
-                         emi_sales=emi_sales)
+                         emi_sales=emi_sales,
+                         payments=payments)
 
 
 @emi_bp.route('/mark-defaulted/<int:emi_id>', methods=['POST'])
@@ -145,6 +195,8 @@ def mark_defaulted(emi_id):
         
         if emi_ledger.status == 'Active':
             emi_ledger.mark_as_defaulted()
+            invalidate('emi', emi_id)
+            invalidate('emi_stats')
             db.session.commit()
             flash('EMI ডিফল্টেড হিসেবে চিহ্নিত করা হয়েছে!', 'warning')
         else:
@@ -158,27 +210,48 @@ def mark_defaulted(emi_id):
 
 
 @emi_bp.route('/api/emi/<int:emi_id>')
+@conditional(_ledger_row_version, daily=True)
 def get_emi_details(emi_id):
     """API endpoint to get EMI details"""
+    return jsonify(cached('emi', emi_id, lambda: load_ledger(emi_id).to_dict()))
+
+
+@emi_bp.route('/api/emi/<int:emi_id>/schedule')
+def get_emi_schedule(emi_id):
+    """API endpoint for a ledger's full installment schedule"""
     emi_ledger = EMI_Ledger.query.get_or_404(emi_id)
-    return jsonify(emi_ledger.to_dict())
+    rows = emi_ledger.get_schedule()
+    for row in rows:
+        row['due_date'] = row['due_date'].strftime('%Y-%m-%d')
+    return jsonify({
+        'id': emi_ledger.id,
+        'interest_method': emi_ledger.interest_method,
+        'installments_paid': emi_ledger.installments_paid,
+        'schedule': rows
+    })
+
+
+@emi_bp.route('/api/projection')
+def get_projection():
+    """API endpoint for expected collections per month over all active EMIs"""
+    months = min(max(request.args.get('months', 12, type=int), 1), 120)
+    return jsonify(portfolio_projection(months))
+
+
+@emi_bp.route('/api/ledgers')
+@conditional(_ledger_list_version, daily=True)
+def list_ledgers_api():
+    """API endpoint to list EMI ledgers (keyset paginated by next payment date)"""
+    status_filter = request.args.get('status', 'Active')
+    search_query = request.args.get('search', '')
+    page = paginate_request(emi_dashboard_query(status_filter, search_query),
+                            [EMI_Ledger.next_payment_date, EMI_Ledger.id],
+                            request.args)
+    return jsonify(page.to_dict())
 
 
 @emi_bp.route('/api/stats')
 def get_stats():
     """API endpoint for EMI statistics"""
-    total_active = EMI_Ledger.query.filter_by(status='Active').count()
-    total_completed = EMI_Ledger.query.filter_by(status='Completed').count()
-    total_defaulted = EMI_Ledger.query.filter_by(status='Defaulted').count()
-    
-    active_emis = EMI_Ledger.query.filter_by(status='Active').all()
-    total_receivable = sum(emi.calculate_remaining_amount() for emi in active_emis)
-    total_overdue = len([emi for emi in active_emis if emi.is_overdue()])
-    
-    return jsonify({
-        'total_active': total_active,
-        'total_completed': total_completed,
-        'total_defaulted': total_defaulted,
-        'total_receivable': round(total_receivable, 2),
-        'total_overdue': total_overdue
-    })
+    # Overdue counts depend on the date, so each day gets its own entry
+    return jsonify(cached('emi_stats', date.today().isoformat(), emi_stats))
@@ -1,74 +1,84 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from database import db
 from models.product import Product
+from models.sales import Sale, SaleItem
+from models.inventory import StockMovement, InventoryValuation
 from config import Config
+from services.pagination import paginate_request
+from services.search import search_filter
+from services.cache import cached, invalidate
+from utils.http import conditional, table_version
+from services.reorder import reorder_alerts
+from services.product_import import STOCK_MODES, validate_product, import_products, iter_rows
 
 inventory_bp = Blueprint('inventory', __name__, url_prefix='/inventory')
 
 
+def _product_list_query(search_query=''):
+    """Base product query with optional name/model search"""
+    query = Product.query
+    if search_query:
+        query = query.filter(search_filter('product', Product.id, search_query))
+    return query
+
+
+def _product_version(*args, **kwargs):
+    return table_version(Product)
+
+
+def _product_row_version(product_id):
+    return db.session.query(Product.updated_at).filter_by(id=product_id).scalar()
+
+
 @inventory_bp.route('/')
+@conditional(_product_version)
 def index():
-    """Display all products with stock levels"""
+    """Display products with stock levels, one page at a time"""
     # Get search query if any
     search_query = request.args.get('search', '')
     
-    if search_query:
-        products = Product.query.filter(
-            db.or_(
-                Product.name.ilike(f'%{search_query}%'),
-                Product.model.ilike(f'%{search_query}%')
-            )
-        ).all()
-    else:
-        products = Product.query.all()
-    
-    # Separate low stock products
-    low_stock_products = [p for p in products if p.is_low_stock(Config.LOW_STOCK_THRESHOLD)]
+    page = paginate_request(_product_list_query(search_query), [Product.id], request.args)
+    low_stock_count = Product.query.filter(Product.needs_reorder()).count()
     
     return render_template('inventory.html', 
-                         products=products, 
-                         low_stock_products=low_stock_products,
-                         low_stock_threshold=Config.LOW_STOCK_THRESHOLD)
+                         products=page.items, 
+                         page=page,
+                         search_query=search_query,
+                         low_stock_count=low_stock_count)
 
 
 @inventory_bp.route('/add', methods=['POST'])
 def add_product():
     """Add a new product to inventory"""
     try:
-        name = request.form.get('name')
-        model = request.form.get('model')
-        buying_price = float(request.form.get('buying_price'))
-        selling_price = float(request.form.get('selling_price'))
-        stock_quantity = int(request.form.get('stock_quantity', 0))
-        
-        # Validation
-        if not name or not model:
-            flash('পণ্যের নাম এবং মডেল আবশ্যক!', 'danger')
+        # Same rules as the bulk import
+        values, error, warning = validate_product(request.form)
+        if error:
+            flash(error, 'danger')
             return redirect(url_for('inventory.index'))
         
-        if buying_price <= 0 or selling_price <= 0:
-            flash('মূল্য অবশ্যই শূন্যের চেয়ে বেশি হতে হবে!', 'danger')
-            return redirect(url_for('inventory.index'))
+        if warning:
+            flash(warning, 'warning')
         
-        if selling_price < buying_price:
-            flash('বিক্রয় মূল্য ক্রয় মূল্যের চেয়ে কম হতে পারে না!', 'warning')
+        if Product.query.filter_by(name=values['name'], model=values['model']).first():
+            flash(f'পণ্য "{values["name"]}" ({values["model"]}) ইতিমধ্যে আছে!', 'danger')
+            return redirect(url_for('inventory.index'))
         
         # Create new product
-        product = Product(
-            name=name,
-            model=model,
-            buying_price=buying_price,
-            selling_price=selling_price,
-            stock_quantity=stock_quantity
-        )
+        product = Product(**values)
+        product.reorder_level = int(request.form.get('reorder_level') or Config.LOW_STOCK_THRESHOLD)
+        if product.reorder_level < 0:
+            flash('পুনঃক্রয় সীমা ঋণাত্মক হতে পারে না!', 'danger')
+            return redirect(url_for('inventory.index'))
         
         db.session.add(product)
+        db.session.flush()
+        StockMovement.record(product.id, 'receipt', product.stock_quantity, product.stock_quantity,
+                             product.buying_price, note='opening stock')
         db.session.commit()
         
-        flash(f'পণ্য "{name}" সফলভাবে যোগ করা হয়েছে!', 'success')
+        flash(f'পণ্য "{values["name"]}" সফলভাবে যোগ করা হয়েছে!', 'success')
         
-    except ValueError:
-        flash('অবৈধ মূল্য বা স্টক সংখ্যা!', 'danger')
     except Exception as e:
         db.session.rollback()
         flash(f'ত্রুটি: {str(e)}', 'danger')
@@ -76,6 +86,41 @@ def add_product():
     return redirect(url_for('inventory.index'))
 
 
+@inventory_bp.route('/import', methods=['POST'])
+def import_products_upload():
+    """
+    Bulk add / update products from an uploaded CSV or Excel file
+    
+    Form fields: file, stock ('add' to add quantities to known products,
+    'set' to replace them). Returns the import report as JSON with
+    ?format=json, otherwise flashes a summary.
+    """
+    wants_json = request.args.get('format') == 'json'
+    upload = request.files.get('file')
+    stock_mode = request.form.get('stock', 'add')
+    
+    try:
+        if not upload or not upload.filename:
+            raise ValueError('কোনো ফাইল পাওয়া যায়নি!')
+        if stock_mode not in STOCK_MODES:
+            raise ValueError('অবৈধ স্টক মোড!')
+        report = import_products(iter_rows(upload.stream, upload.filename), stock_mode)
+    except (ValueError, UnicodeDecodeError) as e:
+        if wants_json:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        flash(f'ইমপোর্ট ব্যর্থ: {str(e)}', 'danger')
+        return redirect(url_for('inventory.index'))
+    
+    if wants_json:
+        return jsonify({'success': report['failed'] == 0, **report})
+    
+    flash(f"ইমপোর্ট সম্পন্ন: {report['inserted']} টি নতুন, {report['updated']} টি আপডেট, "
+          f"{report['failed']} টি ব্যর্থ", 'success' if report['failed'] == 0 else 'warning')
+    for error in report['errors'][:5]:
+        flash(f"সারি {error['row']}: {error['error']}", 'danger')
+    return redirect(url_for('inventory.index'))
+
+
 @inventory_bp.route('/update/<int:product_id>', methods=['POST'])
 def update_product(product_id):
     """Update product details and stock"""
@@ -88,16 +133,34 @@ def update_product(product_id):
         if 'model' in request.form:
             product.model = request.form.get('model')
         if 'buying_price' in request.form:
-            product.buying_price = float(request.form.get('buying_price'))
+            buying_price = float(request.form.get('buying_price'))
+            # Units already in stock are now worth the new price
+            InventoryValuation.revalue(product.stock_quantity, product.buying_price, buying_price)
+            product.buying_price = buying_price
         if 'selling_price' in request.form:
             product.selling_price = float(request.form.get('selling_price'))
+        if request.form.get('reorder_level'):
+            product.reorder_level = int(request.form.get('reorder_level'))
+            if product.reorder_level < 0:
+                raise ValueError('negative reorder level')
         if 'stock_quantity' in request.form:
-            product.stock_quantity = int(request.form.get('stock_quantity'))
+            stock_quantity = int(request.form.get('stock_quantity'))
+            if stock_quantity < 0:
+                raise ValueError('negative stock')
+            # Journal the correction as an adjustment instead of overwriting the count
+            db.session.flush()
+            if Product.move_stock(product_id, stock_quantity - product.stock_quantity, 'adjustment',
+                                  note='stock count') is None:
+                raise ValueError('stock changed')
         
+        # EMI details carry the product name
+        invalidate('product', product_id)
+        invalidate('emi')
         db.session.commit()
         flash(f'পণ্য "{product.name}" আপডেট করা হয়েছে!', 'success')
         
     except ValueError:
+        db.session.rollback()
         flash('অবৈধ মূল্য বা স্টক সংখ্যা!', 'danger')
     except Exception as e:
         db.session.rollback()
@@ -113,12 +176,24 @@ def delete_product(product_id):
         product = Product.query.get_or_404(product_id)
         product_name = product.name
         
-        # Check if product has sales
-        if product.sales:
+        # Sales (as a sale's main product or a cart line) and the append-only
+        # stock journal refer to the product; one round trip checks all three
+        has_sales, has_items, has_movements = db.session.execute(db.select(
+            db.exists().where(Sale.product_id == product_id),
+            db.exists().where(SaleItem.product_id == product_id),
+            db.exists().where(StockMovement.product_id == product_id)
+        )).one()
+        if has_sales or has_items:
             flash(f'পণ্য "{product_name}" মুছে ফেলা যাবে না কারণ এটির বিক্রয় রেকর্ড রয়েছে!', 'danger')
             return redirect(url_for('inventory.index'))
+        if has_movements:
+            flash(f'পণ্য "{product_name}" মুছে ফেলা যাবে না কারণ এটির স্টক ইতিহাস রয়েছে!', 'danger')
+            return redirect(url_for('inventory.index'))
         
+        # Rows from before the journal may still carry unjournaled stock
+        InventoryValuation.apply(-product.stock_quantity, -product.stock_quantity * product.buying_price)
         db.session.delete(product)
+        invalidate('product', product_id)
         db.session.commit()
         
         flash(f'পণ্য "{product_name}" মুছে ফেলা হয়েছে!', 'success')
@@ -130,21 +205,103 @@ def delete_product(product_id):
     return redirect(url_for('inventory.index'))
 
 
+@inventory_bp.route('/stock/<int:product_id>', methods=['POST'])
+def move_stock(product_id):
+    """
+    Receive, take back or correct stock for a product
+    
+    Form fields: kind ('receipt', 'return' or 'adjustment'), quantity
+    (positive for receipts and returns, signed for adjustments), note.
+    """
+    try:
+        product = Product.query.get_or_404(product_id)
+        kind = request.form.get('kind', 'receipt')
+        quantity = int(request.form.get('quantity'))
+        
+        if kind not in ('receipt', 'return', 'adjustment'):
+            flash('অবৈধ স্টক এন্ট্রি!', 'danger')
+            return redirect(url_for('inventory.index'))
+        if quantity == 0 or (kind != 'adjustment' and quantity < 0):
+            flash('অবৈধ স্টক সংখ্যা!', 'danger')
+            return redirect(url_for('inventory.index'))
+        
+        if Product.move_stock(product_id, quantity, kind, note=request.form.get('note') or None) is None:
+            db.session.rollback()
+            flash(f'পণ্য "{product.name}" এর স্টক শূন্যের নিচে যেতে পারে না!', 'danger')
+            return redirect(url_for('inventory.index'))
+        
+        invalidate('product', product_id)
+        db.session.commit()
+        flash(f'পণ্য "{product.name}" এর স্টক আপডেট করা হয়েছে!', 'success')
+        
+    except (TypeError, ValueError):
+        flash('অবৈধ স্টক সংখ্যা!', 'danger')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'ত্রুটি: {str(e)}', 'danger')
+    
+    return redirect(url_for('inventory.index'))
+
+
 @inventory_bp.route('/low-stock')
+@conditional(_product_version)
 def low_stock():
     """View products with low stock"""
-    products = Product.query.all()
-    low_stock_products = [p for p in products if p.is_low_stock(Config.LOW_STOCK_THRESHOLD)]
+    query = Product.query.filter(Product.needs_reorder())
+    page = paginate_request(query, [Product.id], request.args)
+    low_stock_count = query.count()
     
     return render_template('inventory.html', 
-                         products=low_stock_products, 
-                         low_stock_products=low_stock_products,
-                         low_stock_threshold=Config.LOW_STOCK_THRESHOLD,
+                         products=page.items, 
+                         page=page,
+                         low_stock_count=low_stock_count,
                          show_low_stock_only=True)
 
 
+def _product_dict(product_id):
+    product = db.session.get(Product, product_id)
+    return product.to_dict() if product else None
+
+
 @inventory_bp.route('/api/product/<int:product_id>')
+@conditional(_product_row_version, last_modified=True)
 def get_product_api(product_id):
     """API endpoint to get product details"""
-    product = Product.query.get_or_404(product_id)
-    return jsonify(product.to_dict())
+    data = cached('product', product_id, lambda: _product_dict(product_id))
+    if data is None:
+        abort(404)
+    return jsonify(data)
+
+
+@inventory_bp.route('/api/products')
+@conditional(_product_version)
+def list_products_api():
+    """API endpoint to list products (keyset paginated by id)"""
+    search_query = request.args.get('search', '')
+    page = paginate_request(_product_list_query(search_query), [Product.id], request.args)
+    return jsonify(page.to_dict())
+
+
+@inventory_bp.route('/api/reorder-alerts')
+def reorder_alerts_api():
+    """
+    API endpoint for products at or below their reorder level, with
+    suggested order quantities (polled by the home page)
+    
+    Query args: limit (default 20, at most 100).
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    return jsonify(reorder_alerts(limit))
+
+
+@inventory_bp.route('/api/product/<int:product_id>/movements')
+def list_movements_api(product_id):
+    """API endpoint to list a product's stock movements, oldest first (keyset paginated by id)"""
+    if db.session.get(Product, product_id) is None:
+        abort(404)
+    page = paginate_request(StockMovement.query.filter_by(product_id=product_id),
+                            [StockMovement.id], request.args)
+    return jsonify(page.to_dict())
@@ -0,0 +1,34 @@
+from flask import Blueprint, abort, current_app, send_file
+from services.media import VARIANTS, is_media_key, media_path
+import os
+
+media_bp = Blueprint('media', __name__, url_prefix='/media')
+
+
+@media_bp.route('/<variant>/<key>')
+def serve(variant, key):
+    """
+    Serve a stored photo or one of its resized copies
+    
+    Keys are content hashes, so a URL always names the same bytes and is
+    cached by browsers for MEDIA_MAX_AGE without revalidation. While a
+    resized copy is still being made the original is sent instead, with
+    no-cache so the copy is picked up once it exists.
+    """
+    if not is_media_key(key) or (variant != 'original' and variant not in VARIANTS):
+        abort(404)
+    
+    path = media_path(key, None if variant == 'original' else variant)
+    final = os.path.exists(path)
+    if not final:
+        path = media_path(key)
+        if not os.path.exists(path):
+            abort(404)
+    
+    response = send_file(path, max_age=current_app.config.get('MEDIA_MAX_AGE', 31536000) if final else 0)
+    if final:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
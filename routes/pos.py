@@ -1,57 +1,189 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from database import db
 from models.product import Product
-from models.customer import Customer
-from models.sales import Sale, EMI_Ledger
-from datetime import datetime, timedelta
+from models.customer import Customer, CustomerSummary
+from models.sales import Sale, SaleItem, EMI_Ledger
+from models.reports import DailyRollup
+from datetime import datetime
+import numpy as np
 from config import Config
+from services.search import search, search_filter
+from services.emi_engine import METHODS, add_months, quote, quote_many
+from utils.http import cached_json
+from services.cache import invalidate
 
 pos_bp = Blueprint('pos', __name__, url_prefix='/pos')
 
+# Largest what-if grid priced in one request
+MAX_WHAT_IF = 5000
+
 
 @pos_bp.route('/')
 def index():
-    """POS interface for making sales"""
-    products = Product.query.filter(Product.stock_quantity > 0).all()
-    customers = Customer.query.all()
+    """POS interface for making sales (products and customers load on demand)"""
     emi_periods = Config.DEFAULT_EMI_PERIODS
     
     return render_template('sell_product.html', 
-                         products=products, 
-                         customers=customers,
                          emi_periods=emi_periods)
 
 
+def _emi_period_error(period):
+    """Error message for an EMI period above Config.MAX_EMI_PERIOD, None otherwise"""
+    if period > Config.MAX_EMI_PERIOD:
+        return f'কিস্তির মেয়াদ সর্বোচ্চ {Config.MAX_EMI_PERIOD} মাস'
+    return None
+
+
+def _typeahead_limit():
+    """Result limit for the autocomplete endpoints"""
+    return max(1, min(request.args.get('limit', 10, type=int), 25))
+
+
+def _prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+@pos_bp.route('/api/customers')
+def customer_typeahead():
+    """API endpoint for the POS customer picker"""
+    term = request.args.get('q', '').strip()
+    limit = _typeahead_limit()
+    
+    if not term:
+        customers = Customer.query.order_by(Customer.id.desc()).limit(limit).all()
+    elif term.isdigit():
+        # Phone prefix: range scan on the unique phone index
+        customers = Customer.query.filter(
+            Customer.phone >= term,
+            Customer.phone < _prefix_upper_bound(term)
+        ).order_by(Customer.phone).limit(limit).all()
+    else:
+        ids = [row_id for row_id, _ in search('customer', term, limit)]
+        rows = {c.id: c for c in Customer.query.filter(Customer.id.in_(ids)).all()} if ids else {}
+        customers = [rows[row_id] for row_id in ids if row_id in rows]
+    
+    return cached_json({
+        'items': [{
+            'id': c.id,
+            'name': c.name,
+            'phone': c.phone,
+            'address': c.address or '',
+            'nid_number': c.nid_number or ''
+        } for c in customers]
+    })
+
+
+@pos_bp.route('/api/products')
+def product_typeahead():
+    """API endpoint for the POS product picker (in-stock products only)"""
+    term = request.args.get('q', '').strip()
+    limit = _typeahead_limit()
+    
+    query = Product.query.filter(Product.stock_quantity > 0)
+    if term:
+        query = query.filter(search_filter('product', Product.id, term))
+    products = query.order_by(Product.name, Product.id).limit(limit).all()
+    
+    return cached_json({
+        'items': [{
+            'id': p.id,
+            'name': p.name,
+            'model': p.model,
+            'selling_price': p.selling_price,
+            'stock_quantity': p.stock_quantity
+        } for p in products]
+    })
+
+
+def _get_or_create_customer(data, require_nid=False):
+    """
+    Resolve the sale's customer from submitted data
+    
+    Args:
+        data: Form or JSON mapping with customer_id or customer_* fields
+        require_nid: True for EMI sales (NID is mandatory for new customers)
+    
+    Returns:
+        tuple: (Customer or None, error message or None)
+    """
+    customer_id = data.get('customer_id')
+    if customer_id:
+        try:
+            customer_id = int(customer_id)
+        except (TypeError, ValueError):
+            return None, 'অবৈধ ক্রেতা!'
+        customer = Customer.query.get(customer_id)
+        if customer is None:
+            return None, 'ক্রেতা পাওয়া যায়নি!'
+        return customer, None
+    
+    customer_name = data.get('customer_name')
+    customer_phone = data.get('customer_phone')
+    customer_nid = data.get('customer_nid', '')
+    
+    if not customer_name or not customer_phone:
+        return None, 'ক্রেতার নাম এবং ফোন নম্বর আবশ্যক!'
+    
+    if require_nid and not customer_nid:
+        return None, 'EMI বিক্রয়ের জন্য NID নম্বর আবশ্যক!'
+    
+    # Check if phone already exists
+    customer = Customer.query.filter_by(phone=customer_phone).first()
+    if customer:
+        # Update NID if not set
+        if customer_nid and not customer.nid_number:
+            customer.nid_number = customer_nid
+        return customer, None
+    
+    customer = Customer(
+        name=customer_name,
+        phone=customer_phone,
+        address=data.get('customer_address', ''),
+        nid_number=customer_nid or None
+    )
+    db.session.add(customer)
+    db.session.flush()  # Get customer ID
+    return customer, None
+
+
+def _new_emi_ledger(sale_id, total_price, down_payment, emi_period, interest_rate, interest_method='flat'):
+    """
+    Build the EMI ledger for a sale from the EMI engine's quote
+    
+    Installments fall due on the same day of each calendar month,
+    starting one month from today.
+    
+    Raises:
+        ValueError: If the terms are invalid
+    """
+    offer = quote(total_price, down_payment, emi_period, interest_rate, interest_method)
+    first_due_date = add_months(datetime.now().date(), 1)
+    return EMI_Ledger(
+        sale_id=sale_id,
+        total_installments=emi_period,
+        monthly_amount=offer['exact_monthly_amount'],
+        interest_rate=interest_rate,
+        interest_method=interest_method,
+        principal_amount=offer['principal_amount'],
+        schedule_start=first_due_date,
+        installments_paid=0,
+        next_payment_date=first_due_date,
+        status='Active'
+    )
+
+
 @pos_bp.route('/cash-sale', methods=['POST'])
 def cash_sale():
     """Process a cash sale (full payment)"""
     try:
         product_id = int(request.form.get('product_id'))
-        customer_id = request.form.get('customer_id')
-        customer_name = request.form.get('customer_name')
-        customer_phone = request.form.get('customer_phone')
         
         # Get or create customer
-        if customer_id:
-            customer = Customer.query.get(int(customer_id))
-        else:
-            # Create new customer
-            if not customer_name or not customer_phone:
-                flash('ক্রেতার নাম এবং ফোন নম্বর আবশ্যক!', 'danger')
-                return redirect(url_for('pos.index'))
-            
-            # Check if phone already exists
-            existing_customer = Customer.query.filter_by(phone=customer_phone).first()
-            if existing_customer:
-                customer = existing_customer
-            else:
-                customer = Customer(
-                    name=customer_name,
-                    phone=customer_phone,
-                    address=request.form.get('customer_address', '')
-                )
-                db.session.add(customer)
-                db.session.flush()  # Get customer ID
+        customer, error = _get_or_create_customer(request.form)
+        if error:
+            flash(error, 'danger')
+            return redirect(url_for('pos.index'))
         
         # Get product
         product = Product.query.get_or_404(product_id)
@@ -70,10 +202,21 @@ def cash_sale():
             paid_amount=product.selling_price
         )
         
-        # Update stock
-        product.update_stock(1, 'subtract')
-        
         db.session.add(sale)
+        db.session.flush()
+        
+        # Take the unit atomically; another counter may have sold it meanwhile
+        if Product.reserve_stock(product.id, 1, sale_id=sale.id) is None:
+            db.session.rollback()
+            flash(f'পণ্য "{product.name}" স্টকে নেই!', 'danger')
+            return redirect(url_for('pos.index'))
+        
+        db.session.add(SaleItem(sale_id=sale.id, product_id=product.id, quantity=1,
+                                unit_price=product.selling_price, line_total=product.selling_price))
+        
+        CustomerSummary.record_sale(customer.id, sale.total_amount, sale_date=sale.sale_date)
+        DailyRollup.record_sale(sale)
+        invalidate('product', product.id)
         db.session.commit()
         
         flash(f'নগদ বিক্রয় সফল! বিল নম্বর: {sale.id}', 'success')
@@ -93,45 +236,23 @@ def emi_sale():
     """Process an EMI sale with down payment"""
     try:
         product_id = int(request.form.get('product_id'))
-        customer_id = request.form.get('customer_id')
-        customer_name = request.form.get('customer_name')
-        customer_phone = request.form.get('customer_phone')
-        customer_address = request.form.get('customer_address', '')
-        customer_nid = request.form.get('customer_nid', '')
         
         down_payment = float(request.form.get('down_payment', 0))
         emi_period = int(request.form.get('emi_period'))  # Number of months
         interest_rate = float(request.form.get('interest_rate', 0))  # Interest rate percentage
+        interest_method = request.form.get('interest_method', 'flat')
+        if emi_period < 1 or interest_rate < 0 or interest_method not in METHODS:
+            raise ValueError('emi terms')
+        period_error = _emi_period_error(emi_period)
+        if period_error:
+            flash(period_error, 'danger')
+            return redirect(url_for('pos.index'))
         
-        # Get or create customer
-        if customer_id:
-            customer = Customer.query.get(int(customer_id))
-        else:
-            # Create new customer (NID required for EMI)
-            if not customer_name or not customer_phone:
-                flash('ক্রেতার নাম এবং ফোন নম্বর আবশ্যক!', 'danger')
-                return redirect(url_for('pos.index'))
-            
-            if not customer_nid:
-                flash('EMI বিক্রয়ের জন্য NID নম্বর আবশ্যক!', 'danger')
-                return redirect(url_for('pos.index'))
-            
-            # Check if phone already exists
-            existing_customer = Customer.query.filter_by(phone=customer_phone).first()
-            if existing_customer:
-                customer = existing_customer
-                # Update NID if not set
-                if not customer.nid_number:
-                    customer.nid_number = customer_nid
-            else:
-                customer = Customer(
-                    name=customer_name,
-                    phone=customer_phone,
-                    address=customer_address,
-                    nid_number=customer_nid
-                )
-                db.session.add(customer)
-                db.session.flush()
+        # Get or create customer (NID required for new EMI customers)
+        customer, error = _get_or_create_customer(request.form, require_nid=True)
+        if error:
+            flash(error, 'danger')
+            return redirect(url_for('pos.index'))
         
         # Get product
         product = Product.query.get_or_404(product_id)
@@ -146,18 +267,6 @@ def emi_sale():
             flash('ডাউন পেমেন্ট অবৈধ!', 'danger')
             return redirect(url_for('pos.index'))
         
-        # Calculate EMI with interest (Flat Rate Method)
-        principal_amount = product.selling_price - down_payment
-        
-        # Calculate total interest
-        total_interest = (principal_amount * interest_rate * emi_period) / (100 * 12)
-        
-        # Total amount to be paid in installments
-        total_emi_amount = principal_amount + total_interest
-        
-        # Monthly installment
-        monthly_amount = total_emi_amount / emi_period
-        
         # Create sale
         sale = Sale(
             customer_id=customer.id,
@@ -171,21 +280,27 @@ def emi_sale():
         db.session.flush()  # Get sale ID
         
         # Create EMI ledger
-        next_payment_date = datetime.now().date() + timedelta(days=30)
-        emi_ledger = EMI_Ledger(
-            sale_id=sale.id,
-            total_installments=emi_period,
-            monthly_amount=monthly_amount,
-            interest_rate=interest_rate,
-            installments_paid=0,
-            next_payment_date=next_payment_date,
-            status='Active'
-        )
+        emi_ledger = _new_emi_ledger(sale.id, product.selling_price, down_payment,
+                                     emi_period, interest_rate, interest_method)
         
-        # Update stock
-        product.update_stock(1, 'subtract')
+        # Take the unit atomically; another counter may have sold it meanwhile
+        if Product.reserve_stock(product.id, 1, sale_id=sale.id) is None:
+            db.session.rollback()
+            flash(f'পণ্য "{product.name}" স্টকে নেই!', 'danger')
+            return redirect(url_for('pos.index'))
         
         db.session.add(emi_ledger)
+        db.session.add(SaleItem(sale_id=sale.id, product_id=product.id, quantity=1,
+                                unit_price=product.selling_price, line_total=product.selling_price))
+        db.session.flush()
+        emi_ledger.record_opening(down_payment)
+        
+        CustomerSummary.record_sale(customer.id, sale.total_amount,
+                                    due_amount=emi_ledger.calculate_total_emi_amount(),
+                                    is_emi=True, sale_date=sale.sale_date)
+        DailyRollup.record_sale(sale)
+        invalidate('product', product.id)
+        invalidate('emi_stats')
         db.session.commit()
         
         flash(f'EMI বিক্রয় সফল! বিল নম্বর: {sale.id}', 'success')
@@ -200,46 +315,199 @@ def emi_sale():
     return redirect(url_for('pos.index'))
 
 
-@pos_bp.route('/invoice/<int:sale_id>')
-def invoice(sale_id):
-    """Display invoice for a sale"""
-    sale = Sale.query.get_or_404(sale_id)
-    return render_template('invoice.html', sale=sale)
+def _parse_cart(items):
+    """
+    Merge cart lines into {product_id: quantity}
+    
+    Raises:
+        ValueError: If a line has a missing product or a quantity below 1
+    """
+    cart = {}
+    for line in items or []:
+        product_id = int(line['product_id'])
+        quantity = int(line.get('quantity', 1))
+        if quantity < 1:
+            raise ValueError('quantity')
+        cart[product_id] = cart.get(product_id, 0) + quantity
+    if not cart:
+        raise ValueError('empty cart')
+    return cart
 
 
-@pos_bp.route('/calculate-emi', methods=['POST'])
-def calculate_emi():
-    """API endpoint to calculate EMI details"""
+@pos_bp.route('/checkout', methods=['POST'])
+def checkout():
+    """
+    Process a multi-item cart sale (cash or EMI) in one transaction
+    
+    Expects JSON: items [{product_id, quantity}], sale_type ('Cash'/'EMI'),
+    customer_id or customer_* fields, and for EMI down_payment, emi_period
+    and interest_rate.
+    """
+    data = request.get_json(silent=True) or {}
+    
     try:
-        total_price = float(request.json.get('total_price'))
-        down_payment = float(request.json.get('down_payment', 0))
-        emi_period = int(request.json.get('emi_period'))
-        interest_rate = float(request.json.get('interest_rate', 0))
+        cart = _parse_cart(data.get('items'))
+        sale_type = data.get('sale_type', 'Cash')
+        if sale_type not in ('Cash', 'EMI'):
+            return jsonify({'success': False, 'error': 'অবৈধ বিক্রয়ের ধরন!'}), 400
+        if sale_type == 'EMI':
+            down_payment = float(data.get('down_payment', 0))
+            emi_period = int(data.get('emi_period'))
+            interest_rate = float(data.get('interest_rate', 0))
+            interest_method = data.get('interest_method', 'flat')
+            if emi_period < 1 or interest_rate < 0 or interest_method not in METHODS:
+                raise ValueError('emi terms')
+            period_error = _emi_period_error(emi_period)
+            if period_error:
+                return jsonify({'success': False, 'error': period_error}), 400
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'অবৈধ ডেটা!'}), 400
+    
+    try:
+        # One query for every product in the cart
+        products = {p.id: p for p in Product.query.filter(Product.id.in_(list(cart))).all()}
+        missing = [product_id for product_id in cart if product_id not in products]
+        if missing:
+            return jsonify({'success': False, 'error': f'পণ্য পাওয়া যায়নি: {missing}'}), 404
         
-        principal_amount = total_price - down_payment
+        customer, error = _get_or_create_customer(data, require_nid=(sale_type == 'EMI'))
+        if error:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': error}), 400
         
-        # Calculate interest (Flat Rate Method)
-        total_interest = (principal_amount * interest_rate * emi_period) / (100 * 12)
+        total_amount = sum(products[pid].selling_price * qty for pid, qty in cart.items())
         
-        # Total EMI amount
-        total_emi_amount = principal_amount + total_interest
+        if sale_type == 'EMI' and (down_payment < 0 or down_payment >= total_amount):
+            db.session.rollback()
+            return jsonify({'success': False, 'error': 'ডাউন পেমেন্ট অবৈধ!'}), 400
         
-        # Monthly installment
-        monthly_amount = total_emi_amount / emi_period
+        first_product_id = next(iter(cart))
+        sale = Sale(
+            customer_id=customer.id,
+            product_id=first_product_id,
+            sale_type=sale_type,
+            total_amount=total_amount,
+            paid_amount=down_payment if sale_type == 'EMI' else total_amount
+        )
+        db.session.add(sale)
+        db.session.flush()  # Get sale ID
+        
+        # Take stock for every line; ascending product order keeps row locks deadlock-free
+        for product_id in sorted(cart):
+            if Product.reserve_stock(product_id, cart[product_id], sale_id=sale.id) is None:
+                db.session.rollback()
+                product = db.session.get(Product, product_id)
+                return jsonify({
+                    'success': False,
+                    'error': f'পণ্য "{product.name}" পর্যাপ্ত স্টকে নেই!',
+                    'product_id': product_id,
+                    'available': product.stock_quantity
+                }), 409
+        
+        # Bulk insert the line items
+        db.session.execute(db.insert(SaleItem), [
+            {
+                'sale_id': sale.id,
+                'product_id': product_id,
+                'quantity': quantity,
+                'unit_price': products[product_id].selling_price,
+                'line_total': products[product_id].selling_price * quantity
+            }
+            for product_id, quantity in cart.items()
+        ])
+        
+        due_amount = 0.0
+        if sale_type == 'EMI':
+            emi_ledger = _new_emi_ledger(sale.id, total_amount, down_payment,
+                                         emi_period, interest_rate, interest_method)
+            db.session.add(emi_ledger)
+            db.session.flush()
+            emi_ledger.record_opening(down_payment)
+            due_amount = emi_ledger.calculate_total_emi_amount()
+        
+        CustomerSummary.record_sale(customer.id, total_amount, due_amount=due_amount,
+                                    is_emi=(sale_type == 'EMI'), sale_date=sale.sale_date)
+        DailyRollup.record_sale(sale)
+        invalidate('product', *cart)
+        if sale_type == 'EMI':
+            invalidate('emi_stats')
+        db.session.commit()
         
         return jsonify({
             'success': True,
-            'total_price': total_price,
-            'down_payment': down_payment,
-            'principal_amount': principal_amount,
-            'interest_rate': interest_rate,
-            'total_interest': round(total_interest, 2),
-            'total_emi_amount': round(total_emi_amount, 2),
-            'emi_period': emi_period,
-            'monthly_amount': round(monthly_amount, 2)
+            'sale_id': sale.id,
+            'total_amount': total_amount,
+            'invoice_url': url_for('pos.invoice', sale_id=sale.id)
         })
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@pos_bp.route('/invoice/<int:sale_id>')
+def invoice(sale_id):
+    """Display invoice for a sale"""
+    sale = Sale.query.options(
+        db.joinedload(Sale.customer),
+        db.selectinload(Sale.items).joinedload(SaleItem.product)
+    ).filter(Sale.id == sale_id).first_or_404()
+    return render_template('invoice.html', sale=sale)
+
+
+@pos_bp.route('/calculate-emi', methods=['POST'])
+def calculate_emi():
+    """API endpoint to calculate EMI details"""
+    try:
+        emi_period = int(request.json.get('emi_period'))
+        period_error = _emi_period_error(emi_period)
+        if period_error:
+            return jsonify({'success': False, 'error': period_error}), 400
+        offer = quote(
+            float(request.json.get('total_price')),
+            float(request.json.get('down_payment', 0)),
+            emi_period,
+            float(request.json.get('interest_rate', 0)),
+            request.json.get('interest_method', 'flat')
+        )
+        offer.pop('exact_monthly_amount')
+        return jsonify({'success': True, **offer})
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 400
+
+
+@pos_bp.route('/api/emi-what-if', methods=['POST'])
+def emi_what_if():
+    """
+    Price every combination of EMI terms in one request
+    
+    Expects JSON: total_price plus lists down_payments, periods, rates and
+    optionally methods (default ['flat']). Returns one offer per
+    combination, priced together by the vectorized EMI engine.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        total_price = float(data['total_price'])
+        down_payments = [float(value) for value in data.get('down_payments', [0])]
+        periods = [int(value) for value in data.get('periods', Config.DEFAULT_EMI_PERIODS)]
+        rates = [float(value) for value in data.get('rates', [0])]
+        methods = [str(value) for value in data.get('methods', ['flat'])]
+        period_error = _emi_period_error(max(periods, default=0))
+        if period_error:
+            return jsonify({'success': False, 'error': period_error}), 400
+        
+        combinations = len(down_payments) * len(periods) * len(rates) * len(methods)
+        if combinations == 0 or combinations > MAX_WHAT_IF:
+            return jsonify({'success': False, 'error': f'১ থেকে {MAX_WHAT_IF} টি কম্বিনেশন দিন'}), 400
+        
+        # Cartesian grid, flattened to one loan per combination
+        grid = np.meshgrid(np.array(down_payments), np.array(periods), np.array(rates),
+                           np.array(methods, dtype=object), indexing='ij')
+        offers = quote_many(total_price, *[axis.ravel() for axis in grid])
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({'success': True, 'count': len(offers), 'offers': offers})
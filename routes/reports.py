@@ -0,0 +1,172 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context, abort
+from services.receivables import aging_report
+from services.collections import daily_collections
+from services.rollups import daily_rollups, rollup_totals
+from services.export import DATASETS, iter_csv
+from services.valuation import valuation_report
+from datetime import date, datetime, timedelta
+import csv
+import io
+
+reports_bp = Blueprint('reports', __name__, url_prefix='/reports')
+
+# Longest date range served by the daily reports
+MAX_RANGE_DAYS = 366
+
+
+def _date_range(default_days=30):
+    """
+    Read the from / to query args of a daily report
+    
+    Days are UTC dates, like the stored timestamps. Defaults to the last
+    ``default_days`` days ending today.
+    
+    Returns:
+        tuple: (start, end, None) or (None, None, error response)
+    """
+    try:
+        end = (datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to')
+               else datetime.utcnow().date())
+        start = (datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from')
+                 else end - timedelta(days=default_days - 1))
+    except ValueError:
+        return None, None, (jsonify({'success': False, 'error': 'অবৈধ তারিখ!'}), 400)
+    
+    if start > end:
+        return None, None, (jsonify({'success': False, 'error': 'শুরুর তারিখ শেষের তারিখের পরে হতে পারে না!'}), 400)
+    if (end - start).days >= MAX_RANGE_DAYS:
+        return None, None, (jsonify({'success': False, 'error': f'সর্বোচ্চ {MAX_RANGE_DAYS} দিনের রিপোর্ট দেখা যায়!'}), 400)
+    return start, end, None
+
+
+@reports_bp.route('/receivables-aging', methods=['GET', 'POST'])
+def receivables_aging():
+    """
+    Receivables aging report (EMI ledgers and debt records by days overdue)
+    
+    GET serves the stored snapshot (refreshed nightly and by
+    ``flask snapshot-receivables``); POST refreshes today's first.
+    Query args: date (YYYY-MM-DD, defaults to today) and format ('json'
+    or 'csv').
+    """
+    try:
+        as_of = datetime.strptime(request.args['date'], '%Y-%m-%d').date() if request.args.get('date') else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'অবৈধ তারিখ!'}), 400
+    
+    if as_of and as_of > date.today():
+        return jsonify({'success': False, 'error': 'ভবিষ্যতের তারিখের রিপোর্ট হয় না!'}), 400
+    
+    report = aging_report(as_of, refresh=request.method == 'POST')
+    if report is None:
+        return jsonify({'success': False, 'error': 'এই তারিখের কোনো স্ন্যাপশট নেই!'}), 404
+    
+    if request.args.get('format') == 'csv':
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['source', 'bucket', 'count', 'amount'])
+        for row in report['rows']:
+            writer.writerow([row['source'], row['bucket'], row['count'], row['amount']])
+        for bucket in report['buckets']:
+            writer.writerow(['total', bucket, report['counts'][bucket], report['totals'][bucket]])
+        
+        return Response(
+            output.getvalue(),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f"attachment; filename=receivables_aging_{report['as_of']}.csv"}
+        )
+    
+    return jsonify({'success': True, **report})
+
+
+@reports_bp.route('/collections')
+def collections():
+    """
+    Daily cash collections (installments, down payments, debt repayments)
+    
+    Query args: from / to (YYYY-MM-DD, default the last 30 days ending
+    today) and format ('json' or 'csv').
+    """
+    start, end, error = _date_range()
+    if error:
+        return error
+    
+    report = daily_collections(start, end)
+    
+    if request.args.get('format') == 'csv':
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['date', 'payments'] + report['kinds'] + ['total'])
+        for row in report['days']:
+            writer.writerow([row['date'], row['payments']] + [row[kind] for kind in report['kinds']] + [row['total']])
+        writer.writerow(['total', ''] + [report['totals'][kind] for kind in report['kinds']] + [report['total']])
+        
+        return Response(
+            output.getvalue(),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f"attachment; filename=collections_{report['from']}_{report['to']}.csv"}
+        )
+    
+    return jsonify({'success': True, **report})
+
+
+@reports_bp.route('/daily')
+def daily():
+    """
+    Per-day sales and collection totals from the daily rollup (for charts)
+    
+    Query args: from / to (YYYY-MM-DD, default the last 30 days ending
+    today).
+    """
+    start, end, error = _date_range()
+    if error:
+        return error
+    
+    days = daily_rollups(start, end)
+    return jsonify({
+        'success': True,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'days': days,
+        'totals': rollup_totals(days)
+    })
+
+
+@reports_bp.route('/inventory-valuation')
+def inventory_valuation():
+    """
+    Stock on hand at buying price, with cost of goods sold and gross
+    margin per day
+    
+    Query args: from / to (YYYY-MM-DD, default the last 30 days ending
+    today).
+    """
+    start, end, error = _date_range()
+    if error:
+        return error
+    
+    return jsonify({
+        'success': True,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        **valuation_report(start, end)
+    })
+
+
+@reports_bp.route('/export/<dataset>')
+def export(dataset):
+    """
+    Stream a full CSV export of products, sales or EMI ledgers
+    
+    The response is written while rows are read, so large tables download
+    without being held in memory.
+    """
+    if dataset not in DATASETS:
+        abort(404)
+    
+    stamp = datetime.now().strftime('%Y%m%d_%H%M')
+    return Response(
+        stream_with_context(iter_csv(dataset)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={dataset}_{stamp}.csv'}
+    )
@@ -0,0 +1,79 @@
+from flask import Blueprint, request, jsonify, url_for
+from models.customer import Customer
+from models.product import Product
+from models.debt import DebtRecord
+from services.search import search, get_backend
+import time
+
+search_bp = Blueprint('search', __name__, url_prefix='/search')
+
+
+def _customer_result(customer):
+    return {
+        'id': customer.id,
+        'name': customer.name,
+        'phone': customer.phone,
+        'url': url_for('emi.customer_emi_history', customer_id=customer.id)
+    }
+
+
+def _product_result(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'model': product.model,
+        'selling_price': product.selling_price,
+        'stock_quantity': product.stock_quantity
+    }
+
+
+def _debt_result(record):
+    return {
+        'id': record.id,
+        'name': record.name,
+        'phone': record.phone,
+        'status': record.status,
+        'remaining_amount': record.remaining_amount,
+        'url': url_for('debt.view', id=record.id)
+    }
+
+
+# entity -> (result key, model, serializer)
+SEARCH_TYPES = {
+    'customer': ('customers', Customer, _customer_result),
+    'product': ('products', Product, _product_result),
+    'debt': ('debts', DebtRecord, _debt_result),
+}
+
+
+@search_bp.route('/')
+def search_api():
+    """API endpoint for ranked customer / product / debt search"""
+    term = request.args.get('q', '').strip()
+    search_type = request.args.get('type', 'all')
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    
+    if search_type != 'all' and search_type not in SEARCH_TYPES:
+        return jsonify({'success': False, 'error': 'অবৈধ সার্চ টাইপ'}), 400
+    
+    started = time.perf_counter()
+    results = {}
+    
+    if term:
+        types = SEARCH_TYPES if search_type == 'all' else {search_type: SEARCH_TYPES[search_type]}
+        for entity, (key, model, serializer) in types.items():
+            ranked = search(entity, term, limit)
+            ids = [row_id for row_id, _ in ranked]
+            rows = {row.id: row for row in model.query.filter(model.id.in_(ids)).all()} if ids else {}
+            results[key] = [
+                dict(serializer(rows[row_id]), score=round(score, 4))
+                for row_id, score in ranked if row_id in rows
+            ]
+    
+    return jsonify({
+        'success': True,
+        'query': term,
+        'backend': get_backend().name,
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
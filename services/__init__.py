@@ -0,0 +1 @@
+# Service layer: query and aggregation helpers shared by the route blueprints
@@ -0,0 +1,329 @@
+"""
+Route benchmark harness.
+
+Times the busiest pages, the stats APIs and the sale / payment POSTs,
+either in-process through the Flask test client or over HTTP against a
+multi-worker gunicorn started for the run. Each route reports latency
+percentiles, SQL statements per request and throughput; a result saved
+as a JSON baseline can be compared with a later run to flag regressions.
+
+POSTs write real rows (a throwaway product and customer are created for
+the sales), so run it against a scratch database filled with
+``flask seed-data``.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from flask import current_app
+from sqlalchemy import event
+from database import db
+
+
+BENCH_PHONE = '01000000001'
+
+# Latency growth (fraction of the baseline p95) tolerated before a route is flagged
+DEFAULT_TOLERANCE = 0.25
+
+# Smaller p95 increases are treated as noise whatever the ratio
+NOISE_MS = 2.0
+
+
+class Fixtures:
+    """Ids the POST targets cycle through"""
+
+    def __init__(self, product_id, customer_id, ledger_ids, debt_ids):
+        self.product_id = product_id
+        self.customer_id = customer_id
+        self.ledger_ids = ledger_ids
+        self.debt_ids = debt_ids
+
+
+def prepare_fixtures(requests):
+    """
+    Create the sale product / customer and pick ledgers and debts to pay
+
+    Args:
+        requests: Timed requests per route (warmup included); that many
+            EMI ledgers with an installment left and debts with at least
+            that many taka owed are picked when available
+
+    Returns:
+        Fixtures
+    """
+    from models.product import Product
+    from models.customer import Customer
+    from models.sales import EMI_Ledger
+    from models.debt import DebtRecord
+
+    product = Product(name='Benchmark product', model=f'BENCH-{int(time.time())}',
+                      buying_price=1, selling_price=1, stock_quantity=10 ** 9)
+    customer = Customer.query.filter_by(phone=BENCH_PHONE).first() or \
+        Customer(name='Benchmark customer', phone=BENCH_PHONE)
+    try:
+        db.session.add_all([product, customer])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    ledger_ids = [ledger_id for (ledger_id,) in db.session.query(EMI_Ledger.id).filter(
+        EMI_Ledger.status == 'Active',
+        EMI_Ledger.installments_paid < EMI_Ledger.total_installments
+    ).order_by(EMI_Ledger.id).limit(requests)]
+    debt_ids = [debt_id for (debt_id,) in db.session.query(DebtRecord.id).filter(
+        DebtRecord.amount - DebtRecord.paid_amount >= requests
+    ).order_by(DebtRecord.id).limit(requests)]
+    return Fixtures(product.id, customer.id, ledger_ids, debt_ids)
+
+
+def targets(fixtures):
+    """
+    Benchmarked routes
+
+    Returns:
+        list: (name, method, url(i), form data(i) or None) per route; POSTs
+            without a row to act on are left out
+    """
+    routes = [
+        ('emi.dashboard', 'GET', lambda i: '/emi/dashboard', None),
+        ('emi.get_stats', 'GET', lambda i: '/emi/api/stats', None),
+        ('debt.index', 'GET', lambda i: '/debt/', None),
+        ('debt.api_stats', 'GET', lambda i: '/debt/api/stats', None),
+        ('pos.index', 'GET', lambda i: '/pos/', None),
+        ('inventory.index', 'GET', lambda i: '/inventory/', None),
+        ('pos.cash_sale', 'POST', lambda i: '/pos/cash-sale',
+         lambda i: {'product_id': fixtures.product_id, 'customer_id': fixtures.customer_id}),
+    ]
+    ledgers, debts = fixtures.ledger_ids, fixtures.debt_ids
+    if ledgers:
+        routes.append(('emi.pay_installment', 'POST', lambda i: f'/emi/pay/{ledgers[i % len(ledgers)]}', lambda i: {}))
+    if debts:
+        routes.append(('debt.payment', 'POST', lambda i: f'/debt/payment/{debts[i % len(debts)]}',
+                       lambda i: {'payment_amount': 1}))
+    return routes
+
+
+def summarize(latencies, queries, elapsed, errors):
+    """
+    Figures for one route
+
+    Args:
+        latencies: Seconds per timed request
+        queries: SQL statements per request (None when unknown)
+        elapsed: Wall time of the timed requests
+        errors: Responses with a status of 400 or more
+
+    Returns:
+        dict: p50/p95/p99/mean in ms, mean queries, requests per second
+    """
+    milliseconds = np.array(latencies) * 1000
+    known = [count for count in queries if count is not None]
+    p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'mean_ms': round(float(milliseconds.mean()), 2),
+        'queries': round(sum(known) / len(known), 2) if known else None,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'errors': errors
+    }
+
+
+def run_test_client(requests=200, warmup=20, fixtures=None):
+    """
+    Benchmark every target in-process, one request at a time
+
+    Args:
+        requests: Timed requests per route
+        warmup: Untimed requests per route first (fills caches)
+        fixtures: Fixtures (created when None)
+
+    Returns:
+        dict: Route name -> summary
+    """
+    app = current_app._get_current_object()
+    fixtures = fixtures or prepare_fixtures(requests + warmup)
+    db.session.remove()
+    client = app.test_client()
+    counter = [0]
+
+    def count(*args):
+        counter[0] += 1
+
+    results = {}
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        for name, method, url, data in targets(fixtures):
+            for i in range(warmup):
+                client.open(url(i), method=method, data=data(i) if data else None)
+            latencies, queries, errors = [], [], 0
+            started = time.perf_counter()
+            for i in range(warmup, warmup + requests):
+                counter[0] = 0
+                before = time.perf_counter()
+                response = client.open(url(i), method=method, data=data(i) if data else None)
+                latencies.append(time.perf_counter() - before)
+                queries.append(counter[0])
+                errors += response.status_code >= 400
+            results[name] = summarize(latencies, queries, time.perf_counter() - started, errors)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return results
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def _server_timing_queries(header):
+    """Statement count from the profiler's Server-Timing header, None without one"""
+    for part in (header or '').split(','):
+        if part.strip().startswith('db;') and 'desc="' in part:
+            return int(part.split('desc="', 1)[1].split(' ', 1)[0])
+    return None
+
+
+def run_gunicorn(requests=200, warmup=20, workers=4, concurrency=8, fixtures=None, startup_timeout=30):
+    """
+    Benchmark every target over HTTP against a gunicorn started for the run
+
+    Requests of one route are sent by ``concurrency`` threads at once.
+    Statements per request are read from the Server-Timing header, so
+    they are only reported with PROFILING_ENABLED.
+
+    Args:
+        requests: Timed requests per route
+        warmup: Untimed requests per route first
+        workers: gunicorn worker processes
+        concurrency: Client threads
+        fixtures: Fixtures (created when None)
+        startup_timeout: Seconds to wait for gunicorn to accept connections
+
+    Returns:
+        dict: Route name -> summary
+    """
+    app = current_app._get_current_object()
+    fixtures = fixtures or prepare_fixtures(requests + warmup)
+    db.session.remove()
+
+    port = _free_port()
+    base = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+         '--log-level', 'warning', 'app:app'],
+        cwd=app.root_path, env=os.environ.copy()
+    )
+    opener = urllib.request.build_opener(_NoRedirect)
+
+    def fetch(method, url, data):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        try:
+            with opener.open(urllib.request.Request(base + url, data=body, method=method), timeout=60) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as error:
+            status, headers = error.code, error.headers
+        return time.perf_counter() - started, status, _server_timing_queries(
+            ', '.join(headers.get_all('Server-Timing') or []))
+
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup (is it installed?)')
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=1):
+                    break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f'gunicorn did not start within {startup_timeout}s')
+                time.sleep(0.2)
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for name, method, url, data in targets(fixtures):
+                list(pool.map(lambda i: fetch(method, url(i), data(i) if data else None), range(warmup)))
+                started = time.perf_counter()
+                timed = list(pool.map(lambda i: fetch(method, url(i), data(i) if data else None),
+                                      range(warmup, warmup + requests)))
+                elapsed = time.perf_counter() - started
+                results[name] = summarize([seconds for seconds, _, _ in timed], [count for _, _, count in timed],
+                                          elapsed, sum(status >= 400 for _, status, _ in timed))
+        return results
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def report(results, mode, **meta):
+    """Wrap route results with what they were measured on (the baseline file format)"""
+    from models.customer import Customer
+    from models.sales import EMI_Ledger
+
+    return {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'mode': mode,
+        'database': db.engine.dialect.name,
+        'customers': Customer.query.count(),
+        'ledgers': EMI_Ledger.query.count(),
+        **meta,
+        'routes': results
+    }
+
+
+def save_baseline(path, result):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(result, output, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def compare(baseline, result, tolerance=DEFAULT_TOLERANCE):
+    """
+    Regressions of a run against a baseline
+
+    A route regresses when its p95 grew by more than ``tolerance`` (and
+    NOISE_MS), when it runs more SQL statements per request, or when it
+    started returning errors. Routes missing from either side are skipped.
+
+    Returns:
+        list: One message per regression
+    """
+    problems = []
+    for name, current in result['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if previous is None:
+            continue
+        limit = previous['p95_ms'] * (1 + tolerance)
+        if current['p95_ms'] > limit and current['p95_ms'] - previous['p95_ms'] > NOISE_MS:
+            problems.append(f"{name}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+        if None not in (current['queries'], previous['queries']) and current['queries'] > previous['queries'] + 0.5:
+            problems.append(f"{name}: queries/request {previous['queries']} -> {current['queries']}")
+        if current['errors'] > previous['errors']:
+            problems.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return problems
@@ -0,0 +1,292 @@
+"""
+Response cache for read-heavy JSON endpoints, invalidated by writes.
+
+Backends:
+    memory  In-process LRU with per-entry TTL. Invalidation only reaches
+            the current process, so use it with a single worker.
+    redis   Any Redis-compatible server (or a client object with the same
+            get / set / incr / delete methods); shared by all workers.
+    none    No caching; every call goes to the database.
+
+Entries live in namespaces ('product', 'emi', 'emi_stats', ...). Keys
+carry the namespace's version, so a whole namespace is dropped with one
+version bump; single entries are deleted directly. Write routes queue
+invalidations with ``invalidate`` and they are applied when the session
+commits, so a reader can never re-cache the pre-commit state.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from flask import current_app
+from sqlalchemy import event
+from database import db
+
+
+logger = logging.getLogger(__name__)
+
+# Session.info key holding invalidations waiting for commit
+PENDING_KEY = 'cache_invalidations'
+
+
+class NullCache:
+    """Backend used when caching is disabled"""
+
+    name = 'none'
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def incr(self, key):
+        return 0
+
+    def size(self):
+        return 0
+
+
+class MemoryCache:
+    """Thread-safe LRU cache with per-entry expiry"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._counters = {}  # Namespace versions, never evicted
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """Redis-compatible backend; values are stored as JSON"""
+
+    name = 'redis'
+
+    def __init__(self, client, prefix='showroom:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def size(self):
+        return None
+
+
+class ResponseCache:
+    """Namespaced, versioned cache with hit / miss counters"""
+
+    def __init__(self, backend, default_ttl=60):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, namespace, event_name):
+        with self._lock:
+            self.counters[(namespace, event_name)] += 1
+
+    def _key(self, namespace, key):
+        version = self.backend.get(f'{namespace}:version') or 0
+        return f'{namespace}:v{version}:{key}'
+
+    def get_or_set(self, namespace, key, compute, ttl=None):
+        """
+        Cached value for (namespace, key), computing and storing it on a miss
+
+        Values must be JSON-serializable and are shared between callers,
+        so treat them as read-only. ``None`` results are not cached.
+        """
+        try:
+            full_key = self._key(namespace, key)
+            value = self.backend.get(full_key)
+        except Exception:
+            # Serve from the database while the cache server is unreachable
+            logger.exception('Cache read of %s:%s failed', namespace, key)
+            self._count(namespace, 'errors')
+            return compute()
+        if value is not None:
+            self._count(namespace, 'hits')
+            return value
+
+        self._count(namespace, 'misses')
+        value = compute()
+        if value is not None:
+            try:
+                self.backend.set(full_key, value, self.default_ttl if ttl is None else ttl)
+            except Exception:
+                logger.exception('Cache write of %s:%s failed', namespace, key)
+                self._count(namespace, 'errors')
+        return value
+
+    def invalidate(self, namespace, key=None):
+        """Drop one entry, or the whole namespace when key is None"""
+        if key is None:
+            self.backend.incr(f'{namespace}:version')
+        else:
+            self.backend.delete(self._key(namespace, key))
+        self._count(namespace, 'invalidations')
+
+    def stats(self):
+        """Hit / miss / invalidation / error counters per namespace (this process)"""
+        namespaces = {}
+        for (namespace, event_name), count in sorted(self.counters.items()):
+            namespaces.setdefault(namespace, {'hits': 0, 'misses': 0, 'invalidations': 0, 'errors': 0})[event_name] = count
+        for counts in namespaces.values():
+            lookups = counts['hits'] + counts['misses']
+            counts['hit_rate'] = round(counts['hits'] / lookups, 3) if lookups else None
+        return {
+            'backend': self.backend.name,
+            'default_ttl': self.default_ttl,
+            'entries': self.backend.size(),
+            'namespaces': namespaces
+        }
+
+
+def _redis_client(url):
+    """Connect to Redis, or return None when the client library is missing"""
+    try:
+        import redis
+    except ImportError:
+        return None
+    return redis.Redis.from_url(url)
+
+
+def _apply_pending(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    cache = get_cache()
+    for namespace, key in pending:
+        try:
+            cache.invalidate(namespace, key)
+        except Exception:
+            # A cache outage must not fail a committed write; the TTL bounds staleness
+            logger.exception('Cache invalidation of %s:%s failed', namespace, key)
+
+
+def _discard_pending(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+
+
+def init_cache(app, backend=None):
+    """
+    Install the response cache selected by CACHE_BACKEND
+
+    The memory backend is only safe with a single worker process: an
+    invalidation never reaches the other workers' copies.
+
+    Args:
+        app: Flask application instance
+        backend: Optional backend object overriding the config (e.g. a
+            local stand-in for Redis)
+    """
+    choice = app.config.get('CACHE_BACKEND', 'memory')
+    if backend is None:
+        if choice == 'redis':
+            client = _redis_client(app.config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+            if client is None:
+                # A per-process cache would serve other workers' stale entries
+                choice = 'memory' if app.config.get('WEB_CONCURRENCY', 1) <= 1 else 'none'
+                logger.warning('Cache backend redis unavailable (redis package not installed); using %s cache', choice)
+            else:
+                backend = RedisCache(client)
+        if choice == 'memory':
+            backend = MemoryCache(app.config.get('CACHE_MAX_ENTRIES', 1000))
+        elif backend is None:
+            backend = NullCache()
+
+    app.extensions['response_cache'] = ResponseCache(backend, app.config.get('CACHE_DEFAULT_TTL', 60))
+
+    if not event.contains(db.session, 'after_commit', _apply_pending):
+        event.listen(db.session, 'after_commit', _apply_pending)
+        event.listen(db.session, 'after_soft_rollback', _discard_pending)
+    return app.extensions['response_cache']
+
+
+def get_cache():
+    """Response cache for the current app (a pass-through one if none is installed)"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        cache = current_app.extensions['response_cache'] = ResponseCache(NullCache())
+    return cache
+
+
+def cached(namespace, key, compute, ttl=None):
+    """
+    Serve ``compute()`` through the cache
+
+    Args:
+        namespace: Entity namespace, e.g. 'product'
+        key: Entry key within the namespace (id or date)
+        compute: Zero-argument function producing the JSON-serializable value
+        ttl: Seconds to keep the entry (defaults to CACHE_DEFAULT_TTL)
+
+    Returns:
+        Cached or freshly computed value
+    """
+    return get_cache().get_or_set(namespace, key, compute, ttl)
+
+
+def invalidate(namespace, *keys):
+    """
+    Queue cache invalidation until the current transaction commits
+
+    Args:
+        namespace: Entity namespace
+        *keys: Entry keys to drop; none drops the whole namespace
+    """
+    pending = db.session.info.setdefault(PENDING_KEY, set())
+    if keys:
+        pending.update((namespace, key) for key in keys)
+    else:
+        pending.add((namespace, None))
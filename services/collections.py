@@ -0,0 +1,246 @@
+import csv
+import io
+from datetime import datetime, time, timedelta
+from sqlalchemy.orm import contains_eager
+from database import db
+from models.sales import EMI_Ledger
+from models.customer import CustomerSummary
+from models.payments import Installment, Payment
+from models.reports import DailyRollup
+from services.cache import invalidate
+
+
+# Rows applied per transaction; a failing chunk only rolls back itself
+CHUNK_SIZE = 100
+
+
+def parse_collection_csv(stream):
+    """
+    Read collection rows from an uploaded CSV file
+
+    The file needs an ``emi_id`` column and may have an ``installments``
+    column (defaults to 1).
+
+    Args:
+        stream: Binary file object (e.g. ``request.files['file'].stream``)
+
+    Returns:
+        list: Row dicts as read from the file
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    return [dict(row) for row in csv.DictReader(text)]
+
+
+def normalize_rows(raw_rows):
+    """
+    Validate raw collection rows
+
+    Args:
+        raw_rows: Iterable of dicts with ``emi_id`` and optional ``installments``
+
+    Returns:
+        tuple: (list of (row_number, emi_id, installments), list of error results)
+    """
+    rows = []
+    errors = []
+    for number, raw in enumerate(raw_rows, start=1):
+        try:
+            emi_id = int(raw.get('emi_id'))
+            installments = int(raw.get('installments') or 1)
+            if installments < 1:
+                raise ValueError
+        except (TypeError, ValueError, AttributeError):
+            errors.append({'row': number, 'emi_id': raw.get('emi_id') if isinstance(raw, dict) else None,
+                           'success': False, 'error': 'অবৈধ ডেটা!'})
+            continue
+        rows.append((number, emi_id, installments))
+    return rows, errors
+
+
+def _load_ledgers(emi_ids):
+    """
+    Load and lock ledgers with their sales in one SELECT ... IN ... FOR UPDATE
+
+    The row locks (PostgreSQL) make a concurrent collection for the same
+    EMI wait and then read the advanced installments_paid, so two payments
+    cannot both settle the same installment. Locks are taken in id order.
+    """
+    ledgers = (
+        EMI_Ledger.query
+        .join(EMI_Ledger.sale)
+        .options(contains_eager(EMI_Ledger.sale))
+        .filter(EMI_Ledger.id.in_(emi_ids))
+        .order_by(EMI_Ledger.id)
+        .with_for_update(of=EMI_Ledger)
+        .all()
+    )
+    return {ledger.id: ledger for ledger in ledgers}
+
+
+def _unpaid_installments(emi_ids):
+    """Stored amounts of the unpaid installments as {ledger_id: {number: amount}}, one SELECT"""
+    rows = (
+        db.session.query(Installment.ledger_id, Installment.number, Installment.amount)
+        .join(EMI_Ledger, Installment.ledger_id == EMI_Ledger.id)
+        .filter(Installment.ledger_id.in_(emi_ids), Installment.number > EMI_Ledger.installments_paid)
+    )
+    amounts = {}
+    for ledger_id, number, amount in rows:
+        amounts.setdefault(ledger_id, {})[number] = amount
+    return amounts
+
+
+def _installments_amount(ledger, amounts, count):
+    """Amount of the ledger's next ``count`` installments (see EMI_Ledger.installments_amount)"""
+    if not amounts:
+        return ledger.monthly_amount * count
+    first = ledger.installments_paid + 1
+    return round(sum(amounts.get(number, 0.0) for number in range(first, first + count)), 2)
+
+
+def _apply_chunk(chunk):
+    """
+    Apply one chunk of payments inside the current transaction
+
+    Ledger and sale changes are flushed together at commit, which groups
+    them into executemany UPDATEs; summary changes are aggregated per
+    customer and written in one more, and the daily rollup gets a single
+    upsert for the whole chunk.
+
+    Returns:
+        list: Per-row results
+    """
+    emi_ids = {emi_id for _, emi_id, _ in chunk}
+    ledgers = _load_ledgers(emi_ids)
+    schedules = _unpaid_installments(emi_ids)
+    results = []
+    summary_deltas = {}
+
+    for number, emi_id, installments in chunk:
+        result = {'row': number, 'emi_id': emi_id, 'installments': installments, 'success': False}
+        ledger = ledgers.get(emi_id)
+
+        if ledger is None:
+            result['error'] = 'EMI পাওয়া যায়নি!'
+        elif ledger.status != 'Active':
+            result['error'] = f'এই EMI {ledger.status} অবস্থায় আছে!'
+        elif ledger.installments_paid + installments > ledger.total_installments:
+            remaining = ledger.total_installments - ledger.installments_paid
+            result['error'] = f'অবশিষ্ট কিস্তি মাত্র {remaining} টি!'
+        else:
+            amount = _installments_amount(ledger, schedules.get(emi_id), installments)
+            ledger.pay_installment(installments, record_summary=False, amount=amount)
+            paid, completed = summary_deltas.get(ledger.sale.customer_id, (0.0, 0))
+            summary_deltas[ledger.sale.customer_id] = (
+                paid + amount,
+                completed + (1 if ledger.status == 'Completed' else 0)
+            )
+            result.update({
+                'success': True,
+                'amount': amount,
+                'installments_paid': ledger.installments_paid,
+                'status': ledger.status,
+                'next_payment_date': ledger.next_payment_date.strftime('%Y-%m-%d')
+            })
+        results.append(result)
+
+    CustomerSummary.record_installments(summary_deltas)
+    paid_ids = {result['emi_id'] for result in results if result['success']}
+    if paid_ids:
+        invalidate('emi', *paid_ids)
+        invalidate('emi_stats')
+    DailyRollup.record_installments(
+        sum(result['installments'] for result in results if result['success']),
+        sum(result['amount'] for result in results if result['success'])
+    )
+
+    return results
+
+
+def collect_installments(raw_rows, chunk_size=CHUNK_SIZE):
+    """
+    Apply a batch of installment collections
+
+    Each chunk is committed on its own, so one bad chunk does not undo
+    the payments already recorded; its rows are reported as failed.
+
+    Args:
+        raw_rows: Iterable of dicts with ``emi_id`` and optional ``installments``
+        chunk_size: Rows per transaction
+
+    Returns:
+        dict: Totals and per-row results in input order
+    """
+    rows, results = normalize_rows(raw_rows)
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            chunk_results = _apply_chunk(chunk)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            chunk_results = [
+                {'row': number, 'emi_id': emi_id, 'installments': installments,
+                 'success': False, 'error': f'ত্রুটি: {str(e)}'}
+                for number, emi_id, installments in chunk
+            ]
+        results.extend(chunk_results)
+
+    results.sort(key=lambda result: result['row'])
+    succeeded = [result for result in results if result['success']]
+    return {
+        'processed': len(succeeded),
+        'failed': len(results) - len(succeeded),
+        'total_amount': round(sum(result['amount'] for result in succeeded), 2),
+        'results': results
+    }
+
+
+def daily_collections(start, end):
+    """
+    Cash collected per day and payment kind
+
+    Reads the payment ledger through its paid_at index with one grouped
+    query; days without payments are included with zero totals.
+
+    Args:
+        start: First day (date)
+        end: Last day (date), inclusive
+
+    Returns:
+        dict: Per-day totals by kind plus grand totals
+    """
+    day = db.func.date(Payment.paid_at)
+    grouped = (
+        db.session.query(day, Payment.kind, db.func.count(), db.func.sum(Payment.amount))
+        .filter(Payment.paid_at >= datetime.combine(start, time.min),
+                Payment.paid_at < datetime.combine(end + timedelta(days=1), time.min))
+        .group_by(day, Payment.kind)
+    )
+    found = {}
+    for paid_on, kind, count, amount in grouped:
+        found.setdefault(str(paid_on), {})[kind] = (count, float(amount))
+
+    days = []
+    totals = {kind: 0.0 for kind in Payment.KINDS}
+    current = start
+    while current <= end:
+        by_kind = found.get(current.isoformat(), {})
+        row = {'date': current.isoformat(), 'payments': sum(count for count, _ in by_kind.values())}
+        for kind in Payment.KINDS:
+            amount = by_kind.get(kind, (0, 0.0))[1]
+            row[kind] = round(amount, 2)
+            totals[kind] += amount
+        row['total'] = round(sum(row[kind] for kind in Payment.KINDS), 2)
+        days.append(row)
+        current += timedelta(days=1)
+
+    return {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'kinds': list(Payment.KINDS),
+        'days': days,
+        'totals': {kind: round(amount, 2) for kind, amount in totals.items()},
+        'total': round(sum(totals.values()), 2)
+    }
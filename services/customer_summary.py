@@ -0,0 +1,93 @@
+from database import db
+from models.customer import Customer, CustomerSummary
+from models.sales import Sale, EMI_Ledger
+
+
+# Float columns are compared with this tolerance
+TOLERANCE = 0.01
+
+
+def recompute_summaries():
+    """
+    Recompute every customer's summary from sales and EMI ledgers
+    
+    Uses two grouped queries rather than walking ORM relationships.
+    
+    Returns:
+        dict: customer_id -> summary values
+    """
+    summaries = {
+        customer_id: {
+            'total_purchases': 0.0,
+            'total_due': 0.0,
+            'active_emi_count': 0,
+            'last_purchase_date': None
+        }
+        for (customer_id,) in db.session.query(Customer.id)
+    }
+    
+    purchases = db.session.query(
+        Sale.customer_id,
+        db.func.sum(Sale.total_amount),
+        db.func.max(Sale.sale_date)
+    ).group_by(Sale.customer_id)
+    for customer_id, total, last_date in purchases:
+        summaries[customer_id]['total_purchases'] = float(total or 0)
+        summaries[customer_id]['last_purchase_date'] = last_date
+    
+    remaining = EMI_Ledger.remaining_amount
+    dues = db.session.query(
+        Sale.customer_id,
+        db.func.sum(remaining),
+        db.func.sum(db.case((EMI_Ledger.status == 'Active', 1), else_=0))
+    ).join(EMI_Ledger, EMI_Ledger.sale_id == Sale.id).filter(
+        Sale.sale_type == 'EMI'
+    ).group_by(Sale.customer_id)
+    for customer_id, total_due, active_count in dues:
+        summaries[customer_id]['total_due'] = float(total_due or 0)
+        summaries[customer_id]['active_emi_count'] = int(active_count or 0)
+    
+    return summaries
+
+
+def verify_summaries():
+    """
+    Compare stored summaries against a full recomputation
+    
+    Returns:
+        list: (customer_id, field, stored, expected) for every mismatch
+    """
+    expected = recompute_summaries()
+    stored = {row.customer_id: row for row in CustomerSummary.query.all()}
+    mismatches = []
+    
+    for customer_id, values in expected.items():
+        row = stored.get(customer_id)
+        if row is None:
+            mismatches.append((customer_id, 'row', None, 'missing'))
+            continue
+        for field in ('total_purchases', 'total_due'):
+            if abs((getattr(row, field) or 0) - values[field]) > TOLERANCE:
+                mismatches.append((customer_id, field, getattr(row, field), values[field]))
+        if row.active_emi_count != values['active_emi_count']:
+            mismatches.append((customer_id, 'active_emi_count', row.active_emi_count, values['active_emi_count']))
+    
+    return mismatches
+
+
+def rebuild_summaries():
+    """
+    Replace all summary rows with a full recomputation
+    
+    Returns:
+        int: Number of summary rows written
+    """
+    summaries = recompute_summaries()
+    CustomerSummary.query.delete()
+    if summaries:
+        db.session.execute(
+            db.insert(CustomerSummary),
+            [dict(values, customer_id=customer_id) for customer_id, values in summaries.items()]
+        )
+    db.session.commit()
+    return len(summaries)
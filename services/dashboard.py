@@ -0,0 +1,66 @@
+from sqlalchemy.orm import contains_eager, joinedload, undefer
+from models.sales import Sale, EMI_Ledger
+from models.customer import Customer
+from services.search import search_filter
+
+
+def emi_dashboard_query(status_filter='Active', search_query=''):
+    """
+    Build the EMI dashboard query with sale, customer and product loaded
+    in the same round trip.
+
+    The dashboard template reads ``emi.sale.customer``,
+    ``emi.sale.product`` and the remaining amount for every row, so they
+    are loaded eagerly instead of one ledger at a time.
+
+    Args:
+        status_filter: Ledger status to show, 'Overdue' or 'All'
+        search_query: Optional customer name / phone fragment
+
+    Returns:
+        Query: EMI_Ledger query with eager-loaded relationships
+    """
+    query = (
+        EMI_Ledger.query
+        .join(EMI_Ledger.sale)
+        .join(Sale.customer)
+        .join(Sale.product)
+        .options(
+            contains_eager(EMI_Ledger.sale).contains_eager(Sale.customer),
+            contains_eager(EMI_Ledger.sale).contains_eager(Sale.product),
+            undefer(EMI_Ledger.remaining_amount),
+        )
+    )
+
+    if status_filter == 'Overdue':
+        # Stored by the overdue sweeper, so this is an indexed filter
+        query = query.filter(EMI_Ledger.status == 'Active', EMI_Ledger.days_overdue > 0)
+    elif status_filter and status_filter != 'All':
+        query = query.filter(EMI_Ledger.status == status_filter)
+
+    if search_query:
+        query = query.filter(search_filter('customer', Customer.id, search_query))
+
+    return query
+
+
+def load_ledger(emi_id):
+    """
+    Load a single EMI ledger together with its sale, customer and product
+
+    Args:
+        emi_id: EMI ledger ID
+
+    Returns:
+        EMI_Ledger: Ledger instance (404 if not found)
+    """
+    return (
+        EMI_Ledger.query
+        .options(
+            joinedload(EMI_Ledger.sale).joinedload(Sale.customer),
+            joinedload(EMI_Ledger.sale).joinedload(Sale.product),
+            undefer(EMI_Ledger.remaining_amount),
+        )
+        .filter(EMI_Ledger.id == emi_id)
+        .first_or_404()
+    )
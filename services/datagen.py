@@ -0,0 +1,342 @@
+"""
+Synthetic showroom data for load tests and benchmarks.
+
+Fills products, customers, sales (with line items), EMI ledgers (with
+installment schedules and payment history) and debt records at a chosen
+scale with a fixed random seed, so two runs with the same arguments
+produce the same data. Rows are written with executemany INSERTs in
+batches and explicit ids; derived tables (customer summaries, daily
+rollup, receivables snapshot, inventory valuation, sales velocity) are
+rebuilt at the end, as after a migration.
+
+Only use it on a scratch database.
+"""
+import random
+from itertools import accumulate
+from datetime import date, datetime, time, timedelta
+from database import db
+from models.product import Product
+from models.customer import Customer
+from models.sales import Sale, SaleItem, EMI_Ledger
+from models.payments import Installment, Payment
+from models.debt import DebtRecord
+from services.emi_engine import add_months, quote, schedule
+from utils.aging import aging_bucket_for
+
+
+# Rows buffered per table before a batch is written
+BATCH_SIZE = 5000
+
+# Days of sales history generated
+HISTORY_DAYS = 730
+
+BRANDS = ('Walton', 'Samsung', 'LG', 'Sony', 'Singer', 'Vision', 'Minister', 'Jamuna', 'Hitachi', 'Panasonic')
+CATEGORIES = (
+    # (name, lowest price, highest price)
+    ('Refrigerator', 25000, 120000),
+    ('LED TV', 15000, 150000),
+    ('Air Conditioner', 40000, 110000),
+    ('Washing Machine', 20000, 80000),
+    ('Microwave Oven', 8000, 30000),
+    ('Motorcycle', 120000, 350000),
+    ('Smartphone', 8000, 90000),
+    ('Laptop', 35000, 160000),
+    ('Ceiling Fan', 2500, 7000),
+    ('Blender', 2000, 8000),
+)
+FIRST_NAMES = ('Abdul', 'Rahim', 'Karim', 'Fatema', 'Ayesha', 'Nusrat', 'Sumon', 'Rafiq', 'Jamal', 'Shirin',
+               'Tanvir', 'Mitu', 'Habib', 'Rina', 'Sakib', 'Mahmud', 'Taslima', 'Arif', 'Nazma', 'Imran')
+LAST_NAMES = ('Hossain', 'Rahman', 'Islam', 'Ahmed', 'Khan', 'Akter', 'Begum', 'Uddin', 'Chowdhury', 'Sarkar')
+AREAS = ('Mirpur', 'Dhanmondi', 'Uttara', 'Mohammadpur', 'Badda', 'Savar', 'Gazipur', 'Narayanganj', 'Tongi', 'Keraniganj')
+
+# (sales per customer, weight), (share of EMI sales), EMI terms
+SALES_PER_CUSTOMER = ((1, 70), (2, 22), (3, 8))
+EMI_SHARE = 0.6
+EMI_PERIODS = (6, 12, 18, 24)
+EMI_RATES = (0, 0, 10, 12, 15)
+
+
+class _Writer:
+    """Buffers rows per table and writes them parent tables first"""
+
+    def __init__(self, tables, batch_size):
+        self.tables = tables
+        self.batch_size = batch_size
+        self.rows = {table.name: [] for table in tables}
+        self.counts = {table.name: 0 for table in tables}
+        # executemany needs the same keys in every row of a batch: optional columns default to NULL
+        self.nulls = {
+            table.name: {column.name: None for column in table.columns
+                         if column.nullable and column.default is None and column.server_default is None}
+            for table in tables
+        }
+
+    def add(self, table, row):
+        self.rows[table.name].append({**self.nulls[table.name], **row})
+        if len(self.rows[table.name]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for table in self.tables:
+            rows = self.rows[table.name]
+            if rows:
+                db.session.execute(table.insert(), rows)
+                self.counts[table.name] += len(rows)
+                rows.clear()
+        db.session.commit()
+
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def _sync_sequences(models):
+    """Move PostgreSQL id sequences past the explicitly inserted ids"""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__table__.name
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+        ))
+    db.session.commit()
+
+
+def _ledger_progress(rng, periods, due_so_far):
+    """
+    Installments paid and status for a ledger with ``due_so_far`` installments due
+
+    Returns:
+        tuple: (installments paid, status)
+    """
+    roll = rng.random()
+    if due_so_far >= periods:
+        if roll < 0.85:
+            return periods, 'Completed'
+        if roll < 0.95:
+            return max(periods - rng.randint(1, 3), 0), 'Active'
+        return rng.randint(0, periods - 1), 'Defaulted'
+    if roll < 0.75:
+        return due_so_far, 'Active'
+    if roll < 0.95:
+        return max(due_so_far - rng.randint(1, 4), 0), 'Active'
+    return rng.randint(0, max(due_so_far - 1, 0)), 'Defaulted'
+
+
+def generate(customers=1000, seed=42, products=None, batch_size=BATCH_SIZE, schedules=True,
+             today=None, progress=None):
+    """
+    Append a synthetic data set
+
+    Args:
+        customers: Customers to create (each with 1-3 sales; about 60%
+            EMI) plus half as many debt records
+        seed: Random seed; the same arguments give the same data
+        products: Catalogue size (defaults to customers / 100, 20 to 5000)
+        batch_size: Rows per INSERT batch / transaction
+        schedules: Also write installment schedules and payment history
+        today: Reference date (defaults to today)
+        progress: Optional callable(customers done) called per 10% step
+
+    Returns:
+        dict: Rows written per table
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    products = products or min(max(customers // 100, 20), 5000)
+    now = datetime.utcnow()
+
+    tables = [Product.__table__, Customer.__table__, Sale.__table__, SaleItem.__table__,
+              EMI_Ledger.__table__, Installment.__table__, Payment.__table__, DebtRecord.__table__]
+    writer = _Writer(tables, batch_size)
+    ids = {model: _next_id(model) for model in (Product, Customer, Sale, SaleItem, EMI_Ledger, Payment, DebtRecord)}
+
+    def take_id(model):
+        value = ids[model]
+        ids[model] += 1
+        return value
+
+    catalogue = []
+    for number in range(products):
+        category, low, high = rng.choice(CATEGORIES)
+        buying_price = round(rng.uniform(low, high), -2)
+        product_id = take_id(Product)
+        product = {
+            'id': product_id,
+            'name': f'{rng.choice(BRANDS)} {category}',
+            'model': f'{category[:3].upper()}-{product_id:06d}',
+            'buying_price': buying_price,
+            'selling_price': round(buying_price * rng.uniform(1.08, 1.35), -2),
+            'stock_quantity': rng.choice((0, 2, 5, 10, 25, 50, 100)),
+            'reorder_level': rng.choice((2, 5, 10)),
+            'sales_velocity': 0.0,
+            'created_at': now,
+            'updated_at': now
+        }
+        catalogue.append(product)
+        writer.add(Product.__table__, product)
+    # A few best sellers take most sales
+    cumulative_weights = list(accumulate(1 / (rank + 1) for rank in range(len(catalogue))))
+
+    quotes = {}
+    step = max(customers // 10, 1)
+    for number in range(customers):
+        customer_id = take_id(Customer)
+        needs_nid = rng.random() < EMI_SHARE + 0.1
+        writer.add(Customer.__table__, {
+            'id': customer_id,
+            'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'phone': f'019{customer_id:08d}',
+            'address': f'{rng.randint(1, 300)}, {rng.choice(AREAS)}, Dhaka',
+            'nid_number': f'{rng.randint(10 ** 9, 10 ** 10 - 1)}' if needs_nid else None,
+            'created_at': now,
+            'updated_at': now
+        })
+
+        for _ in range(rng.choices(*zip(*SALES_PER_CUSTOMER))[0]):
+            product = rng.choices(catalogue, cum_weights=cumulative_weights)[0]
+            sale_id = take_id(Sale)
+            sale_date = datetime.combine(today - timedelta(days=rng.randint(0, HISTORY_DAYS)),
+                                         time(rng.randint(9, 20), rng.randint(0, 59)))
+            total = product['selling_price']
+            sale = {
+                'id': sale_id,
+                'customer_id': customer_id,
+                'product_id': product['id'],
+                'sale_type': 'Cash',
+                'total_amount': total,
+                'paid_amount': total,
+                'sale_date': sale_date
+            }
+            item = {
+                'id': take_id(SaleItem), 'sale_id': sale_id, 'product_id': product['id'],
+                'quantity': 1, 'unit_price': total, 'line_total': total
+            }
+
+            if rng.random() >= EMI_SHARE:
+                writer.add(Sale.__table__, sale)
+                writer.add(SaleItem.__table__, item)
+                continue
+
+            periods = rng.choice(EMI_PERIODS)
+            rate = rng.choice(EMI_RATES)
+            method = 'reducing' if rate and rng.random() < 0.2 else 'flat'
+            down_payment = round(total * rng.choice((0.1, 0.2, 0.3)), -2)
+            terms = (total, down_payment, periods, rate, method)
+            if terms not in quotes:
+                # Prices come from the catalogue, so terms repeat; amortize each once
+                offer = quote(*terms)
+                quotes[terms] = (offer['exact_monthly_amount'], offer['principal_amount'], [
+                    (row['number'], row['amount'], row['principal'], row['interest'])
+                    for row in schedule(offer['principal_amount'], rate, periods, date.min, method)
+                ])
+            monthly, principal, installments = quotes[terms]
+            start = add_months(sale_date.date(), 1)
+
+            due_so_far = 0
+            while due_so_far < periods and add_months(start, due_so_far) <= today:
+                due_so_far += 1
+            paid, status = _ledger_progress(rng, periods, due_so_far)
+            next_payment = add_months(start, paid)
+            days_overdue = max((today - next_payment).days, 0) if status == 'Active' else 0
+
+            # Payments follow the stored schedule (rounded, residue on the last installment)
+            collected = sum(row[1] for row in installments[:paid]) if schedules else paid * monthly
+            sale.update(sale_type='EMI', paid_amount=down_payment + collected)
+            writer.add(Sale.__table__, sale)
+            writer.add(SaleItem.__table__, item)
+            ledger_id = take_id(EMI_Ledger)
+            writer.add(EMI_Ledger.__table__, {
+                'id': ledger_id,
+                'sale_id': sale_id,
+                'total_installments': periods,
+                'monthly_amount': monthly,
+                'interest_rate': rate,
+                'interest_method': method,
+                'principal_amount': principal,
+                'schedule_start': start,
+                'installments_paid': paid,
+                'next_payment_date': next_payment,
+                'status': status,
+                'days_overdue': days_overdue,
+                'aging_bucket': aging_bucket_for(days_overdue),
+                'created_at': sale_date,
+                'updated_at': sale_date
+            })
+
+            if not schedules:
+                continue
+            for installment, amount, principal_part, interest in installments:
+                writer.add(Installment.__table__, {
+                    'ledger_id': ledger_id, 'number': installment, 'due_date': add_months(start, installment - 1),
+                    'amount': amount, 'principal': principal_part, 'interest': interest,
+                    'created_at': sale_date
+                })
+            writer.add(Payment.__table__, {
+                'id': take_id(Payment), 'kind': 'down_payment', 'ledger_id': ledger_id,
+                'customer_id': customer_id, 'amount': down_payment, 'paid_at': sale_date
+            })
+            for installment, amount, _, _ in installments[:paid]:
+                paid_on = min(add_months(start, installment - 1) + timedelta(days=rng.randint(-3, 10)), today)
+                writer.add(Payment.__table__, {
+                    'id': take_id(Payment), 'kind': 'installment', 'ledger_id': ledger_id,
+                    'customer_id': customer_id, 'installment_from': installment, 'installment_to': installment,
+                    'amount': amount, 'paid_at': datetime.combine(paid_on, time(rng.randint(9, 20)))
+                })
+
+        if number % 2 == 0:
+            amount = round(rng.uniform(1000, 100000), -2)
+            status = rng.choices(('pending', 'partial', 'paid'), (45, 30, 25))[0]
+            paid_amount = {'pending': 0.0, 'partial': round(amount * rng.uniform(0.1, 0.9), -2), 'paid': amount}[status]
+            due_date = today + timedelta(days=rng.randint(-180, 90))
+            days_overdue = max((today - due_date).days, 0) if status != 'paid' else 0
+            debt_id = take_id(DebtRecord)
+            writer.add(DebtRecord.__table__, {
+                'id': debt_id,
+                'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                'phone': f'018{rng.randint(0, 10 ** 8 - 1):08d}',
+                'address': f'{rng.choice(AREAS)}, Dhaka',
+                'amount': amount,
+                'due_date': due_date,
+                'status': status,
+                'paid_amount': paid_amount,
+                'days_overdue': days_overdue,
+                'aging_bucket': aging_bucket_for(days_overdue),
+                'created_at': now,
+                'updated_at': now
+            })
+            if schedules and paid_amount:
+                writer.add(Payment.__table__, {
+                    'id': take_id(Payment), 'kind': 'debt', 'debt_id': debt_id, 'amount': paid_amount,
+                    'paid_at': datetime.combine(min(due_date, today), time(12))
+                })
+
+        if progress and (number + 1) % step == 0:
+            progress(number + 1)
+
+    writer.flush()
+    _sync_sequences([Product, Customer, Sale, SaleItem, EMI_Ledger, Installment, Payment, DebtRecord])
+    return writer.counts
+
+
+def rebuild_derived():
+    """
+    Recompute the tables derived from the generated rows
+
+    Returns:
+        dict: Result of each rebuild step
+    """
+    from services.customer_summary import rebuild_summaries
+    from services.rollups import rebuild_rollups
+    from services.receivables import snapshot_aging
+    from services.valuation import rebuild_valuation
+    from services.reorder import refresh_sales_velocity
+
+    return {
+        'customer_summaries': rebuild_summaries(),
+        'rollup_days': rebuild_rollups(),
+        'receivables': snapshot_aging(full=True),
+        'valuation': rebuild_valuation(),
+        'velocity': refresh_sales_velocity()
+    }
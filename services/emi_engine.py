@@ -0,0 +1,303 @@
+import calendar
+from datetime import date
+import numpy as np
+
+
+METHODS = ('flat', 'reducing')
+
+# Upper bound on loans priced / amortized in one call (what-if grids)
+MAX_BATCH = 10000
+
+
+def add_months(day, months):
+    """
+    Add calendar months to a date, clamping to the end of shorter months
+
+    Args:
+        day: Start date
+        months: Number of months to add
+
+    Returns:
+        date: Same day-of-month ``months`` later (e.g. Jan 31 + 1 -> Feb 28)
+    """
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _broadcast(principal, annual_rate, periods, method):
+    """Validate loan terms and broadcast them to equal-length 1-D arrays"""
+    principal, annual_rate, periods, method = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(principal, dtype=float)),
+        np.atleast_1d(np.asarray(annual_rate, dtype=float)),
+        np.atleast_1d(np.asarray(periods)),
+        np.atleast_1d(np.asarray(method, dtype=object)),
+    )
+    if principal.size > MAX_BATCH:
+        raise ValueError(f'at most {MAX_BATCH} loans per call')
+    if np.any(principal <= 0) or np.any(annual_rate < 0):
+        raise ValueError('principal must be positive and interest rate non-negative')
+    if np.any(periods < 1) or np.any(periods != np.floor(periods)):
+        raise ValueError('periods must be whole months of at least 1')
+    if not np.all(np.isin(method, METHODS)):
+        raise ValueError(f'method must be one of {", ".join(METHODS)}')
+    return principal, annual_rate, periods.astype(int), method == 'reducing'
+
+
+def monthly_installment(principal, annual_rate, periods, method='flat'):
+    """
+    Exact (unrounded) monthly installment for one or many loans
+
+    Flat rate charges interest on the original principal for the whole
+    term; reducing balance is the standard annuity formula.
+
+    Args:
+        principal: Amount financed (scalar or array)
+        annual_rate: Yearly interest rate in percent (scalar or array)
+        periods: Number of monthly installments (scalar or array)
+        method: 'flat' or 'reducing' (scalar or array)
+
+    Returns:
+        ndarray: Installment per loan
+    """
+    principal, annual_rate, periods, reducing = _broadcast(principal, annual_rate, periods, method)
+    flat = principal * (1 + annual_rate * periods / 1200) / periods
+
+    rate = annual_rate / 1200
+    growth = (1 + rate) ** periods
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = np.where(rate > 0, principal * rate * growth / (growth - 1), principal / periods)
+
+    return np.where(reducing, annuity, flat)
+
+
+def amortize(principal, annual_rate, periods, method='flat'):
+    """
+    Amortization tables for many loans at once
+
+    Installments are rounded to paisa; the last installment absorbs the
+    rounding residue so every loan closes at exactly zero balance. The
+    loop runs once per month of the longest term and is vectorized
+    across loans.
+
+    Args:
+        principal, annual_rate, periods, method: As in monthly_installment
+
+    Returns:
+        dict: 2-D arrays (loans x months) 'amount', 'interest', 'principal',
+            'balance' (zero past each loan's term), plus 'periods' and
+            'installment' (the regular rounded installment)
+    """
+    principal, annual_rate, periods, reducing = _broadcast(principal, annual_rate, periods, method)
+    installment = np.round(monthly_installment(principal, annual_rate, periods,
+                                               np.where(reducing, 'reducing', 'flat')), 2)
+
+    # Flat rate: equal interest each month, residue on the last month
+    flat_interest_total = np.round(principal * annual_rate * periods / 1200, 2)
+    flat_interest = np.round(flat_interest_total / periods, 2)
+    flat_interest_last = flat_interest_total - flat_interest * (periods - 1)
+
+    loans, width = principal.size, int(periods.max())
+    shape = (loans, width)
+    amount, interest, paid_principal, balance = (np.zeros(shape) for _ in range(4))
+    remaining = principal.copy()
+
+    for month in range(width):
+        live = month < periods
+        last = month == periods - 1
+
+        month_interest = np.where(
+            reducing,
+            np.round(remaining * annual_rate / 1200, 2),
+            np.where(last, flat_interest_last, flat_interest)
+        )
+        month_principal = np.where(last, remaining, np.minimum(installment - month_interest, remaining))
+
+        month_interest = np.where(live, month_interest, 0.0)
+        month_principal = np.where(live, month_principal, 0.0)
+        remaining = np.round(remaining - month_principal, 2)
+
+        interest[:, month] = month_interest
+        paid_principal[:, month] = month_principal
+        amount[:, month] = month_principal + month_interest
+        balance[:, month] = np.where(live, remaining, 0.0)
+
+    return {
+        'amount': np.round(amount, 2),
+        'interest': interest,
+        'principal': paid_principal,
+        'balance': balance,
+        'periods': periods,
+        'installment': installment
+    }
+
+
+def quote_many(total_price, down_payment, periods, annual_rate, method='flat'):
+    """
+    Price many EMI offers at once (what-if grids)
+
+    Arguments broadcast against each other like NumPy arrays.
+
+    Returns:
+        list: One dict per offer with principal_amount, monthly_amount
+            (regular installment), final_amount, total_interest and
+            total_emi_amount
+    """
+    total_price, down_payment = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(total_price, dtype=float)),
+        np.atleast_1d(np.asarray(down_payment, dtype=float))
+    )
+    if np.any(down_payment < 0) or np.any(down_payment >= total_price):
+        raise ValueError('down payment must be at least 0 and below the price')
+
+    principal = total_price - down_payment
+    principal, annual_rate, periods, method = np.broadcast_arrays(
+        principal, np.atleast_1d(annual_rate), np.atleast_1d(periods), np.atleast_1d(np.asarray(method, dtype=object))
+    )
+    total_price = np.broadcast_to(total_price, principal.shape)
+    down_payment = np.broadcast_to(down_payment, principal.shape)
+
+    table = amortize(principal, annual_rate, periods, method)
+    rows = np.arange(principal.size)
+    final = table['amount'][rows, table['periods'] - 1]
+    total_interest = table['interest'].sum(axis=1)
+    total_emi = table['amount'].sum(axis=1)
+
+    return [
+        {
+            'total_price': float(total_price[k]),
+            'down_payment': float(down_payment[k]),
+            'principal_amount': round(float(principal[k]), 2),
+            'emi_period': int(periods[k]),
+            'interest_rate': float(annual_rate[k]),
+            'method': str(method[k]),
+            'monthly_amount': float(table['installment'][k]),
+            'final_amount': round(float(final[k]), 2),
+            'total_interest': round(float(total_interest[k]), 2),
+            'total_emi_amount': round(float(total_emi[k]), 2)
+        }
+        for k in rows
+    ]
+
+
+def quote(total_price, down_payment, periods, annual_rate, method='flat'):
+    """
+    Price a single EMI offer
+
+    Returns:
+        dict: As one entry of quote_many, plus 'exact_monthly_amount'
+            (the unrounded installment stored on the ledger)
+    """
+    offer = quote_many(total_price, down_payment, periods, annual_rate, method)[0]
+    offer['exact_monthly_amount'] = float(
+        monthly_installment(offer['principal_amount'], annual_rate, periods, method)[0]
+    )
+    return offer
+
+
+def schedule(principal, annual_rate, periods, first_due_date, method='flat'):
+    """
+    Full installment schedule for one loan
+
+    Args:
+        principal: Amount financed
+        annual_rate: Yearly interest rate in percent
+        periods: Number of monthly installments
+        first_due_date: Due date of installment 1; later ones fall on the
+            same day of each following calendar month
+        method: 'flat' or 'reducing'
+
+    Returns:
+        list: Dicts with number, due_date, amount, principal, interest, balance
+    """
+    table = amortize(principal, annual_rate, periods, method)
+    return [
+        {
+            'number': month + 1,
+            'due_date': add_months(first_due_date, month),
+            'amount': float(table['amount'][0, month]),
+            'principal': round(float(table['principal'][0, month]), 2),
+            'interest': round(float(table['interest'][0, month]), 2),
+            'balance': round(float(table['balance'][0, month]), 2)
+        }
+        for month in range(int(table['periods'][0]))
+    ]
+
+
+def principal_from_installment(monthly_amount, annual_rate, periods, method='flat'):
+    """
+    Recover the amount financed from a ledger's installment
+
+    Used for ledgers created before the principal was stored.
+    """
+    if method == 'reducing' and annual_rate > 0:
+        rate = annual_rate / 1200
+        return monthly_amount * (1 - (1 + rate) ** -periods) / rate
+    return monthly_amount * periods / (1 + annual_rate * periods / 1200)
+
+
+def portfolio_projection(months=12, today=None):
+    """
+    Expected installment collections per calendar month over all active ledgers
+
+    Loads only the columns needed (one query) and spreads every ledger's
+    remaining installments over the horizon with NumPy, one step per
+    installment across all ledgers; installments whose calendar due date
+    has passed are reported separately as overdue.
+
+    Args:
+        months: Horizon in months, starting with the current month
+        today: Reference date (defaults to today)
+
+    Returns:
+        dict: Overdue totals and per-month expected amount / installment count
+    """
+    from database import db
+    from models.sales import EMI_Ledger
+
+    today = today or date.today()
+    rows = db.session.query(
+        EMI_Ledger.monthly_amount,
+        EMI_Ledger.total_installments - EMI_Ledger.installments_paid,
+        EMI_Ledger.next_payment_date
+    ).filter(EMI_Ledger.status == 'Active').all()
+
+    expected = np.zeros(months)
+    counts = np.zeros(months, dtype=int)
+    overdue_amount, overdue_count = 0.0, 0
+
+    if rows:
+        amounts = np.array([row[0] for row in rows], dtype=float)
+        remaining = np.array([row[1] for row in rows], dtype=int)
+        # Month offset of each ledger's next due date from the current month,
+        # and the day it falls on in the current month (clamped like add_months)
+        offsets = np.array([(row[2].year - today.year) * 12 + row[2].month - today.month for row in rows])
+        last_day = calendar.monthrange(today.year, today.month)[1]
+        due_days = np.minimum(np.array([row[2].day for row in rows]), last_day)
+
+        for k in range(int(remaining.max(initial=0))):
+            live = k < remaining
+            offset = offsets + k
+            late = live & ((offset < 0) | ((offset == 0) & (due_days < today.day)))
+            overdue_amount += float(amounts[late].sum())
+            overdue_count += int(late.sum())
+
+            in_horizon = live & ~late & (offset >= 0) & (offset < months)
+            np.add.at(expected, offset[in_horizon], amounts[in_horizon])
+            np.add.at(counts, offset[in_horizon], 1)
+
+    return {
+        'as_of': today.isoformat(),
+        'active_ledgers': len(rows),
+        'overdue_amount': round(overdue_amount, 2),
+        'overdue_count': overdue_count,
+        'months': [
+            {
+                'month': add_months(today.replace(day=1), index).strftime('%Y-%m'),
+                'expected_amount': round(float(expected[index]), 2),
+                'installments': int(counts[index])
+            }
+            for index in range(months)
+        ]
+    }
@@ -0,0 +1,216 @@
+"""
+Database engine profiles.
+
+A profile bundles connection pool settings, server-side timeouts and
+SQLite pragmas. DB_ENGINE_PROFILE picks one and the DB_* / SQLITE_*
+settings override single values of it. ``configure_engines`` turns the
+profile into SQLAlchemy engine options (it has to run before
+``db.init_app``); ``init_engines`` then installs the per-connection
+setup (SQLite pragmas) on every engine, replica binds included.
+
+SQLite defaults to a rollback journal with a full fsync on every commit
+and lets a writer fail after five seconds of lock waits. With several
+gunicorn workers that shows up as "database is locked"; WAL lets readers
+and the single writer proceed side by side and synchronous=NORMAL drops
+the per-commit fsync (a power cut can lose the last commits, never
+corrupt the file).
+"""
+import logging
+from functools import partial
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+logger = logging.getLogger(__name__)
+
+PROFILES = {
+    # Library defaults, for comparison and one-off scripts
+    'default': {},
+    # Web workers: small pools, stale connections detected, runaway statements cut off
+    'web': {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'statement_timeout_ms': 30000,
+        'lock_timeout_ms': 5000,
+        'sqlite_journal_mode': 'WAL',
+        'sqlite_synchronous': 'NORMAL',
+        'sqlite_busy_timeout_ms': 15000,
+        'sqlite_mmap_size': 256 * 1024 * 1024,
+        'sqlite_cache_size_kib': 64 * 1024,
+    },
+    # CLI rebuilds, imports and data generation: one long-running connection
+    'batch': {
+        'pool_size': 2,
+        'max_overflow': 2,
+        'pool_recycle': 3600,
+        'pool_pre_ping': True,
+        'statement_timeout_ms': 0,
+        'lock_timeout_ms': 60000,
+        'sqlite_journal_mode': 'WAL',
+        'sqlite_synchronous': 'NORMAL',
+        'sqlite_busy_timeout_ms': 60000,
+        'sqlite_mmap_size': 256 * 1024 * 1024,
+        'sqlite_cache_size_kib': 256 * 1024,
+    },
+}
+
+# Config keys overriding one profile value
+OVERRIDES = {
+    'DB_POOL_SIZE': 'pool_size',
+    'DB_MAX_OVERFLOW': 'max_overflow',
+    'DB_POOL_RECYCLE': 'pool_recycle',
+    'DB_STATEMENT_TIMEOUT_MS': 'statement_timeout_ms',
+    'SQLITE_BUSY_TIMEOUT_MS': 'sqlite_busy_timeout_ms',
+}
+
+SQLITE_JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SQLITE_SYNCHRONOUS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+
+def profile_settings(config):
+    """
+    Settings of the configured profile with overrides applied
+
+    Args:
+        config: Flask config (or any mapping)
+
+    Returns:
+        dict: Setting name -> value
+    """
+    name = config.get('DB_ENGINE_PROFILE') or 'default'
+    if name not in PROFILES:
+        raise ValueError(f'Unknown DB_ENGINE_PROFILE {name!r} (expected one of {", ".join(PROFILES)})')
+    settings = dict(PROFILES[name])
+    for key, setting in OVERRIDES.items():
+        if config.get(key) is not None:
+            settings[setting] = config[key]
+    return settings
+
+
+def _is_sqlite_memory(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(uri, settings):
+    """
+    SQLAlchemy ``create_engine`` options for one database URL
+
+    Pool recycling and pre-ping only matter for server databases; the
+    statement and lock timeouts are set per session on PostgreSQL.
+    In-memory SQLite keeps its single static connection.
+
+    Returns:
+        dict: Engine options (without the URL)
+    """
+    url = make_url(uri)
+    if _is_sqlite_memory(url):
+        return {}
+
+    options = {key: settings[key] for key in ('pool_size', 'max_overflow', 'pool_timeout') if key in settings}
+    if url.get_backend_name() == 'sqlite':
+        return options
+
+    for key in ('pool_recycle', 'pool_pre_ping'):
+        if key in settings:
+            options[key] = settings[key]
+    if url.get_backend_name() == 'postgresql':
+        server_options = [
+            f'-c {name}={int(settings[setting])}'
+            for name, setting in (('statement_timeout', 'statement_timeout_ms'), ('lock_timeout', 'lock_timeout_ms'))
+            if setting in settings
+        ]
+        if server_options:
+            options['connect_args'] = {'options': ' '.join(server_options)}
+    return options
+
+
+def configure_engines(app):
+    """
+    Merge the profile's engine options into the app config
+
+    Call before ``db.init_app``. Options already present in
+    SQLALCHEMY_ENGINE_OPTIONS or a bind's dict win over the profile.
+
+    Args:
+        app: Flask application instance
+
+    Returns:
+        dict: The profile settings in effect
+    """
+    settings = profile_settings(app.config)
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if uri:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **engine_options(uri, settings), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        }
+
+    binds = {}
+    for key, bind in (app.config.get('SQLALCHEMY_BINDS') or {}).items():
+        # String binds would not get SQLALCHEMY_ENGINE_OPTIONS; spell them out
+        bind = {'url': bind} if not isinstance(bind, dict) else dict(bind)
+        binds[key] = {**engine_options(bind['url'], settings), **bind}
+    if binds:
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+    app.extensions['engine_profile'] = settings
+    return settings
+
+
+def _sqlite_on_connect(settings, dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        if 'sqlite_busy_timeout_ms' in settings:
+            cursor.execute(f"PRAGMA busy_timeout = {int(settings['sqlite_busy_timeout_ms'])}")
+        if 'sqlite_journal_mode' in settings:
+            mode = settings['sqlite_journal_mode'].upper()
+            if mode not in SQLITE_JOURNAL_MODES:
+                raise ValueError(f'Unknown SQLite journal mode {mode!r}')
+            cursor.execute(f'PRAGMA journal_mode = {mode}')
+            applied = cursor.fetchone()[0].upper()
+            if applied != mode:
+                logger.warning('SQLite kept journal_mode=%s (asked for %s)', applied, mode)
+        if 'sqlite_synchronous' in settings:
+            level = settings['sqlite_synchronous'].upper()
+            if level not in SQLITE_SYNCHRONOUS:
+                raise ValueError(f'Unknown SQLite synchronous level {level!r}')
+            cursor.execute(f'PRAGMA synchronous = {level}')
+        if 'sqlite_mmap_size' in settings:
+            cursor.execute(f"PRAGMA mmap_size = {int(settings['sqlite_mmap_size'])}")
+        if 'sqlite_cache_size_kib' in settings:
+            # Negative sizes are in KiB rather than pages
+            cursor.execute(f"PRAGMA cache_size = -{int(settings['sqlite_cache_size_kib'])}")
+    finally:
+        cursor.close()
+
+
+def init_engines(app):
+    """
+    Install the profile's per-connection setup on every engine of the app
+
+    Call right after ``db.init_app``, before the first connection.
+
+    Args:
+        app: Flask application instance
+    """
+    from database import db
+
+    settings = app.extensions.get('engine_profile')
+    if settings is None:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name != 'sqlite' or _is_sqlite_memory(engine.url):
+                continue
+            event.listen(engine, 'connect', partial(_sqlite_on_connect, settings))
+
+
+def sqlite_pragmas(engine):
+    """Pragma values a connection of ``engine`` actually runs with (for reports)"""
+    with engine.connect() as connection:
+        return {
+            name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size')
+        }
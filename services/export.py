@@ -0,0 +1,91 @@
+import csv
+import io
+from database import db
+from models.product import Product
+from models.customer import Customer
+from models.sales import Sale, EMI_Ledger
+
+
+# Rows fetched from the database cursor (and written to the output) per batch
+BATCH_SIZE = 1000
+
+
+def _products():
+    return db.select(
+        Product.id, Product.name, Product.model, Product.buying_price,
+        Product.selling_price, Product.stock_quantity, Product.updated_at
+    ).order_by(Product.id)
+
+
+def _sales():
+    return db.select(
+        Sale.id, Sale.sale_date, Sale.sale_type, Customer.name, Customer.phone,
+        Product.name, Product.model, Sale.total_amount, Sale.paid_amount
+    ).join(Customer, Sale.customer_id == Customer.id).join(Product, Sale.product_id == Product.id) \
+        .order_by(Sale.id)
+
+
+def _ledgers():
+    remaining = EMI_Ledger.remaining_amount
+    return db.select(
+        EMI_Ledger.id, EMI_Ledger.sale_id, Customer.name, Customer.phone, EMI_Ledger.status,
+        EMI_Ledger.total_installments, EMI_Ledger.installments_paid, EMI_Ledger.monthly_amount,
+        EMI_Ledger.interest_rate, EMI_Ledger.interest_method, EMI_Ledger.next_payment_date,
+        EMI_Ledger.days_overdue, remaining
+    ).join(Sale, EMI_Ledger.sale_id == Sale.id).join(Customer, Sale.customer_id == Customer.id) \
+        .order_by(EMI_Ledger.id)
+
+
+# dataset -> (CSV header, query builder)
+DATASETS = {
+    'products': (
+        ['id', 'name', 'model', 'buying_price', 'selling_price', 'stock_quantity', 'updated_at'],
+        _products
+    ),
+    'sales': (
+        ['id', 'sale_date', 'sale_type', 'customer_name', 'customer_phone',
+         'product_name', 'product_model', 'total_amount', 'paid_amount'],
+        _sales
+    ),
+    'ledgers': (
+        ['id', 'sale_id', 'customer_name', 'customer_phone', 'status', 'total_installments',
+         'installments_paid', 'monthly_amount', 'interest_rate', 'interest_method',
+         'next_payment_date', 'days_overdue', 'remaining_amount'],
+        _ledgers
+    ),
+}
+
+
+def iter_csv(dataset, batch_size=BATCH_SIZE):
+    """
+    Stream a dataset as CSV text
+
+    Rows are read through a streaming cursor (server-side on PostgreSQL)
+    ``batch_size`` at a time and written out per batch, so memory use does
+    not grow with the table. The import file format is a subset of the
+    products export, so an export can be edited and imported back.
+
+    Args:
+        dataset: One of DATASETS
+        batch_size: Rows per fetch / yielded chunk
+
+    Yields:
+        str: CSV text, the header first
+    """
+    header, build = DATASETS[dataset]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    writer.writerow(header)
+    yield flush()
+
+    result = db.session.execute(build().execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        writer.writerows(rows)
+        yield flush()
@@ -0,0 +1,335 @@
+"""
+Content-addressed storage for uploaded photos.
+
+Uploads are streamed to disk while being hashed and stored as
+``<MEDIA_FOLDER>/<first two hex digits>/<sha256>.<ext>``: identical photos
+are kept once and names never collide. The smaller copies in VARIANTS
+(JPEG) are made by a background thread pool after the request returns;
+until a copy exists the original is served in its place. Resizing needs
+the Pillow package; without it only originals are served.
+
+Records store the key (``<sha256>.<ext>``). Photos uploaded before this
+storage existed keep their old file name and are served from
+LEGACY_FOLDER until ``flask rebuild-media`` moves them in.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, url_for
+from database import db
+
+
+logger = logging.getLogger(__name__)
+
+# Resized copies: variant -> longest side in pixels
+VARIANTS = {'thumb': 320, 'display': 1280}
+JPEG_QUALITY = 80
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+# Bytes read from the upload per hash / write step
+CHUNK_SIZE = 64 * 1024
+
+# Seconds a stored photo is kept after it was last written or re-uploaded even
+# if no record uses it, so the record of a request still in flight can land
+UNUSED_GRACE = 3600
+
+# Debt photos saved before content-addressed storage, under the static folder
+LEGACY_FOLDER = os.path.join('uploads', 'debt_photos')
+
+KEY_PATTERN = re.compile(r'^[0-9a-f]{64}\.(png|jpg|gif)$')
+
+
+def is_media_key(name):
+    """True for a content-addressed key, False for a legacy file name"""
+    return bool(name and KEY_PATTERN.match(name))
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def media_root(app=None):
+    """Absolute storage directory (MEDIA_FOLDER, relative to the app root)"""
+    app = app or current_app
+    return os.path.join(app.root_path, app.config.get('MEDIA_FOLDER', os.path.join('static', 'media')))
+
+
+def media_path(key, variant=None, root=None):
+    """
+    File path of a stored photo
+
+    Args:
+        key: Content-addressed key
+        variant: One of VARIANTS, or None for the original
+        root: Storage directory (defaults to the current app's)
+    """
+    digest, extension = key.split('.', 1)
+    name = key if variant is None else f'{digest}_{variant}.jpg'
+    return os.path.join(root or media_root(), digest[:2], name)
+
+
+def _pillow_available():
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def store_upload(file):
+    """
+    Save an uploaded photo under its content hash
+
+    The upload is copied in chunks to a temporary file in the storage
+    directory and renamed into place, so concurrent uploads of the same
+    photo end up as one file. Resized copies are queued for the worker
+    pool.
+
+    Args:
+        file: werkzeug FileStorage with an allowed extension
+
+    Returns:
+        str: The photo's key
+    """
+    if not file or not file.filename or not allowed_file(file.filename):
+        raise ValueError('unsupported photo type')
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    if extension == 'jpeg':
+        extension = 'jpg'
+
+    root = media_root()
+    os.makedirs(root, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=root, suffix='.part')
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                output.write(chunk)
+                size += len(chunk)
+        if not size:
+            raise ValueError('empty photo')
+
+        key = f'{digest.hexdigest()}.{extension}'
+        target = media_path(key, root=root)
+        try:
+            # Same photo already stored: refresh its age so it is not removed
+            # as unused before this request's record is committed
+            os.utime(target)
+            os.remove(temporary)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(temporary, target)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+    schedule_variants(key)
+    return key
+
+
+def make_variants(key, root):
+    """
+    Write the missing resized copies of a stored photo (runs in the pool)
+
+    Returns:
+        int: Number of copies written
+    """
+    from PIL import Image, ImageOps
+
+    source = media_path(key, root=root)
+    written = 0
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)  # Phone photos carry their rotation in EXIF
+            if image.mode not in ('RGB', 'L'):
+                background = Image.new('RGB', image.size, 'white')
+                rgba = image.convert('RGBA')
+                background.paste(rgba, mask=rgba.getchannel('A'))
+                image = background
+            for variant, side in VARIANTS.items():
+                target = media_path(key, variant, root=root)
+                if os.path.exists(target):
+                    continue
+                copy = image.copy()
+                copy.thumbnail((side, side))
+                descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.part')
+                with os.fdopen(descriptor, 'wb') as output:
+                    copy.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+                os.replace(temporary, target)
+                written += 1
+    except Exception:
+        logger.exception('Resizing photo %s failed', key)
+    return written
+
+
+def _pool():
+    return current_app.extensions.get('media_pool')
+
+
+def schedule_variants(key):
+    """Queue resizing of a stored photo (no-op without Pillow or a pool)"""
+    pool = _pool()
+    if pool is not None and current_app.extensions.get('media_resize'):
+        pool.submit(make_variants, key, media_root())
+
+
+def _remove_if_unused(app, name):
+    """
+    Delete a photo and its copies once no record points at it (runs in the pool)
+
+    A stored photo written or re-uploaded within UNUSED_GRACE is kept: an
+    upload of the same bytes may not have committed its record yet.
+    ``flask rebuild-media --prune`` removes it later if it stays unused.
+    """
+    from models.debt import DebtRecord
+
+    with app.app_context():
+        try:
+            if DebtRecord.query.filter_by(photo=name).first() is not None:
+                return
+            if is_media_key(name):
+                paths = [media_path(name, variant, media_root(app)) for variant in (None, *VARIANTS)]
+                if os.path.exists(paths[0]) and os.path.getmtime(paths[0]) > time.time() - UNUSED_GRACE:
+                    return
+            else:
+                paths = [os.path.join(app.static_folder, LEGACY_FOLDER, name)]
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        except Exception:
+            logger.exception('Removing photo %s failed', name)
+        finally:
+            db.session.remove()
+
+
+def discard(name):
+    """
+    Delete a photo in the background if no record uses it any more
+
+    Call after the commit that dropped the reference. Identical uploads
+    share a file, so the worker checks for other records first.
+
+    Args:
+        name: Key or legacy file name (None is ignored)
+    """
+    if not name:
+        return
+    app = current_app._get_current_object()
+    pool = _pool()
+    if pool is None:
+        _remove_if_unused(app, name)
+    else:
+        pool.submit(_remove_if_unused, app, name)
+
+
+def media_url(name, variant='thumb'):
+    """
+    URL of a photo (template global)
+
+    Args:
+        name: Key or legacy file name
+        variant: One of VARIANTS, or 'original'
+    """
+    if not name:
+        return None
+    if not is_media_key(name):
+        return url_for('static', filename=f'uploads/debt_photos/{name}')
+    return url_for('media.serve', variant=variant, key=name)
+
+
+def rebuild_media(prune=False, min_age=UNUSED_GRACE):
+    """
+    Move legacy debt photos into the store and write missing resized copies
+
+    Runs synchronously (for the CLI). Legacy files are hashed and moved
+    in, and their records repointed at the key.
+
+    Args:
+        prune: Also delete stored photos no record uses
+        min_age: Seconds an unused photo must be old before it is pruned,
+            so uploads of requests still in flight are kept
+
+    Returns:
+        dict: Counts of photos migrated, copies written, photos pruned
+            and legacy files missing
+    """
+    from models.debt import DebtRecord
+
+    root = media_root()
+    legacy_root = os.path.join(current_app.static_folder, LEGACY_FOLDER)
+    result = {'migrated': 0, 'resized': 0, 'pruned': 0, 'missing': 0}
+
+    try:
+        for record in DebtRecord.query.filter(DebtRecord.photo.isnot(None), DebtRecord.photo != ''):
+            if is_media_key(record.photo):
+                continue
+            path = os.path.join(legacy_root, record.photo)
+            if not os.path.exists(path):
+                result['missing'] += 1
+                continue
+            digest = hashlib.sha256()
+            with open(path, 'rb') as source:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            extension = record.photo.rsplit('.', 1)[-1].lower().replace('jpeg', 'jpg')
+            key = f'{digest.hexdigest()}.{extension}'
+            target = media_path(key, root=root)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.exists(target):
+                os.remove(path)
+            else:
+                os.replace(path, target)
+            record.photo = key
+            result['migrated'] += 1
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    used = {
+        photo for (photo,) in db.session.query(DebtRecord.photo).filter(DebtRecord.photo.isnot(None)).distinct()
+        if is_media_key(photo)
+    }
+    if _pillow_available():
+        for key in sorted(used):
+            if os.path.exists(media_path(key, root=root)):
+                result['resized'] += make_variants(key, root)
+    else:
+        logger.warning('Pillow is not installed; resized photo copies were not written')
+
+    if prune and os.path.isdir(root):
+        # Originals, resized copies and abandoned temporary files all start with their digest
+        used_digests = {key.split('.', 1)[0] for key in used}
+        cutoff = time.time() - min_age
+        for directory, _, files in os.walk(root):
+            for name in files:
+                path = os.path.join(directory, name)
+                if name[:64] in used_digests or os.path.getmtime(path) > cutoff:
+                    continue
+                os.remove(path)
+                result['pruned'] += 1
+    return result
+
+
+def init_media(app):
+    """
+    Start the photo worker pool and register the ``media_url`` template global
+
+    Args:
+        app: Flask application instance
+    """
+    if 'media_pool' not in app.extensions:
+        app.extensions['media_pool'] = ThreadPoolExecutor(
+            max_workers=app.config.get('MEDIA_WORKERS', 2), thread_name_prefix='media')
+    app.extensions['media_resize'] = _pillow_available()
+    if not app.extensions['media_resize']:
+        logger.warning('Pillow is not installed; photos are served at full size')
+    app.add_template_global(media_url)
@@ -0,0 +1,152 @@
+import base64
+import json
+from datetime import date, datetime
+from database import db
+from config import Config
+
+
+class KeysetPage:
+    """One page of a keyset-paginated query"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, per_page=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def to_dict(self, serializer=None):
+        """Convert page to dictionary for JSON list endpoints"""
+        serializer = serializer or (lambda item: item.to_dict())
+        return {
+            'items': [serializer(item) for item in self.items],
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+            'per_page': self.per_page
+        }
+
+
+def encode_cursor(values):
+    """Encode key values as an opaque URL-safe cursor"""
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string from the request
+        columns: Key columns, used to restore date values
+
+    Returns:
+        list: Key values, or None if the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+
+        decoded = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            else:
+                value = python_type(value)
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+
+def _after(columns, values):
+    """Row-value comparison (c1, c2, ...) > (v1, v2, ...) in portable SQL"""
+    column, value = columns[0], values[0]
+    if len(columns) == 1:
+        return column > value
+    return db.or_(column > value, db.and_(column == value, _after(columns[1:], values[1:])))
+
+
+def _before(columns, values):
+    """Row-value comparison (c1, c2, ...) < (v1, v2, ...) in portable SQL"""
+    column, value = columns[0], values[0]
+    if len(columns) == 1:
+        return column < value
+    return db.or_(column < value, db.and_(column == value, _before(columns[1:], values[1:])))
+
+
+def keyset_paginate(query, columns, after=None, before=None, per_page=None):
+    """
+    Paginate a query by seeking past the last seen key instead of OFFSET
+
+    The key columns must be unique together (end with the primary key) and
+    should be covered by an index so that deep pages cost the same as the
+    first one.
+
+    Args:
+        query: Base query (filters applied, no ordering)
+        columns: Ascending key columns, e.g. [Model.due_date, Model.id]
+        after: Cursor of the last row of the previous page
+        before: Cursor of the first row of the next page (going back)
+        per_page: Page size (defaults to Config.ITEMS_PER_PAGE)
+
+    Returns:
+        KeysetPage: Items with next/previous cursors
+    """
+    per_page = per_page or Config.ITEMS_PER_PAGE
+    after_values = decode_cursor(after, columns) if after else None
+    before_values = decode_cursor(before, columns) if before else None
+
+    def key_of(item):
+        return encode_cursor([getattr(item, column.key) for column in columns])
+
+    if before_values is not None:
+        rows = (query.filter(_before(columns, before_values))
+                .order_by(*[column.desc() for column in columns])
+                .limit(per_page + 1).all())
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPage(
+            items,
+            next_cursor=key_of(items[-1]) if items else None,
+            prev_cursor=key_of(items[0]) if items and has_more else None,
+            per_page=per_page
+        )
+
+    if after_values is not None:
+        query = query.filter(_after(columns, after_values))
+
+    rows = query.order_by(*[column.asc() for column in columns]).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    return KeysetPage(
+        items,
+        next_cursor=key_of(items[-1]) if items and has_more else None,
+        prev_cursor=key_of(items[0]) if items and after_values is not None else None,
+        per_page=per_page
+    )
+
+
+def paginate_request(query, columns, args, per_page=None):
+    """Paginate using the 'after' / 'before' cursors from request args"""
+    if per_page is None:
+        try:
+            per_page = min(int(args.get('per_page', Config.ITEMS_PER_PAGE)), 100)
+        except ValueError:
+            per_page = Config.ITEMS_PER_PAGE
+    return keyset_paginate(query, columns,
+                           after=args.get('after'),
+                           before=args.get('before'),
+                           per_page=max(per_page, 1))
@@ -0,0 +1,280 @@
+import csv
+import io
+import os
+from datetime import datetime
+from itertools import islice
+from database import db
+from models.product import Product
+from models.inventory import StockMovement, InventoryValuation
+from services.cache import invalidate
+
+
+# Rows upserted per statement / transaction; a failing chunk only rolls back itself
+CHUNK_SIZE = 500
+
+# Per-row errors kept in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+COLUMNS = ('name', 'model', 'buying_price', 'selling_price', 'stock_quantity')
+
+STOCK_MODES = ('add', 'set')
+
+
+def validate_product(data):
+    """
+    Validate product fields with the rules of the inventory form
+
+    Args:
+        data: Mapping with name, model, buying_price, selling_price and
+            optional stock_quantity (strings or numbers)
+
+    Returns:
+        tuple: (clean values dict or None, error message or None,
+            warning message or None)
+    """
+    name = str(data.get('name') or '').strip()
+    model = str(data.get('model') or '').strip()
+    try:
+        buying_price = float(data.get('buying_price'))
+        selling_price = float(data.get('selling_price'))
+        stock = data.get('stock_quantity')
+        stock_quantity = int(float(stock)) if stock not in (None, '') else 0
+    except (TypeError, ValueError):
+        return None, 'অবৈধ মূল্য বা স্টক সংখ্যা!', None
+
+    if not name or not model:
+        return None, 'পণ্যের নাম এবং মডেল আবশ্যক!', None
+
+    if buying_price <= 0 or selling_price <= 0:
+        return None, 'মূল্য অবশ্যই শূন্যের চেয়ে বেশি হতে হবে!', None
+
+    if stock_quantity < 0:
+        return None, 'স্টক সংখ্যা ঋণাত্মক হতে পারে না!', None
+
+    warning = None
+    if selling_price < buying_price:
+        warning = 'বিক্রয় মূল্য ক্রয় মূল্যের চেয়ে কম হতে পারে না!'
+
+    return {
+        'name': name,
+        'model': model,
+        'buying_price': buying_price,
+        'selling_price': selling_price,
+        'stock_quantity': stock_quantity
+    }, None, warning
+
+
+def iter_csv_rows(stream):
+    """
+    Stream dict rows from a CSV file
+
+    Args:
+        stream: Binary file object
+
+    Yields:
+        dict: One row, keyed by lower-cased header
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = [column.strip().lower() for column in next(reader, [])]
+    for values in reader:
+        if any(value.strip() for value in values):
+            yield dict(zip(header, values))
+
+
+def iter_xlsx_rows(stream):
+    """
+    Stream dict rows from the first sheet of an Excel workbook
+
+    Uses openpyxl's read-only mode, which parses the sheet lazily.
+
+    Args:
+        stream: Seekable binary file object
+
+    Yields:
+        dict: One row, keyed by lower-cased header
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('Excel import needs the openpyxl package; upload CSV instead')
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(column or '').strip().lower() for column in next(rows, ())]
+        for values in rows:
+            if any(value not in (None, '') for value in values):
+                yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_rows(stream, filename):
+    """Pick the CSV or Excel reader from the file extension"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        return iter_xlsx_rows(stream)
+    if extension in ('.csv', '.txt', ''):
+        return iter_csv_rows(stream)
+    raise ValueError(f'unsupported file type {extension}; use .csv or .xlsx')
+
+
+def _upsert_statement(rows, stock_mode):
+    """INSERT ... ON CONFLICT (name, model) DO UPDATE for SQLite / PostgreSQL"""
+    table = Product.__table__
+    if db.session.get_bind().dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+
+    stmt = insert(table).values(rows)
+    stock = stmt.excluded.stock_quantity
+    if stock_mode == 'add':
+        stock = table.c.stock_quantity + stock
+    return stmt.on_conflict_do_update(
+        index_elements=['name', 'model'],
+        set_={
+            'buying_price': stmt.excluded.buying_price,
+            'selling_price': stmt.excluded.selling_price,
+            'stock_quantity': stock,
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+
+
+def _apply_chunk(rows, stock_mode):
+    """
+    Upsert one chunk of validated rows inside the current transaction
+
+    Rows repeating a (name, model) within the chunk are merged first, since
+    one statement cannot update the same row twice. Stock changes are
+    journaled from the before / after rows: new products and added
+    quantities as receipts, replaced counts as adjustments.
+
+    Returns:
+        tuple: (products inserted, products updated)
+    """
+    merged = {}
+    for values in rows:
+        key = (values['name'], values['model'])
+        if key in merged and stock_mode == 'add':
+            values = dict(values, stock_quantity=merged[key]['stock_quantity'] + values['stock_quantity'])
+        merged[key] = values
+
+    names = {name for name, _ in merged}
+    columns = (Product.id, Product.name, Product.model, Product.stock_quantity, Product.buying_price)
+    before = {
+        (row.name, row.model): row for row in
+        db.session.query(*columns).filter(Product.name.in_(names))
+        if (row.name, row.model) in merged
+    }
+    existing = set(before)
+
+    now = datetime.utcnow()
+    payload = [dict(values, created_at=now, updated_at=now) for values in merged.values()]
+
+    if db.session.get_bind().dialect.name in ('sqlite', 'postgresql'):
+        db.session.execute(_upsert_statement(payload, stock_mode))
+    else:
+        # Generic fallback: executemany UPDATE for known products, bulk INSERT for new ones
+        table = Product.__table__
+        updates = [row for row in payload if (row['name'], row['model']) in existing]
+        if updates:
+            stock = db.bindparam('b_stock_quantity')
+            if stock_mode == 'add':
+                stock = table.c.stock_quantity + stock
+            db.session.execute(
+                table.update()
+                .where(table.c.name == db.bindparam('b_name'), table.c.model == db.bindparam('b_model'))
+                .values(buying_price=db.bindparam('b_buying_price'),
+                        selling_price=db.bindparam('b_selling_price'),
+                        stock_quantity=stock,
+                        updated_at=db.bindparam('b_updated_at')),
+                [{f'b_{column}': value for column, value in row.items()} for row in updates]
+            )
+        inserts = [row for row in payload if (row['name'], row['model']) not in existing]
+        if inserts:
+            db.session.execute(table.insert(), inserts)
+
+    movements = []
+    revalued = 0.0
+    for row in db.session.query(*columns).filter(Product.name.in_(names)):
+        if (row.name, row.model) not in merged:
+            continue
+        old = before.get((row.name, row.model))
+        if old is None:
+            kind, quantity = 'receipt', row.stock_quantity
+        else:
+            kind = 'receipt' if stock_mode == 'add' else 'adjustment'
+            quantity = row.stock_quantity - old.stock_quantity
+            revalued += old.stock_quantity * (row.buying_price - old.buying_price)
+        movements.append({'product_id': row.id, 'kind': kind, 'quantity': quantity,
+                          'balance_after': row.stock_quantity, 'unit_cost': row.buying_price,
+                          'note': 'import'})
+    StockMovement.record_many(movements)
+    InventoryValuation.apply(0, revalued)
+
+    return len(merged) - len(existing), len(existing)
+
+
+def import_products(raw_rows, stock_mode='add', chunk_size=CHUNK_SIZE):
+    """
+    Validate and upsert products keyed on (name, model)
+
+    Rows are consumed lazily and committed a chunk at a time, so memory
+    stays flat whatever the file size. Known products get the new prices;
+    their stock is increased by the row's quantity (``stock_mode='add'``,
+    a supplier shipment) or replaced by it (``'set'``, a stock count).
+
+    Args:
+        raw_rows: Iterable of dicts with the COLUMNS keys
+        stock_mode: 'add' or 'set'
+        chunk_size: Rows per transaction
+
+    Returns:
+        dict: Counts, per-row errors (row numbers count data rows from 1)
+            and warnings
+    """
+    if stock_mode not in STOCK_MODES:
+        raise ValueError(f'stock mode must be one of {", ".join(STOCK_MODES)}')
+
+    report = {'rows': 0, 'inserted': 0, 'updated': 0, 'failed': 0, 'errors': [], 'warnings': 0}
+
+    def fail(number, message):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': number, 'error': message})
+
+    numbered = enumerate(raw_rows, start=1)
+    while True:
+        batch = list(islice(numbered, chunk_size))
+        if not batch:
+            break
+
+        valid = []
+        for number, raw in batch:
+            report['rows'] += 1
+            values, error, warning = validate_product(raw)
+            if error:
+                fail(number, error)
+                continue
+            if warning:
+                report['warnings'] += 1
+            valid.append((number, values))
+
+        if not valid:
+            continue
+        try:
+            inserted, updated = _apply_chunk([values for _, values in valid], stock_mode)
+            invalidate('product')
+            db.session.commit()
+            report['inserted'] += inserted
+            report['updated'] += updated
+        except Exception as e:
+            db.session.rollback()
+            for number, _ in valid:
+                fail(number, f'ত্রুটি: {str(e)}')
+
+    report['errors_truncated'] = report['failed'] > len(report['errors'])
+    return report
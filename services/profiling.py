@@ -0,0 +1,260 @@
+"""
+Per-request SQL and latency profiling.
+
+SQLAlchemy cursor events time every statement and Flask's template
+signals time rendering; both are charged to the current request. At the
+end of a request the totals go into a process-wide registry, are sent
+back in a ``Server-Timing`` header (visible in the browser's network
+panel) and, when the same statement shape ran PROFILING_N_PLUS_ONE times
+or more, an N+1 warning is logged.
+
+The registry is per process, like the memory response cache: with
+several gunicorn workers each scrape of ``/metrics`` sees the worker
+that answered it.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+# Request duration histogram buckets (seconds)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Slowest statements kept process-wide
+SLOW_STATEMENTS_KEPT = 20
+
+# Statements listed per request in the slow request log line
+SLOW_STATEMENTS_PER_REQUEST = 3
+
+_IN_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def labels(**values):
+    """Prometheus label set, values escaped"""
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in values.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def statement_shape(statement):
+    """Normalize SQL so queries differing only in bound values / IN-list length compare equal"""
+    return _SPACES.sub(' ', _IN_LIST.sub('(?)', statement)).strip()
+
+
+class RequestProfile:
+    """Timings collected while one request is handled"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.shapes = Counter()
+        self.slowest = []  # (seconds, statement), longest first
+        self._render_started = []
+
+    def add_query(self, statement, elapsed):
+        self.query_count += 1
+        self.sql_time += elapsed
+        self.shapes[statement_shape(statement)] += 1
+        if len(self.slowest) < SLOW_STATEMENTS_PER_REQUEST or elapsed > self.slowest[-1][0]:
+            self.slowest.append((elapsed, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[SLOW_STATEMENTS_PER_REQUEST:]
+
+    def repeated_shapes(self, threshold):
+        """Statement shapes run at least ``threshold`` times, most frequent first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class MetricsRegistry:
+    """Process-wide request / SQL counters, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()  # (endpoint, method, status) -> count
+        self.durations = {}  # endpoint -> [bucket counts..., +Inf count, sum]
+        self.queries = Counter()
+        self.sql_seconds = Counter()
+        self.render_seconds = Counter()
+        self.n_plus_one = Counter()
+        self.slow_statements = []  # dicts, longest first
+
+    def observe(self, endpoint, method, status, duration, profile, suspects):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            histogram = self.durations.setdefault(endpoint, [0] * (len(DURATION_BUCKETS) + 1) + [0.0])
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    histogram[index] += 1
+            histogram[len(DURATION_BUCKETS)] += 1
+            histogram[-1] += duration
+            self.queries[endpoint] += profile.query_count
+            self.sql_seconds[endpoint] += profile.sql_time
+            self.render_seconds[endpoint] += profile.render_time
+            if suspects:
+                self.n_plus_one[endpoint] += 1
+
+            for elapsed, statement in profile.slowest:
+                if len(self.slow_statements) >= SLOW_STATEMENTS_KEPT and elapsed <= self.slow_statements[-1]['seconds']:
+                    break
+                self.slow_statements.append({
+                    'seconds': round(elapsed, 6),
+                    'endpoint': endpoint,
+                    'statement': statement_shape(statement)
+                })
+                self.slow_statements.sort(key=lambda item: item['seconds'], reverse=True)
+                del self.slow_statements[SLOW_STATEMENTS_KEPT:]
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                '# HELP showroom_http_requests_total Requests handled, by endpoint, method and status.',
+                '# TYPE showroom_http_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'showroom_http_requests_total{labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+            lines += [
+                '# HELP showroom_http_request_duration_seconds Request handling time.',
+                '# TYPE showroom_http_request_duration_seconds histogram',
+            ]
+            for endpoint, histogram in sorted(self.durations.items()):
+                for bound, count in zip(DURATION_BUCKETS, histogram):
+                    lines.append(f'showroom_http_request_duration_seconds_bucket{labels(endpoint=endpoint, le=bound)} {count}')
+                lines.append(f'showroom_http_request_duration_seconds_bucket{labels(endpoint=endpoint, le="+Inf")} '
+                             f'{histogram[len(DURATION_BUCKETS)]}')
+                lines.append(f'showroom_http_request_duration_seconds_sum{labels(endpoint=endpoint)} {histogram[-1]:.6f}')
+                lines.append(f'showroom_http_request_duration_seconds_count{labels(endpoint=endpoint)} '
+                             f'{histogram[len(DURATION_BUCKETS)]}')
+
+            for name, help_text, values, fmt in (
+                ('showroom_sql_queries_total', 'SQL statements executed while handling requests.', self.queries, '{}'),
+                ('showroom_sql_duration_seconds_total', 'Time spent in SQL statements.', self.sql_seconds, '{:.6f}'),
+                ('showroom_template_render_seconds_total', 'Time spent rendering templates.', self.render_seconds, '{:.6f}'),
+                ('showroom_n_plus_one_requests_total', 'Requests that repeated one statement shape (N+1 suspects).',
+                 self.n_plus_one, '{}'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{name}{labels(endpoint=endpoint)} {fmt.format(value)}')
+            return '\n'.join(lines) + '\n'
+
+    def slow(self):
+        with self._lock:
+            return list(self.slow_statements)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('profiling_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('profiling_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if has_request_context():
+        profile = g.get('_profile')
+        if profile is not None:
+            profile.add_query(statement, elapsed)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    connection = context.connection
+    if connection is not None and connection.info.get('profiling_started'):
+        connection.info['profiling_started'].pop()
+
+
+def _render_started(sender, template, context, **extra):
+    profile = g.get('_profile') if has_request_context() else None
+    if profile is not None:
+        profile._render_started.append(time.perf_counter())
+
+
+def _render_finished(sender, template, context, **extra):
+    profile = g.get('_profile') if has_request_context() else None
+    if profile is not None and profile._render_started:
+        profile.render_time += time.perf_counter() - profile._render_started.pop()
+
+
+def _start_request():
+    g._profile = RequestProfile()
+
+
+def _finish_request(response):
+    from flask import current_app
+
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return response
+    duration = time.perf_counter() - profile.started
+    endpoint = request.endpoint or 'unmatched'
+    config = current_app.config
+
+    suspects = profile.repeated_shapes(config.get('PROFILING_N_PLUS_ONE', 5))
+    for shape, count in suspects:
+        logger.warning('Possible N+1 on %s %s: %d x %s', request.method, request.path, count, shape[:300])
+
+    if duration * 1000 >= config.get('PROFILING_SLOW_REQUEST_MS', 500):
+        logger.warning('Slow request %s %s: %.1f ms, %d queries (%.1f ms SQL); slowest: %s',
+                       request.method, request.path, duration * 1000, profile.query_count,
+                       profile.sql_time * 1000,
+                       '; '.join(f'{seconds * 1000:.1f} ms {statement_shape(sql)[:200]}'
+                                 for seconds, sql in profile.slowest))
+
+    current_app.extensions['profiling'].observe(endpoint, request.method, str(response.status_code),
+                                                duration, profile, suspects)
+
+    if config.get('PROFILING_SERVER_TIMING', True):
+        response.headers.add('Server-Timing', f'db;dur={profile.sql_time * 1000:.2f};desc="{profile.query_count} queries"')
+        if profile.render_time:
+            response.headers.add('Server-Timing', f'render;dur={profile.render_time * 1000:.2f}')
+        response.headers.add('Server-Timing', f'total;dur={duration * 1000:.2f}')
+    return response
+
+
+def init_profiling(app):
+    """
+    Install request profiling when PROFILING_ENABLED is set
+
+    Args:
+        app: Flask application instance
+
+    Returns:
+        MetricsRegistry or None
+    """
+    if not app.config.get('PROFILING_ENABLED', True):
+        return None
+    if 'profiling' in app.extensions:
+        return app.extensions['profiling']
+
+    registry = app.extensions['profiling'] = MetricsRegistry()
+    # Listening on the Engine class covers every engine and bind
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    return registry
+
+
+def get_registry():
+    """Metrics registry of the current app (None when profiling is off)"""
+    from flask import current_app
+    return current_app.extensions.get('profiling')
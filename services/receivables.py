@@ -0,0 +1,225 @@
+from datetime import date, datetime, timedelta
+from database import db, upsert_rows
+from models.sales import EMI_Ledger
+from models.debt import DebtRecord
+from models.reports import ReceivableSnapshot, ReceivablesAgingDaily, ReportRefresh
+from utils.aging import RECEIVABLE_BUCKETS, bucket_case
+
+
+SNAPSHOT_NAME = 'receivables'
+
+# Re-read rows updated shortly before the last watermark, so transactions
+# that committed after a refresh started are not missed
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+# Snapshot rows replaced per DELETE / INSERT batch
+CHUNK_SIZE = 500
+
+SOURCE_TYPES = ('emi', 'debt')
+
+
+def _emi_rows(since):
+    """Changed EMI ledgers as (id, status, outstanding, due date, updated_at)"""
+    remaining = EMI_Ledger.remaining_amount
+    query = db.session.query(
+        EMI_Ledger.id, EMI_Ledger.status, remaining,
+        EMI_Ledger.next_payment_date, EMI_Ledger.updated_at
+    )
+    if since is not None:
+        query = query.filter(EMI_Ledger.updated_at > since)
+    # Completed ledgers owe nothing; defaulted ones are still receivable
+    return [tuple(row) + (row[1] in ('Active', 'Defaulted'),) for row in query]
+
+
+def _debt_rows(since):
+    """Changed debt records as (id, status, outstanding, due date, updated_at)"""
+    query = db.session.query(
+        DebtRecord.id, DebtRecord.status, DebtRecord.amount - DebtRecord.paid_amount,
+        DebtRecord.due_date, DebtRecord.updated_at
+    )
+    if since is not None:
+        query = query.filter(DebtRecord.updated_at > since)
+    return [tuple(row) + (row[1] != 'paid',) for row in query]
+
+
+def _replace_rows(source_type, rows):
+    """
+    Replace the snapshot rows of the given sources in batches
+
+    Returns:
+        int: Number of source rows reprocessed
+    """
+    table = ReceivableSnapshot.__table__
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        db.session.execute(
+            table.delete().where(
+                table.c.source_type == source_type,
+                table.c.source_id.in_([row[0] for row in chunk])
+            )
+        )
+        live = [
+            {
+                'source_type': source_type,
+                'source_id': source_id,
+                'status': status,
+                'outstanding': float(outstanding),
+                'due_date': due_date,
+                'source_updated_at': updated_at
+            }
+            for source_id, status, outstanding, due_date, updated_at, is_open in chunk
+            if is_open and outstanding > 0.005
+        ]
+        if live:
+            db.session.execute(table.insert(), live)
+    return len(rows)
+
+
+def _remove_orphans():
+    """Drop snapshot rows whose source record was deleted"""
+    table = ReceivableSnapshot.__table__
+    removed = 0
+    for source_type, model in (('emi', EMI_Ledger), ('debt', DebtRecord)):
+        removed += db.session.execute(
+            table.delete().where(
+                table.c.source_type == source_type,
+                ~db.exists().where(model.id == table.c.source_id)
+            )
+        ).rowcount
+    return removed
+
+
+def refresh_receivables(full=False):
+    """
+    Bring the receivable snapshot up to date
+
+    Only ledgers and debt records updated since the previous refresh are
+    reprocessed; the first run (or ``full=True``) rebuilds everything.
+
+    Args:
+        full: Rebuild the whole snapshot
+
+    Returns:
+        dict: Rows reprocessed per source, orphans removed and whether it was a full rebuild
+    """
+    started = datetime.utcnow()
+    state = db.session.get(ReportRefresh, SNAPSHOT_NAME)
+    if state is None:
+        state = ReportRefresh(name=SNAPSHOT_NAME)
+        db.session.add(state)
+
+    since = None if full or state.watermark is None else state.watermark - REFRESH_OVERLAP
+    if since is None:
+        db.session.execute(ReceivableSnapshot.__table__.delete())
+
+    result = {
+        'full': since is None,
+        'emi': _replace_rows('emi', _emi_rows(since)),
+        'debt': _replace_rows('debt', _debt_rows(since)),
+        'removed': _remove_orphans() if since is not None else 0
+    }
+
+    state.watermark = started
+    state.refreshed_at = started
+    db.session.commit()
+    return result
+
+
+def aging_totals(as_of):
+    """
+    Group the current snapshot into aging buckets as of a date
+
+    Returns:
+        list: (source_type, bucket, count, amount) tuples, zero rows included
+    """
+    inner = db.session.query(
+        ReceivableSnapshot.source_type.label('source_type'),
+        bucket_case(ReceivableSnapshot.due_date, as_of, RECEIVABLE_BUCKETS).label('bucket'),
+        ReceivableSnapshot.outstanding.label('outstanding')
+    ).subquery()
+
+    grouped = db.session.query(
+        inner.c.source_type,
+        inner.c.bucket,
+        db.func.count(),
+        db.func.coalesce(db.func.sum(inner.c.outstanding), 0.0)
+    ).group_by(inner.c.source_type, inner.c.bucket)
+    found = {(source_type, bucket): (count, float(amount)) for source_type, bucket, count, amount in grouped}
+
+    return [
+        (source_type, label) + found.get((source_type, label), (0, 0.0))
+        for source_type in SOURCE_TYPES
+        for label, _ in RECEIVABLE_BUCKETS
+    ]
+
+
+def snapshot_aging(as_of=None, full=False):
+    """
+    Refresh the snapshot and store today's aging totals
+
+    Re-running on the same day overwrites that day's rows. They are
+    upserted, so two refreshes of the same day (the nightly job and the
+    CLI, say) do not collide on the primary key.
+
+    Args:
+        as_of: Snapshot date (defaults to today)
+        full: Rebuild the receivable snapshot from scratch first
+
+    Returns:
+        dict: Refresh result
+    """
+    as_of = as_of or date.today()
+    result = refresh_receivables(full=full)
+
+    created_at = datetime.utcnow()
+    upsert_rows(ReceivablesAgingDaily, ('snapshot_date', 'source_type', 'bucket'), [
+        {'snapshot_date': as_of, 'source_type': source_type, 'bucket': bucket,
+         'item_count': count, 'amount': amount, 'created_at': created_at}
+        for source_type, bucket, count, amount in aging_totals(as_of)
+    ])
+    db.session.commit()
+    return result
+
+
+def aging_report(as_of=None, refresh=False):
+    """
+    Receivables aging report for a date
+
+    Served from the stored daily snapshot (written by the nightly job and
+    ``flask snapshot-receivables``). With ``refresh`` today's snapshot is
+    refreshed incrementally first.
+
+    Args:
+        as_of: Report date (defaults to today)
+        refresh: Refresh today's snapshot before reading it
+
+    Returns:
+        dict: Report, or None if no snapshot exists for the date
+    """
+    today = date.today()
+    as_of = as_of or today
+    if as_of == today and refresh:
+        snapshot_aging(as_of)
+
+    rows = ReceivablesAgingDaily.query.filter_by(snapshot_date=as_of).all()
+    if not rows:
+        return None
+
+    order = {label: index for index, (label, _) in enumerate(RECEIVABLE_BUCKETS)}
+    rows.sort(key=lambda row: (SOURCE_TYPES.index(row.source_type), order[row.bucket]))
+
+    totals = {label: 0.0 for label, _ in RECEIVABLE_BUCKETS}
+    counts = {label: 0 for label, _ in RECEIVABLE_BUCKETS}
+    for row in rows:
+        totals[row.bucket] += row.amount
+        counts[row.bucket] += row.item_count
+
+    return {
+        'as_of': as_of.isoformat(),
+        'generated_at': max(row.created_at for row in rows).strftime('%Y-%m-%d %H:%M:%S'),
+        'buckets': [label for label, _ in RECEIVABLE_BUCKETS],
+        'rows': [row.to_dict() for row in rows],
+        'totals': {label: round(amount, 2) for label, amount in totals.items()},
+        'counts': counts,
+        'total_outstanding': round(sum(totals.values()), 2)
+    }
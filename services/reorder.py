@@ -0,0 +1,143 @@
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from database import db
+from models.product import Product
+from models.sales import Sale, SaleItem
+
+
+# Product ids per executemany UPDATE batch
+UPDATE_BATCH_SIZE = 500
+
+
+def _units_sold(since):
+    """
+    Units sold per product since a timestamp
+
+    Cart lines come from sale items; sales recorded before line items
+    existed count one unit of their product.
+
+    Returns:
+        Counter: product id -> units
+    """
+    sold = Counter()
+    lines = (
+        db.session.query(SaleItem.product_id, db.func.sum(SaleItem.quantity))
+        .join(Sale, SaleItem.sale_id == Sale.id)
+        .filter(Sale.sale_date >= since)
+        .group_by(SaleItem.product_id)
+    )
+    for product_id, units in lines:
+        sold[product_id] += int(units)
+
+    legacy = (
+        db.session.query(Sale.product_id, db.func.count())
+        .filter(Sale.sale_date >= since, ~Sale.items.any())
+        .group_by(Sale.product_id)
+    )
+    for product_id, units in legacy:
+        sold[product_id] += int(units)
+    return sold
+
+
+def refresh_sales_velocity(today=None, window_days=None):
+    """
+    Recompute each product's sales velocity (units per day) from recent sales
+
+    Only products whose velocity changed are written, with one executemany
+    UPDATE per batch. Velocity is derived data, so updated_at is left as
+    it was, like the overdue sweeper does.
+
+    Args:
+        today: Reference date (defaults to today)
+        window_days: Days of history to average over; None uses
+            REORDER_VELOCITY_DAYS from the app config
+
+    Returns:
+        dict: Window, products selling, rows updated and products due for reorder
+    """
+    from flask import current_app
+
+    today = today or date.today()
+    if window_days is None:
+        window_days = current_app.config.get('REORDER_VELOCITY_DAYS', 30)
+    since = datetime.combine(today - timedelta(days=window_days), time.min)
+
+    velocities = {
+        product_id: round(units / window_days, 4)
+        for product_id, units in _units_sold(since).items()
+    }
+    # Products that were selling before and may have stopped
+    current = dict(db.session.query(Product.id, Product.sales_velocity).filter(Product.sales_velocity > 0))
+    missing = [product_id for product_id in velocities if product_id not in current]
+    for start in range(0, len(missing), UPDATE_BATCH_SIZE):
+        current.update(db.session.query(Product.id, Product.sales_velocity)
+                       .filter(Product.id.in_(missing[start:start + UPDATE_BATCH_SIZE])))
+
+    changes = [
+        {'b_id': product_id, 'b_velocity': velocities.get(product_id, 0.0)}
+        for product_id, velocity in current.items()
+        if velocities.get(product_id, 0.0) != velocity
+    ]
+
+    try:
+        stmt = (
+            db.update(Product.__table__)
+            .where(Product.__table__.c.id == db.bindparam('b_id'))
+            .values(sales_velocity=db.bindparam('b_velocity'), updated_at=Product.__table__.c.updated_at)
+        )
+        for start in range(0, len(changes), UPDATE_BATCH_SIZE):
+            db.session.execute(stmt, changes[start:start + UPDATE_BATCH_SIZE])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        'date': today.isoformat(),
+        'window_days': window_days,
+        'selling': len(velocities),
+        'updated': len(changes),
+        'reorder_needed': Product.query.filter(Product.needs_reorder()).count()
+    }
+
+
+def reorder_alerts(limit=20, lead_days=None, cover_days=None):
+    """
+    Products at or below their reorder level, lowest stock margin first
+
+    Both queries are range scans of ix_product_reorder_gap, so the cost
+    follows the number of alerts, not the catalogue size.
+
+    Args:
+        limit: Most alerts returned
+        lead_days: Supplier lead time (defaults to REORDER_LEAD_DAYS)
+        cover_days: Days of sales an order covers (defaults to REORDER_COVER_DAYS)
+
+    Returns:
+        dict: 'count' of products due and the first ``limit`` as 'items'
+    """
+    from flask import current_app
+
+    if lead_days is None:
+        lead_days = current_app.config.get('REORDER_LEAD_DAYS', 7)
+    if cover_days is None:
+        cover_days = current_app.config.get('REORDER_COVER_DAYS', 30)
+
+    query = Product.query.filter(Product.needs_reorder())
+    products = query.order_by(Product.reorder_gap(), Product.id).limit(limit).all()
+    count = len(products) if len(products) < limit else query.count()
+
+    items = []
+    for product in products:
+        days_of_cover = product.get_days_of_cover()
+        items.append({
+            'id': product.id,
+            'name': product.name,
+            'model': product.model,
+            'stock_quantity': product.stock_quantity,
+            'reorder_level': product.reorder_level,
+            'sales_velocity': product.sales_velocity,
+            'days_of_cover': round(days_of_cover, 1) if days_of_cover is not None else None,
+            'reorder_quantity': product.get_reorder_quantity(lead_days, cover_days)
+        })
+    return {'count': count, 'items': items}
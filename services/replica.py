@@ -0,0 +1,172 @@
+"""
+Read-replica routing for dashboards and stats endpoints.
+
+With DB_REPLICA_URL set the app gets a second bind (REPLICA_BIND). GET
+and HEAD requests to the endpoints or blueprints in DB_REPLICA_ENDPOINTS
+read from it; ``RoutingSession`` keeps every write on the primary.
+
+Read-your-writes: a successful write request stamps the user's session
+cookie, and that browser reads from the primary for the next
+DB_REPLICA_STICKY_SECONDS, longer than the replica is expected to lag.
+The response cache is shared, so a stats entry filled from a lagging
+replica right after a write can be served until CACHE_DEFAULT_TTL.
+
+Fallback: the replica connection is checked out before a request is
+routed to it. If that fails, or a statement on the replica fails with an
+operational error, the replica is skipped for DB_REPLICA_RETRY_SECONDS
+and reads go to the primary. A request whose replica statement failed
+mid-way still errors; the ones after it do not.
+
+The replica's schema and data come from replication (PostgreSQL
+streaming replication, or ``flask sync-replica`` for a local SQLite copy);
+``create_all`` and ``flask upgrade-db`` only touch the primary.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from functools import partial
+from flask import current_app, g, request, session
+from sqlalchemy import event, exc
+from database import db, REPLICA_BIND
+
+
+logger = logging.getLogger(__name__)
+
+# Session cookie key: reads stay on the primary until this UNIX time
+STICKY_KEY = '_primary_until'
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+class ReplicaRouter:
+    """Which requests may read from the replica, and whether it is up"""
+
+    def __init__(self, endpoints, sticky_seconds, retry_seconds):
+        self.endpoints = frozenset(endpoint.strip() for endpoint in endpoints if endpoint.strip())
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self.counts = Counter()  # replica / sticky / fallback
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    def matches(self, endpoint):
+        """True for a listed endpoint ('emi.dashboard') or one of a listed blueprint ('reports')"""
+        return bool(endpoint) and (endpoint in self.endpoints or endpoint.split('.', 1)[0] in self.endpoints)
+
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    def mark_down(self, error):
+        with self._lock:
+            if self.available():
+                logger.warning('Read replica unavailable, reading from the primary for %ss: %s',
+                               self.retry_seconds, error)
+            self._down_until = time.monotonic() + self.retry_seconds
+
+    def count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def status(self):
+        with self._lock:
+            return {
+                'available': self.available(),
+                'endpoints': sorted(self.endpoints),
+                **self.counts
+            }
+
+
+def _route_request():
+    router = current_app.extensions['replica']
+    if request.method not in READ_METHODS or not router.matches(request.endpoint):
+        return
+    if session.get(STICKY_KEY, 0) > time.time():
+        router.count('sticky')
+        return
+    if not router.available():
+        router.count('fallback')
+        return
+    try:
+        # A pooled checkout; server databases pre-ping here under the engine profile
+        with db.engines[REPLICA_BIND].connect():
+            pass
+    except exc.DBAPIError as e:
+        router.mark_down(e)
+        router.count('fallback')
+        return
+    g.use_replica = True
+    router.count('replica')
+
+
+def _stick_after_write(response):
+    if request.method not in READ_METHODS and response.status_code < 400:
+        session[STICKY_KEY] = time.time() + current_app.extensions['replica'].sticky_seconds
+    return response
+
+
+def _replica_error(router, context):
+    if context.is_disconnect or isinstance(context.sqlalchemy_exception, exc.OperationalError):
+        router.mark_down(context.original_exception)
+
+
+def init_replica(app):
+    """
+    Route read-only endpoints to the replica bind when one is configured
+
+    Call after ``db.init_app``.
+
+    Args:
+        app: Flask application instance
+
+    Returns:
+        ReplicaRouter or None
+    """
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return None
+    if 'replica' in app.extensions:
+        return app.extensions['replica']
+
+    router = app.extensions['replica'] = ReplicaRouter(
+        app.config.get('DB_REPLICA_ENDPOINTS', ()),
+        app.config.get('DB_REPLICA_STICKY_SECONDS', 10),
+        app.config.get('DB_REPLICA_RETRY_SECONDS', 30)
+    )
+    with app.app_context():
+        event.listen(db.engines[REPLICA_BIND], 'handle_error', partial(_replica_error, router))
+    app.before_request(_route_request)
+    app.after_request(_stick_after_write)
+    return router
+
+
+def get_router():
+    """Replica router of the current app (None without a replica)"""
+    return current_app.extensions.get('replica')
+
+
+def sync_sqlite_replica():
+    """
+    Copy the primary SQLite database over the replica file (local testing)
+
+    Uses SQLite's online backup, so the primary stays usable meanwhile.
+
+    Returns:
+        str: Path of the replica file
+    """
+    primary, replica = db.engines[None], db.engines[REPLICA_BIND]
+    if primary.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise ValueError('sync-replica only copies SQLite files; use database replication otherwise')
+
+    # Close pooled replica connections so none holds a read lock during the copy
+    replica.dispose()
+    source = primary.raw_connection()
+    try:
+        target = sqlite3.connect(replica.url.database)
+        try:
+            source.driver_connection.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    return replica.url.database
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+from database import db
+from models.sales import Sale, EMI_Ledger
+from models.payments import Payment
+from models.reports import DailyRollup
+from models.inventory import StockMovement
+
+
+def daily_rollups(start, end):
+    """
+    Daily rollup rows for a date range, one primary-key range read
+
+    Args:
+        start: First day (date)
+        end: Last day (date), inclusive
+
+    Returns:
+        list: One dict per day in order; days without activity are zero
+    """
+    found = {
+        row.day: row
+        for row in DailyRollup.query.filter(DailyRollup.day >= start, DailyRollup.day <= end)
+    }
+    days = []
+    current = start
+    while current <= end:
+        row = found.get(current) or DailyRollup(day=current, **{column: 0 for column in DailyRollup.COUNTERS})
+        days.append(row.to_dict())
+        current += timedelta(days=1)
+    return days
+
+
+def rollup_totals(days):
+    """Sum rollup dicts (as returned by daily_rollups) column by column"""
+    columns = DailyRollup.COUNTERS + ('sale_count', 'sale_amount', 'collected_amount', 'gross_margin')
+    return {
+        column: round(sum(day[column] for day in days), 2) if column.endswith('_amount')
+        else sum(day[column] for day in days)
+        for column in columns
+    }
+
+
+def dashboard_kpis(today=None, days=30):
+    """
+    Home dashboard figures: today's rollup and the trailing period's totals
+
+    Args:
+        today: UTC date (defaults to today)
+        days: Length of the trailing period, today included
+
+    Returns:
+        dict: 'today', 'period' totals and 'period_days'
+    """
+    today = today or datetime.utcnow().date()
+    rows = daily_rollups(today - timedelta(days=days - 1), today)
+    return {'today': rows[-1], 'period': rollup_totals(rows), 'period_days': days}
+
+
+def rebuild_rollups():
+    """
+    Recompute the rollup table from sales and the payment ledger
+
+    Sales and down payments come from the sale table; installments and
+    debt repayments from payment rows, which only exist from the time the
+    payment ledger was introduced, and cost of goods sold from sale stock
+    movements likewise. Defaults carry no timestamp, so the
+    stored default counts are kept as they are.
+
+    Returns:
+        int: Number of days written
+    """
+    totals = {}
+
+    def add(day, values):
+        # date() yields a string on SQLite and a date on PostgreSQL
+        row = totals.setdefault(str(day), {column: 0 for column in DailyRollup.COUNTERS})
+        for column, amount in values.items():
+            row[column] += amount
+
+    sale_day = db.func.date(Sale.sale_date)
+    # An EMI sale's paid_amount grows with each installment; take those back out
+    collected = db.func.coalesce(EMI_Ledger.installments_paid_amount, 0.0)
+    sales = db.session.query(
+        sale_day, Sale.sale_type, db.func.count(), db.func.sum(Sale.total_amount),
+        db.func.sum(Sale.paid_amount - collected)
+    ).outerjoin(EMI_Ledger, EMI_Ledger.sale_id == Sale.id).group_by(sale_day, Sale.sale_type)
+    for day, sale_type, count, total, down_payment in sales:
+        if sale_type == 'EMI':
+            add(day, {'emi_sale_count': count, 'emi_sale_amount': total,
+                      'emi_financed_amount': total - down_payment, 'down_payment_amount': down_payment})
+        else:
+            add(day, {'cash_sale_count': count, 'cash_sale_amount': total})
+
+    paid_day = db.func.date(Payment.paid_at)
+    payments = db.session.query(
+        paid_day, Payment.kind, db.func.count(),
+        db.func.sum(Payment.installment_to - Payment.installment_from + 1), db.func.sum(Payment.amount)
+    ).filter(Payment.kind.in_(('installment', 'debt'))).group_by(paid_day, Payment.kind)
+    for day, kind, count, installments, amount in payments:
+        if kind == 'installment':
+            add(day, {'installment_count': installments, 'installment_amount': amount})
+        else:
+            add(day, {'debt_payment_count': count, 'debt_payment_amount': amount})
+
+    moved_day = db.func.date(StockMovement.created_at)
+    cogs = db.session.query(
+        moved_day, db.func.sum(-StockMovement.quantity * StockMovement.unit_cost)
+    ).filter(StockMovement.kind == 'sale').group_by(moved_day)
+    for day, amount in cogs:
+        add(day, {'cogs_amount': amount})
+
+    defaults = dict(db.session.query(DailyRollup.day, DailyRollup.default_count).filter(DailyRollup.default_count > 0))
+    for day, count in defaults.items():
+        add(day, {'default_count': count})
+
+    try:
+        db.session.execute(DailyRollup.__table__.delete())
+        if totals:
+            db.session.execute(DailyRollup.__table__.insert(), [
+                {'day': datetime.strptime(day, '%Y-%m-%d').date(), **values,
+                 'updated_at': datetime.utcnow()}
+                for day, values in totals.items()
+            ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(totals)
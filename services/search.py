@@ -0,0 +1,240 @@
+"""
+Pluggable full-text search for customer, product and debt lookups.
+
+Backends:
+    sqlite_fts  SQLite FTS5 external-content tables with the trigram
+                tokenizer, kept in sync with triggers. Any substring of
+                three or more characters (e.g. part of a phone number)
+                is an index lookup.
+    pg_trgm     PostgreSQL GIN trigram indexes; ILIKE '%...%' and
+                similarity() ranking use the index.
+    like        Plain ILIKE scan, used when neither of the above is
+                available.
+"""
+import logging
+from flask import current_app
+from sqlalchemy.exc import DBAPIError
+from database import db
+
+
+logger = logging.getLogger(__name__)
+
+
+# entity -> (table name, searchable columns)
+SEARCH_ENTITIES = {
+    'customer': ('customer', ('name', 'phone')),
+    'product': ('product', ('name', 'model')),
+    'debt': ('debt_records', ('name', 'phone')),
+}
+
+# Trigram indexes cannot serve terms shorter than one trigram
+MIN_INDEXED_TERM = 3
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class LikeSearchBackend:
+    """Fallback backend: case-insensitive substring scan"""
+    
+    name = 'like'
+    
+    def install(self):
+        """Nothing to create for the fallback backend"""
+        return []
+    
+    def _where(self, entity):
+        _, columns = SEARCH_ENTITIES[entity]
+        return ' OR '.join(f"lower({column}) LIKE lower(:term) ESCAPE '\\'" for column in columns)
+    
+    def match_ids(self, entity, term):
+        """Select of matching row IDs, usable inside ``Model.id.in_(...)``"""
+        table, _ = SEARCH_ENTITIES[entity]
+        return db.text(f'SELECT id FROM {table} WHERE {self._where(entity)}').bindparams(
+            term=f'%{_escape_like(term)}%'
+        ).columns(id=db.Integer)
+    
+    def search(self, entity, term, limit=20):
+        """
+        Ranked search
+        
+        Returns:
+            list: (id, score) tuples, best match first
+        """
+        table, columns = SEARCH_ENTITIES[entity]
+        # Prefix matches rank above other substring matches
+        prefix = ' OR '.join(f'lower({column}) LIKE lower(:prefix)' for column in columns)
+        rows = db.session.execute(
+            db.text(
+                f'SELECT id, CASE WHEN {prefix} THEN 1.0 ELSE 0.5 END AS score '
+                f'FROM {table} WHERE {self._where(entity)} ORDER BY score DESC, id LIMIT :limit'
+            ),
+            {'term': f'%{_escape_like(term)}%', 'prefix': f'{_escape_like(term)}%', 'limit': limit}
+        )
+        return [(row.id, float(row.score)) for row in rows]
+
+
+class SqliteFtsSearchBackend(LikeSearchBackend):
+    """SQLite FTS5 trigram backend"""
+    
+    name = 'sqlite_fts'
+    
+    def install(self):
+        """Create FTS tables and sync triggers (idempotent)"""
+        created = []
+        for entity, (table, columns) in SEARCH_ENTITIES.items():
+            fts = f'{table}_fts'
+            exists = db.session.execute(
+                db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': fts}
+            ).first()
+            
+            cols = ', '.join(columns)
+            new_cols = ', '.join(f'new.{column}' for column in columns)
+            old_cols = ', '.join(f'old.{column}' for column in columns)
+            statements = [
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{cols}, content='{table}', content_rowid='id', tokenize='trigram')",
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END",
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END",
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END",
+            ]
+            for statement in statements:
+                db.session.execute(db.text(statement))
+            
+            if not exists:
+                # Index rows that existed before the FTS table
+                db.session.execute(db.text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+                created.append(f'fts table {fts}')
+        
+        db.session.commit()
+        return created
+    
+    @staticmethod
+    def _match_term(term):
+        return '"' + term.replace('"', '""') + '"'
+    
+    def match_ids(self, entity, term):
+        if len(term) < MIN_INDEXED_TERM:
+            return super().match_ids(entity, term)
+        table, _ = SEARCH_ENTITIES[entity]
+        fts = f'{table}_fts'
+        return db.text(f'SELECT rowid AS id FROM {fts} WHERE {fts} MATCH :match').bindparams(
+            match=self._match_term(term)
+        ).columns(id=db.Integer)
+    
+    def search(self, entity, term, limit=20):
+        if len(term) < MIN_INDEXED_TERM:
+            return super().search(entity, term, limit)
+        table, _ = SEARCH_ENTITIES[entity]
+        fts = f'{table}_fts'
+        rows = db.session.execute(
+            db.text(
+                f'SELECT rowid AS id, -bm25({fts}) AS score FROM {fts} '
+                f'WHERE {fts} MATCH :match ORDER BY rank LIMIT :limit'
+            ),
+            {'match': self._match_term(term), 'limit': limit}
+        )
+        return [(row.id, float(row.score)) for row in rows]
+
+
+class PostgresTrigramSearchBackend(LikeSearchBackend):
+    """PostgreSQL pg_trgm backend"""
+    
+    name = 'pg_trgm'
+    
+    def install(self):
+        """Enable pg_trgm and create GIN trigram indexes (idempotent)"""
+        created = []
+        db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        for table, columns in SEARCH_ENTITIES.values():
+            for column in columns:
+                index = f'ix_{table}_{column}_trgm'
+                db.session.execute(db.text(
+                    f'CREATE INDEX IF NOT EXISTS {index} ON {table} USING gin ({column} gin_trgm_ops)'
+                ))
+                created.append(f'index {index}')
+        db.session.commit()
+        return created
+    
+    def _where(self, entity):
+        _, columns = SEARCH_ENTITIES[entity]
+        # ILIKE against the raw column so the GIN trigram index applies
+        return ' OR '.join(f"{column} ILIKE :term ESCAPE '\\'" for column in columns)
+    
+    def search(self, entity, term, limit=20):
+        table, columns = SEARCH_ENTITIES[entity]
+        score = 'GREATEST(' + ', '.join(f'similarity({column}, :raw)' for column in columns) + ')'
+        rows = db.session.execute(
+            db.text(
+                f'SELECT id, {score} AS score FROM {table} WHERE {self._where(entity)} '
+                f'ORDER BY score DESC, id LIMIT :limit'
+            ),
+            {'term': f'%{_escape_like(term)}%', 'raw': term, 'limit': limit}
+        )
+        return [(row.id, float(row.score)) for row in rows]
+
+
+BACKENDS = {
+    LikeSearchBackend.name: LikeSearchBackend,
+    SqliteFtsSearchBackend.name: SqliteFtsSearchBackend,
+    PostgresTrigramSearchBackend.name: PostgresTrigramSearchBackend,
+}
+
+
+def init_search(app):
+    """
+    Pick and install the search backend for the app's database
+    
+    Config.SEARCH_BACKEND selects a backend by name; 'auto' uses FTS5 on
+    SQLite and pg_trgm on PostgreSQL. If the database cannot support the
+    chosen backend, the plain LIKE backend is used instead.
+    
+    Args:
+        app: Flask application instance (inside an app context)
+    """
+    choice = app.config.get('SEARCH_BACKEND', 'auto')
+    if choice == 'auto':
+        dialect = db.engine.dialect.name
+        choice = {'sqlite': 'sqlite_fts', 'postgresql': 'pg_trgm'}.get(dialect, 'like')
+    
+    backend = BACKENDS[choice]()
+    try:
+        backend.install()
+    except DBAPIError as e:
+        db.session.rollback()
+        logger.warning('Search backend %s unavailable (%s); using LIKE search', choice, e.orig)
+        backend = LikeSearchBackend()
+    
+    app.extensions['search_backend'] = backend
+    return backend
+
+
+def get_backend():
+    """Search backend for the current app"""
+    return current_app.extensions.get('search_backend') or LikeSearchBackend()
+
+
+def search_filter(entity, id_column, term):
+    """
+    SQL filter restricting a query to rows matching a search term
+    
+    Args:
+        entity: 'customer', 'product' or 'debt'
+        id_column: Primary key column of the queried model
+        term: Search text
+    
+    Returns:
+        SQL expression for ``query.filter(...)``
+    """
+    return id_column.in_(get_backend().match_ids(entity, term.strip()))
+
+
+def search(entity, term, limit=20):
+    """Ranked (id, score) matches for a term"""
+    return get_backend().search(entity, term.strip(), limit)
@@ -0,0 +1,86 @@
+from datetime import date
+from database import db
+from models.sales import EMI_Ledger
+from models.debt import DebtRecord
+
+
+DEBT_STATUSES = ('pending', 'partial', 'paid')
+
+
+def emi_stats(today=None):
+    """
+    Compute EMI ledger statistics with a single grouped query
+
+    Args:
+        today: Reference date for overdue checks (defaults to today)
+
+    Returns:
+        dict: Per-status counts, total receivable and overdue count
+    """
+    today = today or date.today()
+    remaining = EMI_Ledger.remaining_amount
+    overdue = db.case((EMI_Ledger.next_payment_date < today, 1), else_=0)
+
+    rows = db.session.query(
+        EMI_Ledger.status,
+        db.func.count(EMI_Ledger.id),
+        db.func.coalesce(db.func.sum(remaining), 0.0),
+        db.func.coalesce(db.func.sum(overdue), 0)
+    ).group_by(EMI_Ledger.status).all()
+
+    by_status = {status: (count, receivable, overdue_count)
+                 for status, count, receivable, overdue_count in rows}
+    active = by_status.get('Active', (0, 0.0, 0))
+
+    return {
+        'total_active': active[0],
+        'total_completed': by_status.get('Completed', (0,))[0],
+        'total_defaulted': by_status.get('Defaulted', (0,))[0],
+        'total_receivable': round(float(active[1]), 2),
+        'total_overdue': int(active[2])
+    }
+
+
+def debt_stats(today=None):
+    """
+    Compute debt record statistics with a single grouped query
+
+    Args:
+        today: Reference date for overdue checks (defaults to today)
+
+    Returns:
+        dict: Totals, overdue count and paid/pending breakdown
+    """
+    today = today or date.today()
+    overdue = db.case((DebtRecord.due_date < today, 1), else_=0)
+
+    rows = db.session.query(
+        DebtRecord.status,
+        db.func.count(DebtRecord.id),
+        db.func.coalesce(db.func.sum(DebtRecord.amount), 0.0),
+        db.func.coalesce(db.func.sum(DebtRecord.paid_amount), 0.0),
+        db.func.coalesce(db.func.sum(overdue), 0)
+    ).group_by(DebtRecord.status).all()
+
+    stats = {
+        'total_records': 0,
+        'total_amount': 0.0,
+        'total_paid': 0.0,
+        'total_pending': 0.0,
+        'overdue_count': 0,
+        'paid_count': 0,
+        'pending_count': 0,
+        'partial_count': 0
+    }
+
+    for status, count, amount, paid, overdue_count in rows:
+        stats['total_records'] += count
+        stats['total_amount'] += float(amount)
+        stats['total_paid'] += float(paid)
+        if status != 'paid':
+            stats['overdue_count'] += int(overdue_count)
+        if status in DEBT_STATUSES:
+            stats[f'{status}_count'] = count
+
+    stats['total_pending'] = stats['total_amount'] - stats['total_paid']
+    return stats
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from database import db, increment_row
+from models.sales import Sale, EMI_Ledger
+from models.debt import DebtRecord
+from models.customer import CustomerSummary
+from models.reports import DailyRollup, ReportRefresh
+from services.cache import invalidate
+from utils.aging import AGING_BUCKETS, bucket_case
+
+
+# Ledger ids per UPDATE ... WHERE id IN (...) when auto-defaulting
+DEFAULT_BATCH_SIZE = 500
+
+# ReportRefresh row stamped by every sweep
+SWEEP_NAME = 'overdue_sweep'
+
+
+def last_sweep():
+    """
+    Scalar subquery: when the overdue sweep last committed
+
+    The sweep rewrites days_overdue / aging_bucket without moving
+    updated_at, so page validators built on table_version add this.
+    """
+    return (
+        db.select(ReportRefresh.refreshed_at)
+        .where(ReportRefresh.name == SWEEP_NAME)
+        .scalar_subquery()
+    )
+
+
+def _days_since(column, today):
+    """SQL expression for the whole days between ``column`` and ``today``"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return db.cast(db.func.julianday(today.isoformat()) - db.func.julianday(column), db.Integer)
+    if dialect == 'postgresql':
+        # date - date is an integer number of days
+        return db.literal(today, db.Date) - column
+    return db.func.datediff(today, column)
+
+
+def _refresh(model, due_column, overdue_condition, today):
+    """
+    Set days_overdue / aging_bucket on overdue rows and clear them elsewhere
+
+    These columns are derived from the due date, so updated_at is left
+    as it was; incremental consumers keyed on updated_at only see real
+    changes.
+
+    Returns:
+        tuple: (rows marked overdue, rows cleared)
+    """
+    overdue = db.session.execute(
+        db.update(model)
+        .where(overdue_condition, due_column < today)
+        .values(days_overdue=_days_since(due_column, today),
+                aging_bucket=bucket_case(due_column, today),
+                updated_at=model.updated_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    cleared = db.session.execute(
+        db.update(model)
+        .where(model.days_overdue != 0,
+               db.or_(db.not_(overdue_condition), due_column >= today))
+        .values(days_overdue=0, aging_bucket=AGING_BUCKETS[0][0], updated_at=model.updated_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    return overdue, cleared
+
+
+def _auto_default(today, auto_default_days):
+    """
+    Default active ledgers whose next payment is long past due
+
+    Returns:
+        int: Number of ledgers defaulted
+    """
+    cutoff = today - timedelta(days=auto_default_days)
+    rows = (
+        db.session.query(EMI_Ledger.id, Sale.customer_id)
+        .join(Sale, EMI_Ledger.sale_id == Sale.id)
+        .filter(EMI_Ledger.status == 'Active', EMI_Ledger.next_payment_date < cutoff)
+        .with_for_update(of=EMI_Ledger)
+        .all()
+    )
+
+    for start in range(0, len(rows), DEFAULT_BATCH_SIZE):
+        ids = [ledger_id for ledger_id, _ in rows[start:start + DEFAULT_BATCH_SIZE]]
+        db.session.execute(
+            db.update(EMI_Ledger)
+            .where(EMI_Ledger.id.in_(ids))
+            .values(status='Defaulted')
+            .execution_options(synchronize_session=False)
+        )
+
+    CustomerSummary.record_defaults(Counter(customer_id for _, customer_id in rows))
+    DailyRollup.record_defaults(len(rows))
+    return len(rows)
+
+
+def sweep_overdue(today=None, auto_default_days=None):
+    """
+    Recompute stored overdue state for EMI ledgers and debt records
+
+    Everything runs as a handful of set-based UPDATEs in one transaction,
+    so it is safe to re-run: a second sweep on the same day changes
+    nothing.
+
+    Args:
+        today: Reference date (defaults to today)
+        auto_default_days: Default active EMIs this many days past due;
+            0 disables, None uses AUTO_DEFAULT_DAYS from the app config
+
+    Returns:
+        dict: Row counts per step
+    """
+    from flask import current_app
+
+    today = today or date.today()
+    if auto_default_days is None:
+        auto_default_days = current_app.config.get('AUTO_DEFAULT_DAYS', 0)
+
+    try:
+        defaulted = _auto_default(today, auto_default_days) if auto_default_days else 0
+        emi_overdue, emi_cleared = _refresh(
+            EMI_Ledger, EMI_Ledger.next_payment_date, EMI_Ledger.status == 'Active', today)
+        debt_overdue, debt_cleared = _refresh(
+            DebtRecord, DebtRecord.due_date, DebtRecord.status != 'paid', today)
+        increment_row(ReportRefresh, {'name': SWEEP_NAME}, {}, assign={'refreshed_at': datetime.utcnow()})
+        # Statuses and overdue columns of many rows moved
+        for namespace in ('emi', 'emi_stats', 'debt_stats'):
+            invalidate(namespace)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        'date': today.isoformat(),
+        'emi_defaulted': defaulted,
+        'emi_overdue': emi_overdue,
+        'emi_cleared': emi_cleared,
+        'debt_overdue': debt_overdue,
+        'debt_cleared': debt_cleared
+    }
+
+
+def _seconds_until(run_at, now=None):
+    """Seconds from now until the next HH:MM wall-clock time"""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in run_at.split(':'))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def _run_forever(app):
+    """Scheduler loop: sleep until the configured time, run the nightly jobs, repeat"""
+    from services.receivables import snapshot_aging
+    from services.reorder import refresh_sales_velocity
+
+    jobs = (
+        ('Overdue sweep', sweep_overdue),
+        ('Receivables aging snapshot', snapshot_aging),
+        ('Sales velocity refresh', refresh_sales_velocity),
+    )
+    while True:
+        time.sleep(_seconds_until(app.config.get('SWEEPER_RUN_AT', '02:00')))
+        with app.app_context():
+            for name, job in jobs:
+                try:
+                    app.logger.info('%s: %s', name, job())
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception('%s failed', name)
+            db.session.remove()
+
+
+def init_sweeper(app):
+    """
+    Start the nightly in-process sweeper thread when SWEEPER_ENABLED is set
+
+    Args:
+        app: Flask application instance
+    """
+    if not app.config.get('SWEEPER_ENABLED') or 'overdue_sweeper' in app.extensions:
+        return
+    # Under the debug reloader only the child process serves requests
+    if app.debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        return
+
+    thread = threading.Thread(target=_run_forever, args=(app,), name='overdue-sweeper', daemon=True)
+    app.extensions['overdue_sweeper'] = thread
+    thread.start()
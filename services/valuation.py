@@ -0,0 +1,97 @@
+from datetime import datetime
+from database import db
+from models.product import Product
+from models.inventory import InventoryValuation
+from services.rollups import daily_rollups, rollup_totals
+
+
+def _catalogue_totals():
+    """Units and value at buying price summed over the product table"""
+    units, value = db.session.query(
+        db.func.coalesce(db.func.sum(Product.stock_quantity), 0),
+        db.func.coalesce(db.func.sum(Product.stock_quantity * Product.buying_price), 0.0)
+    ).one()
+    return int(units), float(value)
+
+
+def valuation_report(start, end):
+    """
+    Inventory value and cost of goods sold for a date range
+
+    The stock figures are the incrementally maintained summary row; the
+    series comes from the daily rollup, so neither scans the catalogue or
+    the movement journal.
+
+    Args:
+        start: First day (date)
+        end: Last day (date), inclusive
+
+    Returns:
+        dict: 'stock' (units, value), per-day 'days' and period 'totals'
+    """
+    summary = InventoryValuation.current()
+    rows = daily_rollups(start, end)
+    totals = rollup_totals(rows)
+    days = [
+        {
+            'date': day['date'],
+            'sale_amount': day['sale_amount'],
+            'cogs_amount': day['cogs_amount'],
+            'gross_margin': day['gross_margin']
+        }
+        for day in rows
+    ]
+    return {
+        'stock': {
+            'units': summary.units,
+            'value': round(summary.value, 2),
+            'updated_at': summary.updated_at.strftime('%Y-%m-%d %H:%M:%S') if summary.updated_at else None
+        },
+        'days': days,
+        'totals': {column: totals[column] for column in ('sale_amount', 'cogs_amount', 'gross_margin')}
+    }
+
+
+def verify_valuation():
+    """
+    Compare the summary row with a full scan of the product table
+
+    Returns:
+        dict: Summary and scanned units / value and their differences
+    """
+    summary = InventoryValuation.current()
+    units, value = _catalogue_totals()
+    return {
+        'summary_units': summary.units,
+        'summary_value': round(summary.value, 2),
+        'units': units,
+        'value': round(value, 2),
+        'units_drift': summary.units - units,
+        'value_drift': round(summary.value - value, 2)
+    }
+
+
+def rebuild_valuation():
+    """
+    Reset the summary row from the product table
+
+    For stock that predates the movement journal, or after a drift found
+    by verify_valuation.
+
+    Returns:
+        dict: The new units and value
+    """
+    units, value = _catalogue_totals()
+    try:
+        summary = db.session.get(InventoryValuation, InventoryValuation.SUMMARY_ID)
+        if summary is None:
+            summary = InventoryValuation(id=InventoryValuation.SUMMARY_ID)
+            db.session.add(summary)
+        summary.units = units
+        summary.value = value
+        summary.updated_at = datetime.utcnow()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {'units': units, 'value': round(value, 2)}
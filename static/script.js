@@ -206,6 +206,79 @@ async function fetchJSON(url, options = {}) {
     }
 }
 
+// Typeahead picker backed by a JSON endpoint returning {items: [...]}
+// options: { url, render(item) -> label, onSelect(item), minLength, limit }
+function attachTypeahead(input, options) {
+    const minLength = options.minLength || 0;
+    const menu = document.createElement('div');
+    menu.className = 'list-group position-absolute w-100 shadow-sm typeahead-menu d-none';
+    menu.style.zIndex = 1050;
+    menu.style.top = '100%';
+    menu.style.left = 0;
+    input.parentNode.style.position = 'relative';
+    input.parentNode.appendChild(menu);
+
+    let lastQuery = null;
+
+    function hide() {
+        menu.classList.add('d-none');
+    }
+
+    function show(items) {
+        menu.innerHTML = '';
+        if (!items.length) {
+            const empty = document.createElement('div');
+            empty.className = 'list-group-item text-muted small';
+            empty.textContent = 'কিছু পাওয়া যায়নি';
+            menu.appendChild(empty);
+        }
+        items.forEach(function(item) {
+            const option = document.createElement('button');
+            option.type = 'button';
+            option.className = 'list-group-item list-group-item-action';
+            option.textContent = options.render(item);
+            option.addEventListener('mousedown', function(e) {
+                e.preventDefault();
+                input.value = options.render(item);
+                hide();
+                options.onSelect(item);
+            });
+            menu.appendChild(option);
+        });
+        menu.classList.remove('d-none');
+    }
+
+    const lookup = debounce(async function() {
+        const query = input.value.trim();
+        if (query.length < minLength || query === lastQuery) {
+            return;
+        }
+        lastQuery = query;
+        const url = options.url + '?q=' + encodeURIComponent(query) + '&limit=' + (options.limit || 10);
+        try {
+            const data = await fetchJSON(url);
+            // Ignore responses to queries the user has already typed past
+            if (query === input.value.trim()) {
+                show(data.items || []);
+            }
+        } catch (error) {
+            hide();
+        }
+    }, 250);
+
+    input.addEventListener('input', function() {
+        if (options.onClear) {
+            options.onClear();
+        }
+        lookup();
+    });
+    input.addEventListener('focus', function() {
+        lastQuery = null;
+        lookup();
+    });
+    input.addEventListener('blur', hide);
+}
+
 // Initialize tooltips (Bootstrap 5)
 document.addEventListener('DOMContentLoaded', function() {
     const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
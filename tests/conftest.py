@@ -0,0 +1,12 @@
+import os
+import pytest
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """The application on a throwaway SQLite file shared by every test"""
+    # Config reads the database URL at import time
+    os.environ['DB_URL'] = 'sqlite:///' + str(tmp_path_factory.mktemp('db') / 'showroom.db')
+    os.environ.setdefault('FLASK_ENV', 'production')
+    from app import app
+    return app
@@ -0,0 +1,129 @@
+"""
+Response cache: invalidations queued during a transaction are applied
+only when it commits and dropped when it rolls back.
+"""
+import pytest
+
+
+@pytest.fixture
+def ctx(app):
+    from database import db
+    from services.cache import MemoryCache, init_cache
+
+    installed = app.extensions.get('response_cache')
+    with app.app_context():
+        init_cache(app, backend=MemoryCache())
+        yield
+        db.session.rollback()
+    app.extensions['response_cache'] = installed
+
+
+def compute(value):
+    calls = []
+
+    def run():
+        calls.append(value)
+        return {'value': value}
+    run.calls = calls
+    return run
+
+
+def begin():
+    """Start a transaction the way a write route does"""
+    from database import db
+
+    db.session.execute(db.text('SELECT 1'))
+
+
+def test_entry_is_served_from_the_cache(ctx):
+    from services.cache import cached
+
+    first = compute(1)
+    assert cached('test', 1, first) == {'value': 1}
+    assert cached('test', 1, compute(2)) == {'value': 1}
+    assert first.calls == [1]
+
+
+def test_invalidation_waits_for_commit(ctx):
+    from database import db
+    from services.cache import cached, invalidate
+
+    cached('test', 1, compute(1))
+    begin()
+    invalidate('test', 1)
+
+    # Before COMMIT a reader still gets the committed state
+    assert cached('test', 1, compute(2)) == {'value': 1}
+
+    db.session.commit()
+    assert cached('test', 1, compute(3)) == {'value': 3}
+
+
+def test_rollback_drops_queued_invalidations(ctx):
+    from database import db
+    from services.cache import cached, invalidate
+
+    cached('test', 1, compute(1))
+    begin()
+    invalidate('test', 1)
+    db.session.rollback()
+
+    # A later commit must not apply the rolled-back invalidation
+    begin()
+    db.session.commit()
+    assert cached('test', 1, compute(2)) == {'value': 1}
+
+
+def test_namespace_invalidation_drops_every_key(ctx):
+    from database import db
+    from services.cache import cached, invalidate
+
+    cached('test', 1, compute(1))
+    cached('test', 2, compute(2))
+    cached('other', 1, compute(1))
+    begin()
+    invalidate('test')
+    db.session.commit()
+
+    assert cached('test', 1, compute(10)) == {'value': 10}
+    assert cached('test', 2, compute(20)) == {'value': 20}
+    assert cached('other', 1, compute(30)) == {'value': 1}
+
+
+def test_none_is_not_cached(ctx):
+    from services.cache import cached
+
+    assert cached('test', 'missing', lambda: None) is None
+    assert cached('test', 'missing', compute(1)) == {'value': 1}
+
+
+def test_broken_backend_falls_back_to_compute():
+    from services.cache import ResponseCache
+
+    class Down:
+        name = 'down'
+
+        def get(self, key):
+            raise ConnectionError('down')
+
+        def size(self):
+            return None
+
+    cache = ResponseCache(Down())
+    assert cache.get_or_set('test', 1, compute(1)) == {'value': 1}
+    assert cache.stats()['namespaces']['test']['errors'] == 1
+
+
+@pytest.mark.parametrize('workers, backend', [(1, 'memory'), (4, 'none')])
+def test_missing_redis_never_falls_back_to_per_process_cache_with_workers(app, monkeypatch, workers, backend):
+    import services.cache
+    from services.cache import init_cache
+
+    installed = app.extensions.get('response_cache')
+    monkeypatch.setattr(services.cache, '_redis_client', lambda url: None)
+    monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'redis')
+    monkeypatch.setitem(app.config, 'WEB_CONCURRENCY', workers)
+    try:
+        assert init_cache(app).backend.name == backend
+    finally:
+        app.extensions['response_cache'] = installed
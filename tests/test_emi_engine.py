@@ -0,0 +1,83 @@
+"""
+EMI engine: installments are rounded to paisa and the last one absorbs
+the residue, so every schedule adds up to exactly the financed total.
+"""
+from datetime import date
+import pytest
+from services.emi_engine import add_months, amortize, quote, quote_many, schedule
+
+
+TERMS = [
+    (71269.0, 0.0, 6, 'flat'),
+    (10000.0, 12.0, 12, 'flat'),
+    (55555.55, 9.5, 24, 'flat'),
+    (10000.0, 12.0, 12, 'reducing'),
+    (123456.78, 18.0, 36, 'reducing'),
+    (999.99, 0.0, 7, 'reducing'),
+]
+
+
+@pytest.mark.parametrize('principal, rate, periods, method', TERMS)
+def test_schedule_sums_to_financed_total(principal, rate, periods, method):
+    rows = schedule(principal, rate, periods, date(2024, 1, 31), method)
+
+    assert len(rows) == periods
+    assert all(row['amount'] == round(row['amount'], 2) for row in rows)
+    assert round(sum(row['principal'] for row in rows), 2) == principal
+    assert round(sum(row['amount'] for row in rows), 2) == round(principal + sum(row['interest'] for row in rows), 2)
+    assert rows[-1]['balance'] == 0.0
+    # Only the last installment differs from the regular one
+    assert len({row['amount'] for row in rows[:-1]}) <= 1
+
+
+@pytest.mark.parametrize('principal, rate, periods, method', TERMS)
+def test_quote_total_matches_schedule(principal, rate, periods, method):
+    offer = quote(principal + 1000, 1000, periods, rate, method)
+    rows = schedule(offer['principal_amount'], rate, periods, date(2024, 1, 1), method)
+
+    assert offer['total_emi_amount'] == round(sum(row['amount'] for row in rows), 2)
+    assert offer['total_interest'] == round(offer['total_emi_amount'] - offer['principal_amount'], 2)
+    assert offer['final_amount'] == rows[-1]['amount']
+
+
+def test_flat_interest_is_charged_on_the_original_principal():
+    offer = quote(13000, 1000, 12, 12.0, 'flat')
+    assert offer['total_interest'] == 1440.0
+    assert offer['total_emi_amount'] == 13440.0
+
+
+def test_quote_many_prices_each_combination_like_quote():
+    offers = quote_many(20000, [0, 5000], [6, 12], [0, 10], ['flat', 'reducing'])
+    for offer in offers:
+        single = quote(20000, offer['down_payment'], offer['emi_period'], offer['interest_rate'], offer['method'])
+        assert offer['total_emi_amount'] == single['total_emi_amount']
+
+
+def test_amortize_pads_shorter_loans_with_zeros():
+    table = amortize([1000, 1000], 0, [3, 5])
+    assert list(table['amount'][0, 3:]) == [0.0, 0.0]
+    assert table['amount'][0].sum() == 1000.0
+    assert table['amount'][1].sum() == 1000.0
+
+
+@pytest.mark.parametrize('principal, rate, periods, method', [
+    (0, 10, 12, 'flat'),
+    (1000, -1, 12, 'flat'),
+    (1000, 10, 0, 'flat'),
+    (1000, 10, 1.5, 'flat'),
+    (1000, 10, 12, 'compound'),
+])
+def test_invalid_terms_are_rejected(principal, rate, periods, method):
+    with pytest.raises(ValueError):
+        amortize(principal, rate, periods, method)
+
+
+def test_down_payment_must_leave_something_to_finance():
+    with pytest.raises(ValueError):
+        quote(1000, 1000, 6, 0)
+
+
+def test_add_months_clamps_to_month_end():
+    assert add_months(date(2024, 1, 31), 1) == date(2024, 2, 29)
+    assert add_months(date(2023, 1, 31), 1) == date(2023, 2, 28)
+    assert add_months(date(2024, 11, 30), 3) == date(2025, 2, 28)
@@ -0,0 +1,54 @@
+"""
+The EMI dashboard runs a fixed number of SQL statements, whatever the
+number of ledgers on the page (sale, customer and product are eager-loaded).
+
+Run from the repository root: python -m pytest -q
+"""
+from datetime import date, timedelta
+from sqlalchemy import event
+
+
+def add_ledgers(count):
+    from database import db
+    from models import Product, Customer, Sale, EMI_Ledger
+
+    start = Customer.query.count()
+    product = Product(name='Test TV', model=f'TEST-{start}', buying_price=100, selling_price=150, stock_quantity=10)
+    db.session.add(product)
+    for i in range(start, start + count):
+        customer = Customer(name=f'Customer {i}', phone=f'017{i:08d}')
+        sale = Sale(customer=customer, product=product, sale_type='EMI', total_amount=1000, paid_amount=100)
+        db.session.add(EMI_Ledger(sale=sale, total_installments=10, monthly_amount=90,
+                                  next_payment_date=date.today() + timedelta(days=i % 30), status='Active'))
+    db.session.commit()
+
+
+def dashboard_statements(app):
+    from database import db
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    client = app.test_client()
+    with app.app_context():
+        event.listen(db.engine, 'after_cursor_execute', count)
+        try:
+            response = client.get('/emi/dashboard?status=All&per_page=100')
+        finally:
+            event.remove(db.engine, 'after_cursor_execute', count)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_dashboard_statements_do_not_grow_with_ledgers(app):
+    with app.app_context():
+        add_ledgers(5)
+    few = dashboard_statements(app)
+
+    with app.app_context():
+        add_ledgers(40)
+    many = dashboard_statements(app)
+
+    assert few == many
@@ -0,0 +1,110 @@
+"""
+Keyset pagination: pages walk every row once in key order, both ways,
+and malformed cursors fall back to the first page instead of erroring.
+"""
+import base64
+import json
+from datetime import date
+import pytest
+
+
+@pytest.fixture(scope='module')
+def products(app):
+    """25 products whose stock repeats, so the (stock, id) key has ties"""
+    from database import db
+    from models import Product
+
+    with app.app_context():
+        rows = [Product(name=f'Page {i}', model=f'PAGE-{i}', buying_price=1, selling_price=2,
+                        stock_quantity=i % 4) for i in range(25)]
+        db.session.add_all(rows)
+        db.session.commit()
+        return sorted((row.stock_quantity, row.id) for row in rows)
+
+
+def page_query():
+    from models import Product
+
+    return Product.query.filter(Product.model.like('PAGE-%'))
+
+
+def keys(page):
+    return [(item.stock_quantity, item.id) for item in page.items]
+
+
+def test_pages_walk_every_row_once_in_order(app, products):
+    from models import Product
+    from services.pagination import keyset_paginate
+
+    columns = [Product.stock_quantity, Product.id]
+    with app.app_context():
+        pages = [keyset_paginate(page_query(), columns, per_page=10)]
+        while pages[-1].has_next:
+            pages.append(keyset_paginate(page_query(), columns, after=pages[-1].next_cursor, per_page=10))
+
+        assert [len(page.items) for page in pages] == [10, 10, 5]
+        assert [key for page in pages for key in keys(page)] == products
+        assert not pages[0].has_prev
+
+        # Going back from the last page returns the same pages
+        back = keyset_paginate(page_query(), columns, before=pages[-1].prev_cursor, per_page=10)
+        assert keys(back) == keys(pages[1])
+        back = keyset_paginate(page_query(), columns, before=back.prev_cursor, per_page=10)
+        assert keys(back) == keys(pages[0])
+        assert not back.has_prev
+
+
+def test_cursor_round_trip_restores_dates():
+    from models.debt import DebtRecord
+    from services.pagination import decode_cursor, encode_cursor
+
+    cursor = encode_cursor([date(2024, 2, 29), 42])
+    assert '=' not in cursor
+    assert decode_cursor(cursor, [DebtRecord.due_date, DebtRecord.id]) == [date(2024, 2, 29), 42]
+
+
+def _raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    '',
+    _raw_cursor({'id': 1}),
+    _raw_cursor([1]),
+    _raw_cursor(['2024-02-29', 1, 2]),
+    _raw_cursor(['yesterday', 1]),
+    _raw_cursor(['2024-02-30', 1]),
+    _raw_cursor(['2024-02-29', 'one']),
+    _raw_cursor(['2024-02-29', None]),
+])
+def test_malformed_cursor_decodes_to_none(cursor):
+    from models.debt import DebtRecord
+    from services.pagination import decode_cursor
+
+    assert decode_cursor(cursor, [DebtRecord.due_date, DebtRecord.id]) is None
+
+
+def test_malformed_cursor_serves_the_first_page(app, products):
+    from models import Product
+    from services.pagination import paginate_request
+
+    with app.app_context():
+        page = paginate_request(page_query(), [Product.stock_quantity, Product.id],
+                                {'after': '%%%', 'per_page': '10'})
+        assert keys(page) == products[:10]
+
+
+@pytest.mark.parametrize('per_page, expected', [('0', 1), ('-5', 1), ('1000', 25), ('ten', 20)])
+def test_per_page_is_clamped(app, products, per_page, expected):
+    from models import Product
+    from services.pagination import paginate_request
+
+    with app.app_context():
+        page = paginate_request(page_query(), [Product.stock_quantity, Product.id], {'per_page': per_page})
+        assert len(page.items) == expected
+
+
+def test_malformed_cursor_on_a_list_page_is_not_an_error(app, products):
+    response = app.test_client().get('/inventory/?after=garbage')
+    assert response.status_code == 200
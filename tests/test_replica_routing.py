@@ -0,0 +1,64 @@
+"""
+RoutingSession: only plain SELECTs of a request routed to the replica
+read from it; writes and locking reads always go to the primary.
+"""
+import pytest
+from flask import Flask, g
+
+
+@pytest.fixture(scope='module')
+def routed(tmp_path_factory):
+    from database import db, REPLICA_BIND
+
+    directory = tmp_path_factory.mktemp('replica')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{directory / "primary.db"}'
+    app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: f'sqlite:///{directory / "replica.db"}'}
+    db.init_app(app)
+    with app.app_context():
+        engines = db.engines[None], db.engines[REPLICA_BIND]
+    return app, engines
+
+
+def bind_for(app, clause, use_replica=True):
+    from database import db
+
+    with app.test_request_context():
+        g.use_replica = use_replica
+        try:
+            return db.session.get_bind(clause=clause)
+        finally:
+            db.session.remove()
+
+
+def test_plain_select_reads_from_the_replica(routed):
+    from models import Product
+
+    app, (primary, replica) = routed
+    assert bind_for(app, Product.__table__.select()) is replica
+    assert bind_for(app, Product.__table__.select(), use_replica=False) is primary
+
+
+@pytest.mark.parametrize('statement', ['insert', 'update', 'delete', 'for_update'])
+def test_writes_and_locking_reads_use_the_primary(routed, statement):
+    from models import Product
+
+    app, (primary, replica) = routed
+    table = Product.__table__
+    clause = {
+        'insert': lambda: table.insert().values(name='x'),
+        'update': lambda: table.update().values(name='x'),
+        'delete': lambda: table.delete(),
+        'for_update': lambda: table.select().with_for_update(),
+    }[statement]()
+    assert bind_for(app, clause) is primary
+
+
+def test_select_outside_a_request_uses_the_primary(routed):
+    from database import db
+    from models import Product
+
+    app, (primary, replica) = routed
+    with app.app_context():
+        assert db.session.get_bind(clause=Product.__table__.select()) is primary
+        db.session.remove()
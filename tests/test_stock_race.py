@@ -0,0 +1,82 @@
+"""
+Concurrent sales never oversell: the conditional UPDATE in
+Product._change_stock lets exactly as many sales through as there are
+units, and checkout answers the losers with 409.
+
+Run from the repository root: python -m pytest -q
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def add_product(stock):
+    from database import db
+    from models import Product
+
+    product = Product(name='Race TV', model=f'RACE-{Product.query.count()}',
+                      buying_price=100, selling_price=150, stock_quantity=stock)
+    db.session.add(product)
+    db.session.commit()
+    return product.id
+
+
+def run_concurrently(count, task):
+    """Run ``task`` in ``count`` threads released at the same moment"""
+    barrier = threading.Barrier(count)
+
+    def run(i):
+        barrier.wait()
+        return task(i)
+
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(run, range(count)))
+
+
+def test_reserve_stock_never_goes_negative(app):
+    from database import db
+    from models import Product
+    from models.inventory import StockMovement
+
+    with app.app_context():
+        product_id = add_product(3)
+
+    def sell(i):
+        with app.app_context():
+            try:
+                remaining = Product.reserve_stock(product_id, 1)
+                db.session.commit()
+                return remaining
+            except Exception:
+                db.session.rollback()
+                raise
+
+    results = run_concurrently(8, sell)
+
+    sold = [remaining for remaining in results if remaining is not None]
+    assert sorted(sold) == [0, 1, 2]
+    with app.app_context():
+        assert db.session.get(Product, product_id).stock_quantity == 0
+        assert StockMovement.query.filter_by(product_id=product_id, kind='sale').count() == 3
+
+
+def test_checkout_loser_gets_409(app):
+    from database import db
+    from models import Product, Sale
+
+    with app.app_context():
+        product_id = add_product(1)
+
+    def checkout(i):
+        response = app.test_client().post('/pos/checkout', json={
+            'items': [{'product_id': product_id, 'quantity': 1}],
+            'customer_name': f'Racer {i}',
+            'customer_phone': f'0190{product_id:04d}{i:03d}'
+        })
+        return response.status_code
+
+    statuses = run_concurrently(4, checkout)
+
+    assert sorted(statuses) == [200, 409, 409, 409]
+    with app.app_context():
+        assert db.session.get(Product, product_id).stock_quantity == 0
+        assert Sale.query.filter_by(product_id=product_id).count() == 1
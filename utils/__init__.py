@@ -0,0 +1 @@
+# Small shared helpers for the route blueprints
@@ -0,0 +1,57 @@
+# Days-overdue buckets, shared by the models, the overdue sweeper and reports
+from datetime import timedelta
+from database import db
+
+# (label, last day in bucket); the final bucket is open-ended
+AGING_BUCKETS = [
+    ('current', 0),
+    ('1-30', 30),
+    ('31-60', 60),
+    ('61-90', 90),
+    ('90+', None),
+]
+
+# Receivables aging report buckets (not-yet-due amounts fall in the first)
+RECEIVABLE_BUCKETS = [
+    ('0-30', 30),
+    ('31-60', 60),
+    ('61-90', 90),
+    ('90+', None),
+]
+
+
+def aging_bucket_for(days_overdue):
+    """
+    Map a days-overdue count to its aging bucket label
+
+    Args:
+        days_overdue: Days past due (0 or less means not overdue)
+
+    Returns:
+        str: Bucket label
+    """
+    for label, last_day in AGING_BUCKETS:
+        if last_day is None or days_overdue <= last_day:
+            return label
+
+
+def bucket_case(due_column, as_of, buckets=AGING_BUCKETS):
+    """
+    SQL CASE mapping a due date column to its bucket label
+
+    Uses cutoff dates rather than date arithmetic, so it is portable and
+    can use an index on the due date.
+
+    Args:
+        due_column: Date column (due date / next payment date)
+        as_of: Reference date
+        buckets: Bucket definitions, as in AGING_BUCKETS
+
+    Returns:
+        Case: SQL expression yielding the bucket label
+    """
+    whens = [
+        (due_column >= as_of - timedelta(days=last_day), label)
+        for label, last_day in buckets if last_day is not None
+    ]
+    return db.case(*whens, else_=buckets[-1][0])
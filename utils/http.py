@@ -0,0 +1,158 @@
+import hashlib
+import os
+from datetime import date, datetime, timezone
+from functools import wraps
+from flask import current_app, request, session, jsonify, make_response
+from database import db
+
+
+def cached_json(payload, max_age=0):
+    """
+    JSON response with a strong ETag derived from the body
+    
+    Clients that send a matching If-None-Match get an empty 304 instead
+    of the full payload.
+    
+    Args:
+        payload: JSON-serializable data
+        max_age: Seconds the client may reuse the response without asking
+    
+    Returns:
+        Response: 200 with ETag, or 304 Not Modified
+    """
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+
+# Directories left out of the code hash (static files carry their own validators)
+_UNHASHED_DIRS = {'__pycache__', 'static', 'tests', 'venv', 'node_modules'}
+
+
+def _source_hash(root):
+    """Hash of the application's Python code and templates under ``root``"""
+    digest = hashlib.sha1()
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(
+            name for name in subdirectories if name not in _UNHASHED_DIRS and not name.startswith('.')
+        )
+        for name in sorted(files):
+            if name.endswith(('.py', '.html')):
+                path = os.path.join(directory, name)
+                digest.update(os.path.relpath(path, root).encode())
+                with open(path, 'rb') as source:
+                    digest.update(source.read())
+    return digest.hexdigest()
+
+
+def _deploy_token():
+    """
+    Part of every ETag that changes with each deploy, so template and code
+    changes are never masked by a stale validator
+
+    APP_VERSION when set, otherwise a hash of the code and templates. It is
+    the same in every worker and across restarts of one deploy, so any
+    worker can answer a revalidation with 304.
+    """
+    token = current_app.extensions.get('etag_token')
+    if token is None:
+        token = current_app.config.get('APP_VERSION') or _source_hash(current_app.root_path)
+        current_app.extensions['etag_token'] = token
+    return token
+
+
+def table_version(*models, extra=()):
+    """
+    Cheap change marker for one or more tables: max(updated_at) and row
+    count of each, read in a single round trip
+
+    The count catches deletions, which leave max(updated_at) unchanged.
+
+    Args:
+        *models: Model classes with an updated_at column
+        extra: Further scalar subqueries read in the same round trip
+            (e.g. the last overdue sweep)
+
+    Returns:
+        tuple: (latest updated_at or None, number of rows) per model, flattened,
+            then the extra values
+    """
+    columns = []
+    for model in models:
+        columns.append(db.select(db.func.max(model.updated_at)).scalar_subquery())
+        columns.append(db.select(db.func.count()).select_from(model).scalar_subquery())
+    columns.extend(extra)
+    return tuple(db.session.execute(db.select(*columns)).one())
+
+
+def conditional(version, daily=False, last_modified=False):
+    """
+    Answer GET requests with 304 Not Modified while their data is unchanged
+
+    ``version`` is called with the view's arguments and returns anything
+    repr-able that changes whenever the response would (typically
+    ``table_version`` tuples or a row's updated_at); it should be far
+    cheaper than the view. The ETag is a hash of it together with the
+    full URL, so every page / filter has its own validator. The view only
+    runs when the client's copy is stale.
+
+    Pages are served normally (without validators) while flash messages
+    are pending, since those are rendered into the page once.
+
+    Args:
+        version: Function of the view's arguments; returning None skips
+            the check (e.g. so the view can answer 404)
+        daily: The response also depends on today's date (overdue flags
+            derived from due dates), so the validator changes each day
+        last_modified: Also send Last-Modified (the latest datetime in the
+            version). Only safe for single rows that do not depend on the
+            date: on lists a deletion does not move max(updated_at)
+
+    Returns:
+        Decorator for a view function
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            parts = version(*args, **kwargs)
+            if parts is None:
+                return view(*args, **kwargs)
+            if daily:
+                parts = (parts, date.today().isoformat())
+
+            validator = current_app.response_class()
+            validator.set_etag(hashlib.sha1(
+                repr((_deploy_token(), request.full_path, parts)).encode()
+            ).hexdigest())
+            if last_modified and not daily:
+                stamps = [part for part in _flatten(parts) if isinstance(part, datetime)]
+                if stamps:
+                    validator.last_modified = max(stamps).replace(tzinfo=timezone.utc)
+            validator.cache_control.private = True
+            validator.cache_control.no_cache = True
+
+            validator.make_conditional(request)
+            if validator.status_code == 304:
+                return validator
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+                    if header in validator.headers:
+                        response.headers[header] = validator.headers[header]
+            return response
+        return wrapper
+    return decorator
+
+
+def _flatten(parts):
+    if isinstance(parts, (tuple, list)):
+        for part in parts:
+            yield from _flatten(part)
+    else:
+        yield parts